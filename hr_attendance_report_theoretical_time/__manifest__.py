@@ -2,7 +2,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 {
     "name": "Theoretical vs Attended Time Analysis",
-    "version": "12.0.1.4.0",
+    "version": "12.0.2.0.0",
     "category": "Human Resources",
     "website": "https://github.com/OCA/hr",
     "author": "Tecnativa, "
@@ -12,8 +12,10 @@
     "depends": [
         "hr_attendance",
         "hr_holidays_public",
+        "resource_hook",
     ],
     "data": [
+        "data/ir_cron.xml",
         "security/ir.model.access.csv",
         "security/hr_attendance_report_theoretical_time_security.xml",
         "views/hr_attendance_views.xml",
@@ -23,4 +25,6 @@
         "wizards/recompute_theoretical_attendance_views.xml",
         "wizards/wizard_theoretical_time.xml",
     ],
+    "pre_init_hook": "pre_init_hook",
+    "post_init_hook": "post_init_hook",
 }
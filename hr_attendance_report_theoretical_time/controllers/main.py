@@ -0,0 +1,88 @@
+# Copyright 2019 Tecnativa - Pedro M. Baeza
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import csv
+import io
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+import odoo
+from odoo import api, http
+from odoo.http import content_disposition, request
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+
+class TheoreticalTimeExport(http.Controller):
+
+    @http.route(
+        '/hr_attendance_report_theoretical_time/export/<int:wizard_id>/'
+        '<string:file_format>',
+        type='http', auth='user',
+    )
+    def export(self, wizard_id, file_format, **kwargs):
+        """Download the rows of the theoretical vs attended time of the
+        employees and period selected in the wizard.
+        """
+        request.env['hr.attendance.theoretical.time.report'].\
+            check_access_rights('read')
+        wizard = request.env['wizard.theoretical.time'].browse(wizard_id)
+        wizard.check_access_rule('read')
+        filename = 'theoretical_time.%s' % file_format
+        if file_format == 'csv':
+            # Rows are read while they are sent, so they need their own cursor
+            # as the one of the request is closed by then
+            response = request.make_response(self._csv_stream(
+                request.env.cr.dbname, request.env.uid,
+                dict(request.env.context), wizard_id,
+            ), headers=[
+                ('Content-Type', 'text/csv;charset=utf8'),
+                ('Content-Disposition', content_disposition(filename)),
+            ])
+            response.direct_passthrough = True
+            return response
+        if file_format == 'xlsx' and xlsxwriter:
+            return self._xlsx_response(wizard, filename)
+        return request.not_found()
+
+    def _csv_stream(self, dbname, uid, context, wizard_id, batch=1000):
+        with api.Environment.manage(), \
+                odoo.registry(dbname).cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            wizard = env['wizard.theoretical.time'].browse(wizard_id)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(wizard._get_export_header())
+            for index, row in enumerate(wizard._get_export_rows(), 1):
+                writer.writerow(row)
+                if index % batch == 0:
+                    yield buffer.getvalue().encode('utf-8')
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode('utf-8')
+
+    def _xlsx_response(self, wizard, filename):
+        # The workbook is written to a temporary file in constant memory mode,
+        # and then sent by blocks
+        file = tempfile.TemporaryFile()
+        workbook = xlsxwriter.Workbook(file, {'constant_memory': True})
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, wizard._get_export_header())
+        for index, row in enumerate(wizard._get_export_rows(), 1):
+            worksheet.write_row(index, 0, row)
+        workbook.close()
+        file.seek(0)
+        response = request.make_response(
+            wrap_file(request.httprequest.environ, file),
+            headers=[
+                ('Content-Type', 'application/vnd.openxmlformats-'
+                                 'officedocument.spreadsheetml.sheet'),
+                ('Content-Disposition', content_disposition(filename)),
+            ],
+        )
+        response.direct_passthrough = True
+        return response
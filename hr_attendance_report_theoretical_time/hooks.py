@@ -0,0 +1,28 @@
+# Copyright 2017-2019 Tecnativa - Pedro M. Baeza
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, SUPERUSER_ID
+
+
+def pre_init_hook(cr):
+    """Create the column of theoretical hours of the attendances, so that
+    they are not computed one by one on installation, but in background.
+    """
+    cr.execute(
+        """
+        ALTER TABLE hr_attendance
+        ADD COLUMN IF NOT EXISTS theoretical_hours double precision
+        """
+    )
+
+
+def post_init_hook(cr, registry):
+    """Materialize the days of all the employees, and schedule the
+    computation of theoretical hours of the existing attendances.
+    """
+    with api.Environment.manage():
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        day_obj = env['hr.attendance.theoretical.day']
+        day_obj._refresh()
+        day_obj._set_last_refresh_date(fields.Date.context_today(day_obj))
+        env['hr.attendance.theoretical.recompute']._enqueue()
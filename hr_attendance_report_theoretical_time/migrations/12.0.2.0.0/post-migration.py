@@ -0,0 +1,12 @@
+# Copyright 2017-2019 Tecnativa - Pedro M. Baeza
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    with api.Environment.manage():
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        day_obj = env['hr.attendance.theoretical.day']
+        day_obj._refresh()
+        day_obj._set_last_refresh_date(fields.Date.context_today(day_obj))
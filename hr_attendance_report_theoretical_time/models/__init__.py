@@ -1,7 +1,11 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 from . import hr_attendance
+from . import hr_attendance_theoretical_day
+from . import hr_attendance_theoretical_recompute
 from . import hr_employee
 from . import hr_holidays_public
 from . import hr_leave
 from . import hr_leave_type
+from . import resource_calendar_attendance
+from . import resource_calendar_leaves
@@ -1,7 +1,10 @@
 # Copyright 2017-2019 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+from collections import defaultdict
+
 from odoo import api, fields, models
+from psycopg2.extras import execute_values
 
 
 class HrAttendance(models.Model):
@@ -15,8 +18,83 @@ class HrAttendance(models.Model):
 
     @api.depends('check_in', 'employee_id')
     def _compute_theoretical_hours(self):
-        obj = self.env['hr.attendance.theoretical.time.report']
+        hours = self._get_theoretical_hours()
         for record in self:
-            record.theoretical_hours = obj._theoretical_hours(
-                record.employee_id, record.check_in,
+            record.theoretical_hours = hours.get(record, 0)
+
+    @api.multi
+    def _get_theoretical_hours(self):
+        """Get theoretical hours of the attendances as a {record: hours}
+        dictionary, computing only once each employee and day.
+        """
+        obj = self.env['hr.attendance.theoretical.time.report']
+        groups = defaultdict(list)
+        for record in self.filtered(lambda x: x.employee_id and x.check_in):
+            groups[record.employee_id].append(record)
+        hours = obj._theoretical_hours_dates_batch({
+            employee: [x.check_in.date() for x in records]
+            for employee, records in groups.items()
+        })
+        result = {}
+        for employee, records in groups.items():
+            for record in records:
+                result[record] = hours[employee.id][record.check_in.date()]
+        return result
+
+    @api.multi
+    def _recompute_theoretical_hours(self):
+        """Recompute stored theoretical hours, and store them at once without
+        going through the ORM write, refreshing afterwards the affected days.
+        """
+        values = [
+            (record.id, hours)
+            for record, hours in self._get_theoretical_hours().items()
+        ]
+        if values:
+            execute_values(
+                self.env.cr,
+                """
+                UPDATE %s AS ha
+                SET theoretical_hours = v.hours
+                FROM (VALUES %%s) AS v (id, hours)
+                WHERE ha.id = v.id
+                """ % self._table,
+                values,
+                template="(%s, %s::float)",
+                page_size=1000,
             )
+            self.invalidate_cache(['theoretical_hours'], self.ids)
+        self.env['hr.attendance.theoretical.day']._refresh_days(
+            self._get_theoretical_days(),
+        )
+
+    def _get_theoretical_days(self):
+        """Get the (employee, date) pairs of the attendances."""
+        return {
+            (record.employee_id, record.check_in.date())
+            for record in self if record.employee_id and record.check_in
+        }
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hr.attendance.theoretical.day']._refresh_days(
+            records._get_theoretical_days(),
+        )
+        return records
+
+    @api.multi
+    def write(self, vals):
+        days = self._get_theoretical_days()
+        res = super().write(vals)
+        self.env['hr.attendance.theoretical.day']._refresh_days(
+            days | self._get_theoretical_days(),
+        )
+        return res
+
+    @api.multi
+    def unlink(self):
+        days = self._get_theoretical_days()
+        res = super().unlink()
+        self.env['hr.attendance.theoretical.day']._refresh_days(days)
+        return res
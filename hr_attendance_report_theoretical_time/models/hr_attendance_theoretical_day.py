@@ -0,0 +1,308 @@
+# Copyright 2017-2019 Tecnativa - Pedro M. Baeza
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models, tools
+from psycopg2.extras import execute_values
+
+LAST_REFRESH_DATE_PARAM = (
+    'hr_attendance_report_theoretical_time.last_refresh_date'
+)
+
+
+class HrAttendanceTheoreticalDay(models.Model):
+    """Materialized worked and theoretical hours per employee and day, from
+    which the theoretical vs attended time report is read.
+
+    Rows are regenerated incrementally through `_refresh` when attendances,
+    leaves, calendars or public holidays change. A negative theoretical
+    amount means that it's pending to be computed.
+    """
+    _name = "hr.attendance.theoretical.day"
+    _description = "Theoretical and attended time per employee and day"
+    _log_access = False
+    _rec_name = 'date'
+    _order = 'date,employee_id'
+
+    employee_id = fields.Many2one(
+        comodel_name='hr.employee',
+        string="Employee",
+        required=True,
+        index=True,
+        ondelete='cascade',
+        readonly=True,
+    )
+    date = fields.Date(
+        string="Date",
+        required=True,
+        index=True,
+        readonly=True,
+    )
+    worked_hours = fields.Float(
+        string='Worked',
+        readonly=True,
+    )
+    theoretical_hours = fields.Float(
+        string="Theoric",
+        default=-1,
+        readonly=True,
+    )
+
+    _sql_constraints = [
+        ('employee_date_uniq', 'unique(employee_id, date)',
+         'There can only be one row per employee and day.'),
+    ]
+
+    @api.model_cr
+    def init(self):
+        # Support the order of the report, which is read from this table
+        tools.create_index(
+            self.env.cr, 'hr_attendance_theoretical_day_report_order_index',
+            self._table, ['date', 'employee_id', 'theoretical_hours DESC'],
+        )
+
+    def _where_scope(self, employee_field, date_field, employees, date_from,
+                     date_to):
+        where = ["True"]
+        if employees is not None:
+            where.append("%s IN %%(employee_ids)s" % employee_field)
+        if date_from:
+            where.append("%s >= %%(date_from)s" % date_field)
+        if date_to:
+            where.append("%s <= %%(date_to)s" % date_field)
+        return " AND ".join(where)
+
+    def _select_sub1(self):
+        return """
+            ha.employee_id AS employee_id,
+            ha.check_in::date AS date,
+            ha.worked_hours AS worked_hours,
+            ha.theoretical_hours AS theoretical_hours
+            """
+
+    def _from_sub1(self):
+        return """
+            hr_attendance ha
+            """
+
+    def _where_sub1(self, employees, date_from, date_to):
+        return self._where_scope(
+            'ha.employee_id', 'ha.check_in::date',
+            employees, date_from, date_to,
+        )
+
+    def _select_sub2(self):
+        return """
+            he.id AS employee_id,
+            gs::date AS date,
+            0 AS worked_hours,
+            -1 AS theoretical_hours
+            """
+
+    def _from_sub2(self):
+        # We generate one record for each of the theoretical working days
+        # since the employee creation / working schedule beginning for not
+        # depending on the registered attendances, bounded to the refreshed
+        # dates (NULL bounds are ignored by greatest and least).
+        start = """greatest(
+                        COALESCE(he.theoretical_hours_start_date,
+                                 he.create_date::date),
+                        COALESCE(rca.date_from,
+                                 he.theoretical_hours_start_date,
+                                 he.create_date::date),
+                        %(date_from)s::date
+                    )"""
+        stop = """least(
+                        COALESCE(rca.date_to, current_date),
+                        current_date,
+                        %(date_to)s::date
+                    )"""
+        return """
+                hr_employee he
+            INNER JOIN
+                resource_resource rr ON he.resource_id = rr.id
+            LEFT JOIN
+                resource_calendar_attendance rca
+                    ON rca.calendar_id = rr.calendar_id
+            CROSS JOIN
+                generate_series(
+                    %(start)s
+                    + (8 + rca.dayofweek::int -
+                        extract(dow from %(start)s)::int) %%%% 7,
+                    %(stop)s
+                    + (-6 + rca.dayofweek::int -
+                        extract(dow from %(stop)s)::int) %%%% 7,
+                    '7 days'
+                ) AS gs
+            """ % {
+            'start': start,
+            'stop': stop,
+        }
+
+    def _where_sub2(self, employees, date_from, date_to):
+        return "rca.id IS NOT NULL AND " + self._where_scope(
+            'he.id', 'gs::date', employees, date_from, date_to,
+        )
+
+    @api.model
+    def _refresh(self, employees=None, date_from=None, date_to=None,
+                 reset=False, missing_only=False, dates=None):
+        """Regenerate rows of the given employees (or all of them) between
+        given dates (or unbounded), removing the days that are not worked nor
+        theoretical anymore.
+
+        :param: employees: Employees recordset, or None for all of them.
+        :param: reset: Mark theoretical hours of days without attendances as
+          pending to be computed, for changes that affect them.
+        :param: missing_only: Only generate the days without row, leaving
+          the existing ones untouched.
+        :param: dates: Only regenerate these dates, bounding the period to
+          them, for scattered dates refreshed at once.
+        """
+        if employees is not None and not employees:
+            return
+        where_dates = where_removed_dates = "True"
+        if dates is not None:
+            if not dates:
+                return
+            dates = tuple(sorted(set(dates)))
+            date_from = max(date_from or dates[0], dates[0])
+            date_to = min(date_to or dates[-1], dates[-1])
+            where_dates = "date IN %(dates)s"
+            where_removed_dates = "d.date IN %(dates)s"
+        if missing_only:
+            removed = ""
+            on_conflict = "DO NOTHING"
+        else:
+            removed = """, removed AS (
+    DELETE FROM %s AS d
+    WHERE %s AND %s
+        AND NOT EXISTS (
+            SELECT 1 FROM days
+            WHERE days.employee_id = d.employee_id AND days.date = d.date
+        )
+)""" % (
+                self._table,
+                self._where_scope(
+                    'd.employee_id', 'd.date', employees, date_from, date_to,
+                ),
+                where_removed_dates,
+            )
+            on_conflict = """DO UPDATE SET
+    worked_hours = EXCLUDED.worked_hours,
+    theoretical_hours = CASE
+        WHEN %(reset)s OR EXCLUDED.theoretical_hours >= 0
+            THEN EXCLUDED.theoretical_hours
+        ELSE d.theoretical_hours
+    END"""
+        # Worked days take the theoretical hours stored on the attendances,
+        # the same as non worked days once computed
+        self.env.cr.execute(
+            """
+WITH days AS (
+    SELECT
+        employee_id,
+        date,
+        sum(worked_hours) AS worked_hours,
+        COALESCE(max(theoretical_hours), -1) AS theoretical_hours
+    FROM (
+        (
+            SELECT %(select_sub1)s
+            FROM %(from_sub1)s
+            WHERE %(where_sub1)s
+        )
+        UNION ALL (
+            SELECT %(select_sub2)s
+            FROM %(from_sub2)s
+            WHERE %(where_sub2)s
+        )
+    ) AS u
+    WHERE %(where_dates)s
+    GROUP BY employee_id, date
+)%(removed)s
+INSERT INTO %(table)s AS d (employee_id, date, worked_hours, theoretical_hours)
+SELECT employee_id, date, worked_hours, theoretical_hours
+FROM days
+ON CONFLICT (employee_id, date) %(on_conflict)s
+            """ % {
+                'table': self._table,
+                'select_sub1': self._select_sub1(),
+                'from_sub1': self._from_sub1(),
+                'where_sub1': self._where_sub1(employees, date_from, date_to),
+                'select_sub2': self._select_sub2(),
+                'from_sub2': self._from_sub2(),
+                'where_sub2': self._where_sub2(employees, date_from, date_to),
+                'where_dates': where_dates,
+                'removed': removed,
+                'on_conflict': on_conflict,
+            }, {
+                'employee_ids': tuple(employees.ids) if employees is not None
+                else None,
+                'date_from': date_from,
+                'date_to': date_to,
+                'reset': reset,
+                'dates': dates,
+            },
+        )
+        self.invalidate_cache(
+            ['employee_id', 'date', 'worked_hours', 'theoretical_hours'],
+        )
+
+    @api.model
+    def _refresh_days(self, days, reset=False):
+        """Refresh given (employee, date) pairs, in one pass per employee."""
+        ranges = {}
+        for employee, date in days:
+            dates = ranges.setdefault(employee, [date, date])
+            dates[0] = min(dates[0], date)
+            dates[1] = max(dates[1], date)
+        for employee, (date_from, date_to) in ranges.items():
+            self._refresh(employee, date_from, date_to, reset=reset)
+
+    @api.model
+    def _store_theoretical_hours(self, values):
+        """Store at once theoretical hours given as a list of
+        (employee_id, date, hours) tuples.
+        """
+        if not values:
+            return
+        execute_values(
+            self.env.cr,
+            """
+            UPDATE %s AS d
+            SET theoretical_hours = v.hours
+            FROM (VALUES %%s) AS v (employee_id, date, hours)
+            WHERE d.employee_id = v.employee_id AND d.date = v.date
+            """ % self._table,
+            values,
+            template="(%s, %s::date, %s::float)",
+            page_size=1000,
+        )
+        self.invalidate_cache(['theoretical_hours'])
+
+    @api.model
+    def _set_last_refresh_date(self, date):
+        self.env['ir.config_parameter'].sudo().set_param(
+            LAST_REFRESH_DATE_PARAM, fields.Date.to_string(date),
+        )
+
+    @api.model
+    def _get_last_refresh_date(self):
+        return fields.Date.to_date(
+            self.env['ir.config_parameter'].sudo().get_param(
+                LAST_REFRESH_DATE_PARAM,
+            )
+        )
+
+    @api.model
+    def _cron_refresh(self):
+        """Generate the days elapsed since the last generated one, kept in a
+        system parameter, as rows of some employees may go beyond it (future
+        attendances). All the days are regenerated if it's missing.
+        """
+        date_to = fields.Date.context_today(self)
+        date_from = self._get_last_refresh_date()
+        self._refresh(
+            date_from=date_from and min(date_from, date_to),
+            date_to=date_to,
+        )
+        self._set_last_refresh_date(date_to)
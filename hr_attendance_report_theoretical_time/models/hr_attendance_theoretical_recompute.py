@@ -0,0 +1,145 @@
+# Copyright 2017-2019 Tecnativa - Pedro M. Baeza
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import logging
+from datetime import datetime, time, timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class HrAttendanceTheoreticalRecompute(models.Model):
+    """Pending recomputation of the theoretical hours stored on the
+    attendances of an employee, processed in background by a scheduled
+    action.
+
+    Attendances are processed in batches by ascending ID, committing the
+    progress after each batch, so that an interrupted job is resumed where
+    it was left. Jobs are removed once finished.
+    """
+    _name = "hr.attendance.theoretical.recompute"
+    _description = "Pending recomputation of attendances theoretical hours"
+    _order = 'id'
+    _rec_name = 'employee_id'
+
+    employee_id = fields.Many2one(
+        comodel_name='hr.employee',
+        string="Employee",
+        required=True,
+        index=True,
+        ondelete='cascade',
+        readonly=True,
+    )
+    date_from = fields.Date(
+        string="From",
+        readonly=True,
+    )
+    date_to = fields.Date(
+        string="To",
+        readonly=True,
+    )
+    last_attendance_id = fields.Integer(
+        string="Last processed attendance",
+        readonly=True,
+    )
+
+    @api.model
+    def _get_batch_size(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'hr_attendance_report_theoretical_time.recompute_batch_size',
+            10000,
+        ))
+
+    @api.model
+    def _enqueue(self, employees=None, date_from=None, date_to=None):
+        """Schedule the recomputation of the attendances of the given
+        employees (or all of them) between given dates (or unbounded),
+        widening the pending job of an employee if there's any.
+        """
+        if employees is None:
+            employees = self.env['hr.employee'].with_context(
+                active_test=False,
+            ).search([])
+        pending = {
+            job.employee_id: job for job in self.sudo().search([
+                ('employee_id', 'in', employees.ids),
+            ])
+        }
+        vals_list = []
+        for employee in employees:
+            job = pending.get(employee)
+            if not job:
+                vals_list.append({
+                    'employee_id': employee.id,
+                    'date_from': date_from,
+                    'date_to': date_to,
+                })
+                continue
+            job.write({
+                'date_from': job.date_from and date_from and min(
+                    job.date_from, fields.Date.to_date(date_from),
+                ),
+                'date_to': job.date_to and date_to and max(
+                    job.date_to, fields.Date.to_date(date_to),
+                ),
+                'last_attendance_id': 0,
+            })
+        return self.sudo().create(vals_list)
+
+    @api.multi
+    def _get_attendances_domain(self):
+        self.ensure_one()
+        domain = [
+            ('employee_id', '=', self.employee_id.id),
+            ('id', '>', self.last_attendance_id),
+        ]
+        if self.date_from:
+            domain.append(
+                ('check_in', '>=', datetime.combine(self.date_from, time.min)),
+            )
+        if self.date_to:
+            domain.append(
+                ('check_in', '<', datetime.combine(
+                    self.date_to + timedelta(days=1), time.min,
+                )),
+            )
+        return domain
+
+    @api.multi
+    def _commit(self):
+        if not self.pool.in_test_mode():
+            self.env.cr.commit()
+
+    @api.multi
+    def _process(self):
+        """Recompute attendances of the jobs batch by batch, saving the
+        progress after each one.
+        """
+        attendance_obj = self.env['hr.attendance'].sudo()
+        batch_size = max(self._get_batch_size(), 1)
+        for job in self:
+            while True:
+                attendances = attendance_obj.search(
+                    job._get_attendances_domain(), order='id',
+                    limit=batch_size,
+                )
+                if not attendances:
+                    job.unlink()
+                    job._commit()
+                    break
+                attendances._recompute_theoretical_hours()
+                job.last_attendance_id = attendances[-1].id
+                job._commit()
+                # Don't keep the processed attendances in memory
+                self.env.clear()
+
+    @api.model
+    def _cron_process(self):
+        """Process all the pending jobs."""
+        jobs = self.search([])
+        _logger.info(
+            "Recomputing theoretical hours of attendances for %s "
+            "employee(s)", len(jobs),
+        )
+        jobs._process()
@@ -1,7 +1,7 @@
 # Copyright 2018 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class HrEmployee(models.Model):
@@ -13,3 +13,39 @@ class HrEmployee(models.Model):
              "not filled, employee creation date or the calendar start date "
              "will be used (the greatest of both).",
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['hr.attendance.theoretical.day']._refresh(records)
+        return records
+
+    @api.multi
+    def write(self, vals):
+        res = super().write(vals)
+        if any(x in vals for x in self._get_theoretical_days_fields()):
+            self.env['hr.attendance.theoretical.day']._refresh(
+                self, reset=True,
+            )
+        if any(x in vals for x in self._get_theoretical_hours_fields()):
+            self.env['hr.attendance.theoretical.recompute']._enqueue(self)
+        return res
+
+    def _get_theoretical_days_fields(self):
+        """Fields of the employee that determine theoretical days."""
+        return [
+            'theoretical_hours_start_date',
+            'resource_calendar_id',
+            'resource_id',
+            'address_id',
+        ]
+
+    def _get_theoretical_hours_fields(self):
+        """Fields of the employee that determine theoretical hours of the
+        attendances.
+        """
+        return [
+            'resource_calendar_id',
+            'resource_id',
+            'address_id',
+        ]
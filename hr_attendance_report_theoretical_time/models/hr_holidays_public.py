@@ -2,6 +2,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 from odoo import api, fields, models
+from odoo.osv import expression
 from datetime import datetime, time
 
 
@@ -15,35 +16,56 @@ class HrHolidaysPublicLine(models.Model):
 
         :param: date: Date for recomputing attendances.
         """
-        if not date:
+        self._check_theoretical_hours_dates([date])
+
+    @api.model
+    def _check_theoretical_hours_dates(self, dates):
+        """Recomputes at once all the theoretical hours that corresponds to
+        the dates of the public holidays.
+
+        :param: dates: Dates for recomputing attendances.
+        """
+        dates = {
+            fields.Date.from_string(date) if isinstance(date, str) else date
+            for date in dates if date
+        }
+        if not dates:
             return
-        if isinstance(date, str):
-            date = fields.Date.from_string(date)
-        from_datetime = datetime.combine(date, time(0, 0, 0, 0))
-        to_datetime = datetime.combine(date, time(23, 59, 59, 99999))
-        records = self.env['hr.attendance'].search([
-            ('check_in', '>=', fields.Datetime.to_string(from_datetime)),
-            ('check_in', '<=', fields.Datetime.to_string(to_datetime)),
-        ])
-        records._compute_theoretical_hours()
+        self.env['hr.attendance.theoretical.day']._refresh(
+            dates=dates, reset=True,
+        )
+        records = self.env['hr.attendance'].search(expression.OR([[
+            ('check_in', '>=', fields.Datetime.to_string(
+                datetime.combine(date, time(0, 0, 0, 0)),
+            )),
+            ('check_in', '<=', fields.Datetime.to_string(
+                datetime.combine(date, time(23, 59, 59, 99999)),
+            )),
+        ] for date in sorted(dates)]))
+        records._recompute_theoretical_hours()
 
     @api.model_create_multi
     def create(self, vals_list):
-        """Trigger recomputation for the date of the new lines."""
+        """Trigger recomputation for the dates of the new lines."""
         records = super(HrHolidaysPublicLine, self).create(vals_list)
-        for record in records:
-            self._check_theoretical_hours(record.date)
+        self._check_theoretical_hours_dates(records.mapped('date'))
         return records
 
     def write(self, vals):
-        """If the date of a line is changed, we first recompute hours of the
-        previous date, and then the theoretical hours of the current date.
+        """If the date of a line is changed, we recompute hours of both the
+        previous dates and the current date.
         """
         if 'date' in vals:
             dates = set(self.mapped('date'))
             dates.add(vals['date'])
         res = super(HrHolidaysPublicLine, self).write(vals)
         if 'date' in vals:
-            for date in dates:
-                self._check_theoretical_hours(date=date)
+            self._check_theoretical_hours_dates(dates)
+        return res
+
+    def unlink(self):
+        """Trigger recomputation for the dates of the removed lines."""
+        dates = set(self.mapped('date'))
+        res = super(HrHolidaysPublicLine, self).unlink()
+        self._check_theoretical_hours_dates(dates)
         return res
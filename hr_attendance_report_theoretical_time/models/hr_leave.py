@@ -40,4 +40,4 @@ class HrLeave(models.Model):
                 ('check_in', '>=', from_datetime),
                 ('check_in', '<=', to_datetime),
             ])
-        to_recompute._compute_theoretical_hours()
+        to_recompute._recompute_theoretical_hours()
@@ -1,7 +1,7 @@
 # Copyright 2018-2019 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class HrLeaveType(models.Model):
@@ -12,3 +12,17 @@ class HrLeaveType(models.Model):
         help="If you check this mark, leaves in this category won't reduce "
              "the number of theoretical hours in the attendance report.",
     )
+
+    @api.multi
+    def write(self, vals):
+        res = super().write(vals)
+        if 'include_in_theoretical' in vals:
+            leave_obj = self.env['resource.calendar.leaves']
+            scopes = leave_obj.search([
+                ('holiday_id.holiday_status_id', 'in', self.ids),
+            ])._get_theoretical_days_scopes()
+            leave_obj._refresh_theoretical_days(scopes)
+            recompute_obj = self.env['hr.attendance.theoretical.recompute']
+            for employees, date_from, date_to in scopes:
+                recompute_obj._enqueue(employees, date_from, date_to)
+        return res
@@ -0,0 +1,40 @@
+# Copyright 2017-2019 Tecnativa - Pedro M. Baeza
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = 'resource.calendar.attendance'
+
+    def _refresh_theoretical_days(self, calendars):
+        """Regenerate the days of the employees of the changed calendars, and
+        schedule the recomputation of their attendances.
+        """
+        employees = self.env['hr.employee'].with_context(
+            active_test=False,
+        ).search([('resource_calendar_id', 'in', calendars.ids)])
+        self.env['hr.attendance.theoretical.day']._refresh(
+            employees, reset=True,
+        )
+        self.env['hr.attendance.theoretical.recompute']._enqueue(employees)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._refresh_theoretical_days(records.mapped('calendar_id'))
+        return records
+
+    @api.multi
+    def write(self, vals):
+        calendars = self.mapped('calendar_id')
+        res = super().write(vals)
+        self._refresh_theoretical_days(calendars | self.mapped('calendar_id'))
+        return res
+
+    @api.multi
+    def unlink(self):
+        calendars = self.mapped('calendar_id')
+        res = super().unlink()
+        self._refresh_theoretical_days(calendars)
+        return res
@@ -0,0 +1,68 @@
+# Copyright 2017-2019 Tecnativa - Pedro M. Baeza
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from datetime import timedelta
+
+from odoo import api, models
+
+
+class ResourceCalendarLeaves(models.Model):
+    _inherit = 'resource.calendar.leaves'
+
+    @api.multi
+    def _get_theoretical_days_scopes(self):
+        """Get the (employees, date_from, date_to) scopes of days covered by
+        the leaves. Dates are widened by one day as they are in UTC.
+        """
+        employee_obj = self.env['hr.employee'].with_context(
+            active_test=False,
+        )
+        scopes = []
+        for record in self.filtered(lambda x: x.date_from and x.date_to):
+            if record.resource_id:
+                employees = employee_obj.search([
+                    ('resource_id', '=', record.resource_id.id),
+                ])
+            elif record.calendar_id:
+                employees = employee_obj.search([
+                    ('resource_calendar_id', '=', record.calendar_id.id),
+                ])
+            else:
+                employees = None
+            scopes.append((
+                employees,
+                record.date_from.date() - timedelta(days=1),
+                record.date_to.date() + timedelta(days=1),
+            ))
+        return scopes
+
+    @api.model
+    def _refresh_theoretical_days(self, scopes):
+        """Mark theoretical hours of the days in the given scopes as pending
+        to be computed.
+        """
+        day_obj = self.env['hr.attendance.theoretical.day']
+        for employees, date_from, date_to in scopes:
+            day_obj._refresh(employees, date_from, date_to, reset=True)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._refresh_theoretical_days(records._get_theoretical_days_scopes())
+        return records
+
+    @api.multi
+    def write(self, vals):
+        scopes = self._get_theoretical_days_scopes()
+        res = super().write(vals)
+        self._refresh_theoretical_days(
+            scopes + self._get_theoretical_days_scopes(),
+        )
+        return res
+
+    @api.multi
+    def unlink(self):
+        scopes = self._get_theoretical_days_scopes()
+        res = super().unlink()
+        self._refresh_theoretical_days(scopes)
+        return res
@@ -2,7 +2,8 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 from odoo import api, fields, models, tools
-from datetime import datetime, time
+from odoo.addons.resource.models.resource import Intervals
+from datetime import datetime, time, timedelta
 from psycopg2.extensions import AsIs
 import pytz
 
@@ -36,106 +37,19 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
     )
 
     def _select(self):
-        # We put "max" aggregation function for theoretical hours because
-        # we will recompute for other detail levels different than day
-        # through recursivity by day results and will aggregate them manually
         return """
-            min(id) AS id,
-            employee_id,
-            date,
-            sum(worked_hours) AS worked_hours,
-            max(theoretical_hours) AS theoretical_hours,
-            sum(difference) AS difference
+            d.id AS id,
+            d.employee_id AS employee_id,
+            d.date AS date,
+            d.worked_hours AS worked_hours,
+            d.theoretical_hours AS theoretical_hours,
+            d.worked_hours - greatest(d.theoretical_hours, 0) AS difference
             """
 
-    def _select_sub1(self):
-        # Unique ID is assured (mostly, as we lose some precission) through
-        # this MD5 hash converted to integer. See
-        # https://stackoverflow.com/a/9812029 for details.
+    def _from(self):
+        # Days are materialized in this table, see its model for details
         return """
-            (
-                ('x'||substr(MD5('HA' || ha.id::text), 1, 8))::bit(32)::int
-            ) AS id,
-            ha.employee_id AS employee_id,
-            ha.check_in::date AS date,
-            ha.worked_hours AS worked_hours,
-            ha.theoretical_hours AS theoretical_hours,
-            0.0 AS difference
-            """
-
-    def _from_sub1(self):
-        return """
-            hr_attendance ha
-            """
-
-    def _where_sub1(self):
-        return "True"
-
-    def _select_sub2(self):
-        # Same comment about ID uniqueness of sub1.
-        return """
-            (
-                ('x'||substr(MD5(
-                    'HE' || he.id::text || gs::text
-                ), 1, 8))::bit(32)::int
-            ) AS id,
-            he.id AS employee_id,
-            gs::date AS date,
-            0 AS worked_hours,
-            -1 AS theoretical_hours,
-            0.0 AS difference
-            """
-
-    def _from_sub2(self):
-        # We generate one record for each of the theoretical working days
-        # since the employee creation / working schedule beginning for not
-        # depending on the registered attendances.
-        return """
-                hr_employee he
-            INNER JOIN
-                resource_resource rr ON he.resource_id = rr.id
-            LEFT JOIN
-                resource_calendar_attendance rca
-                    ON rca.calendar_id = rr.calendar_id
-            CROSS JOIN
-                generate_series(
-                    greatest(
-                        COALESCE(he.theoretical_hours_start_date,
-                                 he.create_date::date),
-                        COALESCE(rca.date_from,
-                                 he.theoretical_hours_start_date,
-                                 he.create_date::date)
-                    )
-                    + (8 + rca.dayofweek::int -
-                        extract(dow from greatest(
-                            COALESCE(he.theoretical_hours_start_date,
-                                     he.create_date::date),
-                            COALESCE(rca.date_from,
-                                     he.theoretical_hours_start_date,
-                                     he.create_date::date)
-                        ))::int) % 7,
-                    least(
-                        COALESCE(rca.date_to, current_date),
-                        current_date
-                    )
-                    + (-6 + rca.dayofweek::int -
-                        extract(dow from least(
-                            COALESCE(rca.date_to, current_date),
-                            current_date
-                        ))::int) % 7,
-                    '7 days'
-                ) AS gs
-            """
-
-    def _where_sub2(self):
-        return """
-            rca.id IS NOT NULL
-            """
-
-    def _group_by(self):
-        return """
-            employee_id,
-            date
+            hr_attendance_theoretical_day d
             """
 
     @api.model_cr
@@ -145,40 +59,22 @@ class HrAttendanceTheoreticalTimeReport(models.Model):
             """
 CREATE or REPLACE VIEW %s as (
     SELECT %s
-    FROM (
-        (
-            SELECT %s
-            FROM %s
-            WHERE %s
-        )
-        UNION (
-            SELECT %s
-            FROM %s
-            WHERE %s
-        )
-    ) AS u
-    GROUP BY %s
+    FROM %s
 )
             """, (
                 AsIs(self._table),
                 AsIs(self._select()),
-                AsIs(self._select_sub1()),
-                AsIs(self._from_sub1()),
-                AsIs(self._where_sub1()),
-                AsIs(self._select_sub2()),
-                AsIs(self._from_sub2()),
-                AsIs(self._where_sub2()),
-                AsIs(self._group_by()),
+                AsIs(self._from()),
             )
         )
 
-    # TODO: To be activated for performance assuring cache clearing on changes
-    # @tools.ormcache('employee.id', 'date')
     @api.model
     def _theoretical_hours(self, employee, date):
         """Get theoretical working hours for the day where the check-in is
         done for that employee.
         """
+        if isinstance(date, datetime):
+            date = date.date()
         if not employee.resource_id.calendar_id:
             return 0
         tz = employee.resource_id.calendar_id.tz
@@ -192,51 +88,216 @@ CREATE or REPLACE VIEW %s as (
             ),
             # Pass this domain for excluding leaves whose type is included in
             # theoretical hours
-            domain=[
-                '|',
-                ('holiday_id', '=', False),
-                ('holiday_id.holiday_status_id.include_in_theoretical',
-                 '=', False),
-            ],
+            domain=self._theoretical_hours_domain(),
         )['hours']
 
+    def _theoretical_hours_domain(self):
+        return [
+            '|',
+            ('holiday_id', '=', False),
+            ('holiday_id.holiday_status_id.include_in_theoretical',
+             '=', False),
+        ]
+
+    @api.model
+    def _theoretical_hours_range(self, employee, date_from, date_to):
+        """Get theoretical working hours of each day between both dates
+        (included) for that employee, as a {date: hours} dictionary.
+        """
+        hours = self._theoretical_hours_range_batch(
+            employee, date_from, date_to,
+        )[employee.id]
+        return {
+            date_from + timedelta(days=x): hours.get(
+                date_from + timedelta(days=x), 0,
+            ) for x in range((date_to - date_from).days + 1)
+        }
+
+    @api.model
+    def _theoretical_hours_range_batch(self, employees, date_from, date_to):
+        """Get theoretical working hours of the days between both dates
+        (included) for those employees, as a {employee ID: {date: hours}}
+        dictionary where days without theoretical hours are left out.
+
+        Attendances of the working schedules are expanded once for the whole
+        range per calendar and timezone, and leaves of all the employees are
+        read at once, to be then split by day with the same bounds as
+        `_theoretical_hours`, so that both give the same amounts. Callers
+        are expected to bound the range and the number of employees, see
+        `_iter_theoretical_hours_dates_batch`.
+        """
+        days = [
+            date_from + timedelta(days=x)
+            for x in range((date_to - date_from).days + 1)
+        ]
+        result = {x.id: {} for x in employees}
+        employees = employees.filtered(lambda x: x.resource_id.calendar_id)
+        if not employees or not days:
+            return result
+        bounds = {}
+        for employee in employees:
+            tz = pytz.timezone(employee.resource_id.calendar_id.tz)
+            bounds[employee.id] = (
+                tz,
+                datetime.combine(days[0], time(0, 0, 0, 0, tzinfo=tz)),
+                datetime.combine(
+                    days[-1], time(23, 59, 59, 99999, tzinfo=tz)
+                ),
+            )
+        leaves = self.env['resource.calendar'].with_context(
+            exclude_public_holidays=True,
+        )._leave_intervals_batch(
+            min(x[1] for x in bounds.values()),
+            max(x[2] for x in bounds.values()),
+            employees.mapped('resource_id'),
+            domain=self._theoretical_hours_domain(),
+        )
+        attendances = {}
+        windows = {}
+        for employee in employees:
+            resource = employee.resource_id
+            tz, start_dt, end_dt = bounds[employee.id]
+            key = (resource.calendar_id, resource.tz)
+            if key not in attendances:
+                attendances[key] = resource.calendar_id._attendance_intervals(
+                    start_dt, end_dt, resource,
+                )
+            if tz not in windows:
+                windows[tz] = Intervals(
+                    (
+                        datetime.combine(day, time(0, 0, 0, 0, tzinfo=tz)),
+                        datetime.combine(
+                            day, time(23, 59, 59, 99999, tzinfo=tz)
+                        ),
+                        self.env['resource.calendar.attendance'],
+                    ) for day in days
+                )
+            intervals = attendances[key] - leaves[resource.id]
+            hours = result[employee.id]
+            for start, stop, meta in intervals & windows[tz]:
+                date = start.astimezone(tz).date()
+                hours[date] = hours.get(date, 0) + employee._get_work_hours(
+                    start, stop, meta,
+                )
+        return result
+
+    @api.model
+    def _theoretical_hours_dates(self, employee, dates):
+        """Get theoretical working hours of the given dates for that employee,
+        as a {date: hours} dictionary.
+        """
+        return self._theoretical_hours_dates_batch(
+            {employee: dates},
+        )[employee.id]
+
+    @api.model
+    def _theoretical_hours_dates_batch(self, employee_dates):
+        """Get theoretical working hours of the given dates of several
+        employees, given as a {employee: dates} dictionary, as a
+        {employee ID: {date: hours}} one.
+        """
+        result = {x.id: {} for x in employee_dates}
+        for values in self._iter_theoretical_hours_dates_batch(
+                employee_dates):
+            for employee_id, date, hours in values:
+                result[employee_id][date] = hours
+        return result
+
+    @api.model
+    def _iter_theoretical_hours_dates_batch(self, employee_dates,
+                                            chunk_size=100, max_days=92):
+        """Generate the theoretical working hours of the given dates of
+        several employees, given as a {employee: dates} dictionary, as lists
+        of (employee ID, date, hours) tuples.
+
+        Each run of close dates is computed at once for the employees with
+        dates in it, by chunks of at most `chunk_size` employees and
+        `max_days` days, so that only one chunk is kept in memory.
+        """
+        employee_obj = next(iter(employee_dates), self.env['hr.employee'])
+        dates = sorted(set().union(*employee_dates.values()))
+        while dates:
+            index = 1
+            while (index < len(dates) and
+                   (dates[index] - dates[index - 1]).days <= 31 and
+                   (dates[index] - dates[0]).days < max_days):
+                index += 1
+            run = set(dates[:index])
+            pending = {}
+            for employee, employee_run in employee_dates.items():
+                employee_run = run.intersection(employee_run)
+                if employee_run:
+                    pending[employee] = employee_run
+            employees = employee_obj.browse().union(*pending)
+            for offset in range(0, len(employees), chunk_size):
+                chunk = employees[offset:offset + chunk_size]
+                hours = self._theoretical_hours_range_batch(
+                    chunk, dates[0], dates[index - 1],
+                )
+                yield [
+                    (employee.id, date, hours[employee.id].get(date, 0))
+                    for employee in chunk
+                    for date in sorted(pending[employee])
+                ]
+            dates = dates[index:]
+
+    @api.model
+    def _compute_pending_theoretical_hours(self, domain, chunk_size=100):
+        """Compute and store the theoretical hours still pending of the days
+        matching the domain, by chunks of employees whose days are collected
+        in a single query, each chunk being stored as soon as computed.
+        """
+        domain = domain + [('theoretical_hours', '<', 0)]
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, params = query.get_sql()
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT employee_id
+            FROM %s
+            WHERE %s
+            ORDER BY employee_id
+            """ % (from_clause, where_clause or 'True'),
+            params,
+        )
+        employee_ids = [x[0] for x in self.env.cr.fetchall()]
+        day_obj = self.env['hr.attendance.theoretical.day']
+        employee_obj = self.env['hr.employee'].sudo()
+        for index in range(0, len(employee_ids), chunk_size):
+            chunk = employee_ids[index:index + chunk_size]
+            query = self._where_calc(domain + [('employee_id', 'in', chunk)])
+            self._apply_ir_rules(query, 'read')
+            from_clause, where_clause, params = query.get_sql()
+            self.env.cr.execute(
+                """
+                SELECT employee_id, array_agg(date ORDER BY date)
+                FROM %s
+                WHERE %s
+                GROUP BY employee_id
+                """ % (from_clause, where_clause or 'True'),
+                params,
+            )
+            employee_dates = {
+                employee_obj.browse(employee_id): dates
+                for employee_id, dates in self.env.cr.fetchall()
+            }
+            for values in self._iter_theoretical_hours_dates_batch(
+                    employee_dates, chunk_size=chunk_size):
+                day_obj._store_theoretical_hours(values)
+            # Don't keep the records of the processed chunk in memory
+            employee_obj.browse(chunk).invalidate_cache(ids=chunk)
+        self.invalidate_cache(['theoretical_hours', 'difference'])
+
     @api.model
     def read_group(self, domain, fields, groupby, offset=0, limit=None,
                    orderby=False, lazy=True):
-        """Compute dynamically theoretical hours amount, computing on the fly
-        theoretical hours for non existing attendances with stored hours.
-        This technique has proven to be more efficient than trying to call
-        recursively `read_group` grouping by date and employee.
+        """Compute first theoretical hours still pending on the matching
+        days, so that all the amounts are then aggregated by the database.
         """
-        res = super(HrAttendanceTheoreticalTimeReport, self).read_group(
+        if any(x.split(':')[0] in {'theoretical_hours', 'difference'}
+               for x in fields):
+            self._compute_pending_theoretical_hours(domain)
+        return super(HrAttendanceTheoreticalTimeReport, self).read_group(
             domain, fields, groupby, offset=offset, limit=limit,
             orderby=orderby, lazy=lazy,
         )
-        if 'theoretical_hours' not in fields:
-            return res
-        full_fields = all(x in fields for x in {
-            'theoretical_hours',
-            'worked_hours',
-            'difference',
-        })
-        difference_field = 'difference' in fields
-        for line in res:
-            day_dict = {}
-            records = self.search(line.get('__domain', domain))
-            for record in records:
-                key = (record.employee_id.id, record.date)
-                if key not in day_dict:
-                    if record.theoretical_hours < 0:
-                        day_dict[key] = self._theoretical_hours(
-                            record.employee_id.sudo(), record.date,
-                        )
-                    else:
-                        day_dict[key] = record.theoretical_hours
-            line['theoretical_hours'] = sum(day_dict.values())
-            if full_fields:  # compute difference
-                line['difference'] = (
-                    (line['worked_hours'] or 0.0) - line['theoretical_hours']
-                )
-            elif difference_field:  # Remove wrong 0 values
-                del line['difference']
-        return res
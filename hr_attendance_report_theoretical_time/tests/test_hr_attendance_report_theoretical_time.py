@@ -1,6 +1,10 @@
 # Copyright 2017-2019 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from odoo import fields
 from odoo.tests import common
 
 
@@ -93,6 +97,9 @@ class TestHrAttendanceReportTheoreticalTime(common.SavepointCase):
                 (cls.employee_1.id, cls.employee_2.id),
             ),
         )
+        cls.env['hr.attendance.theoretical.day']._refresh(
+            cls.employee_1 | cls.employee_2,
+        )
         # Leave for employee 1
         cls.leave = cls.HrLeave.create({
             'date_from': '1946-12-26 00:00:00',
@@ -168,6 +175,33 @@ class TestHrAttendanceReportTheoreticalTime(common.SavepointCase):
         self.assertEqual(self.attendances[2].theoretical_hours, 8)
         self.assertEqual(self.attendances[3].theoretical_hours, 8)
 
+    def test_theoretical_hours_recompute_job(self):
+        recompute_obj = self.env['hr.attendance.theoretical.recompute']
+        self.calendar.attendance_ids.filtered(
+            lambda x: x.hour_from == 14.0).unlink()
+        employees = self.employee_1 | self.employee_2
+        domain = [('employee_id', 'in', employees.ids)]
+        self.assertEqual(
+            recompute_obj.search(domain).mapped('employee_id'), employees,
+        )
+        self.assertEqual(self.attendances[0].theoretical_hours, 8)
+        # Process in several batches
+        self.env['ir.config_parameter'].sudo().set_param(
+            'hr_attendance_report_theoretical_time.recompute_batch_size', 3,
+        )
+        recompute_obj._cron_process()
+        self.assertFalse(recompute_obj.search(domain))
+        # 1946-12-23 - Employee 1
+        self.assertEqual(self.attendances[0].theoretical_hours, 4)
+        self.assertEqual(self.attendances[1].theoretical_hours, 4)
+        # 1946-12-26 - Employee 2
+        self.assertEqual(self.attendances[14].theoretical_hours, 4)
+        day = self.env['hr.attendance.theoretical.day'].search([
+            ('employee_id', '=', self.employee_1.id),
+            ('date', '=', '1946-12-23'),
+        ])
+        self.assertEqual(day.theoretical_hours, 4)
+
     def test_hr_attendance_read_group(self):
         # TODO: Test when having theoretical_hours_start_date set
         # Group by employee
@@ -200,6 +234,13 @@ class TestHrAttendanceReportTheoreticalTime(common.SavepointCase):
         self.assertEqual(res[3]['theoretical_hours'], 0)  # 1946-12-26
         self.assertEqual(res[4]['theoretical_hours'], 8)  # 1946-12-27(virtual)
         self.assertEqual(res[5]['theoretical_hours'], 8)  # 1946-12-30(virtual)
+        # Computed theoretical hours are stored for next reads
+        days = self.env['hr.attendance.theoretical.day'].search([
+            ('date', '>=', '1946-12-23'),
+            ('date', '<', '1946-12-31'),
+            ('employee_id', '=', self.employee_1.id),
+        ])
+        self.assertEqual(days.mapped('theoretical_hours'), [8, 8, 0, 0, 8, 8])
 
     def test_change_hr_holidays_public(self):
         self.public_holiday_global.line_ids[0].write({
@@ -212,6 +253,35 @@ class TestHrAttendanceReportTheoreticalTime(common.SavepointCase):
         self.assertEqual(self.attendances[4].theoretical_hours, 8)
         self.assertEqual(self.attendances[12].theoretical_hours, 8)
 
+    def test_create_hr_holidays_public_lines(self):
+        day_class = type(self.env['hr.attendance.theoretical.day'])
+        with mock.patch.object(
+            day_class, '_refresh', autospec=True,
+            side_effect=day_class._refresh,
+        ) as refresh:
+            self.env['hr.holidays.public.line'].create([{
+                'name': 'Holiday %s' % day,
+                'date': '1946-12-%s' % day,
+                'year_id': self.public_holiday_global.id,
+            } for day in (23, 24)])
+        # Days of all the new lines are refreshed at once, then the days of
+        # the recomputed attendances
+        calls = [x for x in refresh.call_args_list if 'dates' in x[1]]
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(set(calls[0][1]['dates']), {
+            fields.Date.to_date('1946-12-23'),
+            fields.Date.to_date('1946-12-24'),
+        })
+        # 1946-12-23 and 1946-12-24 - Employee 1
+        self.assertEqual(self.attendances[0].theoretical_hours, 0)
+        self.assertEqual(self.attendances[2].theoretical_hours, 0)
+        days = self.env['hr.attendance.theoretical.day'].search([
+            ('date', '>=', '1946-12-23'),
+            ('date', '<=', '1946-12-24'),
+            ('employee_id', '=', self.employee_1.id),
+        ])
+        self.assertEqual(days.mapped('theoretical_hours'), [0, 0])
+
     def test_change_hr_holidays(self):
         self.leave.action_refuse()
         # 1946-12-26 - Employee 2
@@ -219,10 +289,161 @@ class TestHrAttendanceReportTheoreticalTime(common.SavepointCase):
 
     def test_hr_holidays_status_include_in_theoretical(self):
         obj = self.env['hr.attendance.theoretical.time.report']
-        self.leave.holiday_status_id.include_in_theoretical = True
         # 1946-12-26 - Employee 1
         a = self.attendances[6]
+        self.assertEqual(obj._theoretical_hours(a.employee_id, a.check_in), 0)
+        self.leave.holiday_status_id.include_in_theoretical = True
+        self.assertEqual(obj._theoretical_hours(a.employee_id, a.check_in), 8)
+
+    def test_theoretical_hours_changes(self):
+        obj = self.env['hr.attendance.theoretical.time.report']
+        a = self.attendances[0]
         self.assertEqual(obj._theoretical_hours(a.employee_id, a.check_in), 8)
+        self.calendar.attendance_ids.filtered(
+            lambda x: x.hour_from == 14.0).unlink()
+        self.assertEqual(obj._theoretical_hours(a.employee_id, a.check_in), 4)
+        self.public_holiday_global.line_ids[0].date = '1946-12-23'
+        self.assertEqual(obj._theoretical_hours(a.employee_id, a.check_in), 0)
+
+    def test_theoretical_hours_range(self):
+        obj = self.env['hr.attendance.theoretical.time.report']
+        date_from = fields.Date.to_date('1946-12-23')
+        date_to = fields.Date.to_date('1946-12-30')
+        for employee in self.employee_1 | self.employee_2:
+            hours = obj._theoretical_hours_range(employee, date_from, date_to)
+            self.assertEqual(len(hours), 8)
+            for date, amount in hours.items():
+                self.assertAlmostEqual(
+                    amount, obj._theoretical_hours(employee, date),
+                )
+        hours = obj._theoretical_hours_dates(self.employee_2, [
+            date_from, date_to, fields.Date.to_date('1947-06-02'),
+        ])
+        self.assertEqual(hours[date_from], 0)
+        self.assertEqual(hours[date_to], 8)
+        self.assertEqual(len(hours), 3)
+        # All the employees at once, each one with its public holidays
+        employees = self.employee_1 | self.employee_2
+        hours = obj._theoretical_hours_range_batch(
+            employees, date_from, date_to,
+        )
+        for employee in employees:
+            # Only days with theoretical hours are returned
+            self.assertEqual(
+                hours[employee.id],
+                {
+                    date: amount for date, amount in
+                    obj._theoretical_hours_range(
+                        employee, date_from, date_to,
+                    ).items() if amount
+                },
+            )
+        self.assertEqual(hours[self.employee_1.id][date_from], 8)
+        self.assertNotIn(date_from, hours[self.employee_2.id])
+        hours = obj._theoretical_hours_dates_batch({
+            self.employee_1: [date_from],
+            self.employee_2: [date_to],
+        })
+        self.assertEqual(hours, {
+            self.employee_1.id: {date_from: 8},
+            self.employee_2.id: {date_to: 8},
+        })
+        # Runs of dates are split by chunks of employees and days
+        chunks = list(obj._iter_theoretical_hours_dates_batch({
+            self.employee_1: [date_from, date_to],
+            self.employee_2: [date_from, date_to],
+        }, chunk_size=1, max_days=7))
+        self.assertEqual(len(chunks), 4)
+        values = {
+            (employee_id, date): amount
+            for chunk in chunks for employee_id, date, amount in chunk
+        }
+        self.assertEqual(len(values), 4)
+        for employee in employees:
+            for date in (date_from, date_to):
+                self.assertAlmostEqual(
+                    values[employee.id, date],
+                    obj._theoretical_hours(employee, date),
+                )
+
+    def test_theoretical_hours_range_work_hours(self):
+        obj = self.env['hr.attendance.theoretical.time.report']
+
+        def _get_work_hours(employee, start, stop, meta):
+            # Half an hour of rest time per attendance
+            return (stop - start).total_seconds() / 3600 - 0.5
+
+        with mock.patch.object(
+            type(self.employee_2), '_get_work_hours', _get_work_hours,
+            create=True,
+        ):
+            hours = obj._theoretical_hours_range(
+                self.employee_2,
+                fields.Date.to_date('1946-12-30'),
+                fields.Date.to_date('1946-12-31'),
+            )
+        self.assertEqual(list(hours.values()), [7, 7])
+
+    def test_theoretical_days(self):
+        day_obj = self.env['hr.attendance.theoretical.day']
+        domain = [
+            ('employee_id', '=', self.employee_1.id),
+            ('date', '>=', '1946-12-23'),
+            ('date', '<', '1946-12-31'),
+        ]
+        days = day_obj.search(domain)
+        # Attended days and virtual 1946-12-27 and 1946-12-30
+        self.assertEqual(len(days), 6)
+        self.assertEqual(sum(days.mapped('worked_hours')), 32)
+        self.assertEqual(days[0].theoretical_hours, 8)  # 1946-12-23
+        self.assertEqual(days[4].theoretical_hours, -1)  # 1946-12-27
+        # Report rows are identified by the days
+        report = self.env['hr.attendance.theoretical.time.report'].search(
+            domain,
+        )
+        self.assertEqual(report.ids, days.ids)
+        # Removing an attendance day leaves it as a theoretical day
+        self.attendances[0].unlink()
+        self.assertEqual(day_obj.search(domain)[0].worked_hours, 4)
+        # Calendar changes regenerate days
+        self.calendar.attendance_ids.filtered(
+            lambda x: x.dayofweek == '4').unlink()
+        days = day_obj.search(domain)
+        self.assertEqual(len(days), 5)
+        self.assertNotIn(
+            fields.Date.to_date('1946-12-27'), days.mapped('date'),
+        )
+
+    def test_cron_refresh(self):
+        day_obj = self.env['hr.attendance.theoretical.day']
+        today = fields.Date.context_today(day_obj)
+        date_from = today - timedelta(days=14)
+        day_obj._set_last_refresh_date(date_from)
+        domain = [
+            ('employee_id', '=', self.employee_2.id),
+            ('date', '>=', date_from),
+        ]
+        days = day_obj.search(domain)
+        self.assertTrue(days)
+        days.unlink()
+        # A future attendance doesn't hide the days not generated yet
+        self.env['hr.attendance'].create({
+            'employee_id': self.employee_1.id,
+            'check_in': fields.Datetime.to_string(
+                datetime.combine(today + timedelta(days=30), time(8)),
+            ),
+            'check_out': fields.Datetime.to_string(
+                datetime.combine(today + timedelta(days=30), time(12)),
+            ),
+        })
+        day_obj._cron_refresh()
+        self.assertEqual(len(day_obj.search(domain)), len(days))
+        self.assertEqual(
+            self.env['ir.config_parameter'].get_param(
+                'hr_attendance_report_theoretical_time.last_refresh_date',
+            ),
+            fields.Date.to_string(today),
+        )
 
     def test_wizard_theoretical_time(self):
         department = self.env['hr.department'].create({'name': 'Department'})
@@ -243,3 +464,86 @@ class TestHrAttendanceReportTheoreticalTime(common.SavepointCase):
             report['domain'],
             [('employee_id', 'in', [self.employee_1.id])]
         )
+        date_from = fields.Date.to_date('1946-12-23')
+        date_to = fields.Date.to_date('1946-12-27')
+        wizard.write({
+            'date_from': date_from,
+            'date_to': date_to,
+        })
+        day_obj = self.env['hr.attendance.theoretical.day']
+        domain = [('employee_id', '=', self.employee_1.id)]
+        # Days up to the last refresh are not generated again
+        day_obj.search(domain + [('date', '!=', date_from)]).unlink()
+        day_obj._set_last_refresh_date(date_to)
+        wizard.view_report()
+        self.assertEqual(
+            day_obj.search(domain).mapped('date'), [date_from],
+        )
+        # Only the days elapsed since then are, existing ones are kept
+        day = day_obj.search(domain)
+        self.env.cr.execute(
+            "UPDATE hr_attendance_theoretical_day SET theoretical_hours = 1"
+            " WHERE id = %s", (day.id,),
+        )
+        day_obj._set_last_refresh_date(date_from - timedelta(days=1))
+        report = wizard.view_report()
+        self.assertEqual(
+            report['domain'],
+            [('employee_id', 'in', [self.employee_1.id]),
+             ('date', '>=', '1946-12-23'),
+             ('date', '<=', '1946-12-27')]
+        )
+        days = day_obj.search(domain)
+        self.assertEqual(days.mapped('date')[0], date_from)
+        self.assertEqual(days.mapped('date')[-1], date_to)
+        self.assertEqual(len(days), 5)
+        day.invalidate_cache()
+        self.assertEqual(day.theoretical_hours, 1)
+
+    def test_wizard_theoretical_time_export(self):
+        wizard = self.env['wizard.theoretical.time'].create({
+            'employee_ids': [(6, 0, (self.employee_1 | self.employee_2).ids)],
+            'date_from': '1946-12-23',
+            'date_to': '1946-12-27',
+        })
+        rows = list(wizard._get_export_rows(chunk_size=1))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(
+            rows[0], ('Employee 1', '1946-12-23', 8.0, 8.0, 0.0),
+        )
+        # Virtual day computed on the fly and stored
+        self.assertEqual(
+            rows[4], ('Employee 1', '1946-12-27', 0.0, 8.0, -8.0),
+        )
+        day = self.env['hr.attendance.theoretical.day'].search([
+            ('employee_id', '=', self.employee_1.id),
+            ('date', '=', '1946-12-27'),
+        ])
+        self.assertEqual(day.theoretical_hours, 8)
+        self.assertEqual(rows[5][0], 'Employee 2')
+        action = wizard.action_export_csv()
+        self.assertEqual(
+            action['url'],
+            '/hr_attendance_report_theoretical_time/export/%s/csv' % (
+                wizard.id,
+            ),
+        )
+
+    def test_wizard_theoretical_time_export_own(self):
+        user = self.env['res.users'].create({
+            'name': 'Attendance User',
+            'login': 'theoretical_time_attendance_user',
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_user').id,
+                self.env.ref('hr_attendance.group_hr_attendance').id,
+            ])],
+        })
+        self.employee_1.user_id = user
+        wizard = self.env['wizard.theoretical.time'].sudo(user).create({
+            'employee_ids': [(6, 0, (self.employee_1 | self.employee_2).ids)],
+            'date_from': '1946-12-23',
+            'date_to': '1946-12-27',
+        })
+        rows = list(wizard._get_export_rows(chunk_size=1))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row[0] for row in rows}, {'Employee 1'})
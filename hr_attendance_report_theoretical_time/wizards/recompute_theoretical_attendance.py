@@ -32,5 +32,5 @@ class RecomputeTheoreticalAttendance(models.TransientModel):
             ('check_in', '>=', self.date_from),
             ('check_out', '<=', self.date_to),
         ])
-        attendances._compute_theoretical_hours()
+        attendances._recompute_theoretical_hours()
         return {'type': 'ir.actions.act_window_close'}
@@ -1,6 +1,8 @@
 # Copyright 2019 Creu Blanca
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+from datetime import timedelta
+
 from odoo import api, fields, models, _
 
 
@@ -17,6 +19,8 @@ class WizardTheoreticalTime(models.TransientModel):
     category_ids = fields.Many2many(
         'hr.employee.category', string='Tag'
     )
+    date_from = fields.Date(string='From')
+    date_to = fields.Date(string='To')
 
     @api.model
     def default_get(self, fields):
@@ -58,4 +62,131 @@ class WizardTheoreticalTime(models.TransientModel):
             'hr_attendance_theoretical_action'
         ).read()[0]
         action['domain'] = [('employee_id', 'in', self.employee_ids.ids)]
+        self._generate_missing_days()
+        if self.date_from:
+            action['domain'].append(
+                ('date', '>=', fields.Date.to_string(self.date_from)),
+            )
+        if self.date_to:
+            action['domain'].append(
+                ('date', '<=', fields.Date.to_string(self.date_to)),
+            )
         return action
+
+    @api.multi
+    def _generate_missing_days(self):
+        """Generate the days of the period that may be missing. Days up to
+        the last refresh are kept up to date as data changes, so only the
+        ones elapsed since then are generated, and existing rows are left
+        untouched. Without last refresh, the days of the period are.
+        """
+        self.ensure_one()
+        day_obj = self.env['hr.attendance.theoretical.day'].sudo()
+        date_from = self.date_from
+        date_to = self.date_to
+        last_refresh_date = day_obj._get_last_refresh_date()
+        if last_refresh_date:
+            date_from = max(
+                date_from or last_refresh_date,
+                last_refresh_date + timedelta(days=1),
+            )
+            date_to = min(
+                date_to or fields.Date.context_today(self),
+                fields.Date.context_today(self),
+            )
+        elif not date_from:
+            return
+        if date_to and date_from > date_to:
+            return
+        day_obj._refresh(
+            self.employee_ids, date_from, date_to, missing_only=True,
+        )
+
+    @api.multi
+    def _action_export(self, file_format):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/hr_attendance_report_theoretical_time/export/%s/%s' % (
+                self.id, file_format,
+            ),
+            'target': 'self',
+        }
+
+    @api.multi
+    def action_export_csv(self):
+        return self._action_export('csv')
+
+    @api.multi
+    def action_export_xlsx(self):
+        return self._action_export('xlsx')
+
+    def _get_export_header(self):
+        return [
+            _('Employee'), _('Date'), _('Worked'), _('Theoric'),
+            _('Difference'),
+        ]
+
+    @api.multi
+    def _get_export_rows(self, chunk_size=50):
+        """Generate the (employee, date, worked, theoretical, difference)
+        rows of the selected employees within the period, reading the days
+        by chunks of employees, so that only one chunk is kept in memory.
+        Only the rows of the report readable by the user are returned.
+
+        Theoretical hours still pending of each chunk are computed at once,
+        and stored for next reads.
+        """
+        self.ensure_one()
+        day_obj = self.env['hr.attendance.theoretical.day'].sudo()
+        report_obj = self.env['hr.attendance.theoretical.time.report']
+        report_obj.check_access_rights('read')
+        employee_obj = self.env['hr.employee'].sudo()
+        employees = self.employee_ids.sorted('id')
+        for index in range(0, len(employees), chunk_size):
+            chunk = employees[index:index + chunk_size]
+            domain = [('employee_id', 'in', chunk.ids)]
+            if self.date_from:
+                domain.append(('date', '>=', self.date_from))
+            if self.date_to:
+                domain.append(('date', '<=', self.date_to))
+            query = report_obj._where_calc(domain)
+            report_obj._apply_ir_rules(query, 'read')
+            from_clause, where_clause, params = query.get_sql()
+            self.env.cr.execute(
+                """
+                SELECT %(table)s.employee_id, %(table)s.date,
+                    %(table)s.worked_hours, %(table)s.theoretical_hours
+                FROM %(from)s
+                WHERE %(where)s
+                ORDER BY %(table)s.employee_id, %(table)s.date
+                """ % {
+                    'table': report_obj._table,
+                    'from': from_clause,
+                    'where': where_clause or 'True',
+                },
+                params,
+            )
+            days = self.env.cr.fetchall()
+            pending = {}
+            for employee_id, date, worked, theoretical in days:
+                if theoretical < 0:
+                    pending.setdefault(
+                        employee_obj.browse(employee_id), [],
+                    ).append(date)
+            computed = report_obj._theoretical_hours_dates_batch(pending)
+            day_obj._store_theoretical_hours([
+                (employee_id, date, hours)
+                for employee_id, dates in computed.items()
+                for date, hours in dates.items()
+            ])
+            names = {x.id: x.name for x in chunk}
+            for employee_id, date, worked, theoretical in days:
+                if theoretical < 0:
+                    theoretical = computed[employee_id][date]
+                yield (
+                    names[employee_id], fields.Date.to_string(date), worked,
+                    theoretical, worked - theoretical,
+                )
+            # Don't keep the records of the processed chunk in memory
+            chunk.invalidate_cache(ids=chunk.ids)
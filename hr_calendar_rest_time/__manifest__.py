@@ -5,7 +5,7 @@
     'name': 'HR Calendar Rest Time',
     'summary': """
         Adds rest time to the calendar attendance records.""",
-    'version': '12.0.1.0.1',
+    'version': '12.0.1.1.0',
     'license': 'AGPL-3',
     'author': 'Creu Blanca, Odoo Community Association (OCA)',
     'website': 'https://github.com/OCA/hr',
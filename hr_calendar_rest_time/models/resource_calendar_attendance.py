@@ -1,7 +1,7 @@
 # Copyright 2019 Creu Blanca
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
 
@@ -20,6 +20,41 @@ class ResourceCalendarAttendance(models.Model):
         if self.rest_time:
             self.day_period = 'all_day'
 
+    @api.model
+    @tools.ormcache('calendar_id', 'version')
+    def _get_rest_times(self, calendar_id, version):
+        """Rest time of the attendances of a calendar, by attendance ID.
+
+        Cached by attendance version of the calendar, so that worked hours
+        of intervals are computed without reading the attendances again.
+        """
+        self.env.cr.execute(
+            "SELECT id, rest_time FROM resource_calendar_attendance "
+            "WHERE calendar_id = %s", (calendar_id, ),
+        )
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _get_intervals_rest_time(self, meta):
+        """Total rest time of the attendances of an interval, read from
+        themselves for the ones that are not stored within their calendar
+        (new records or attendances of other calendars).
+        """
+        calendar = meta[:1].calendar_id
+        if calendar.id:
+            rest_times = self._get_rest_times(
+                calendar.id, calendar.attendance_version,
+            )
+        else:
+            rest_times = {}
+        rest_time = 0.0
+        for att_id in meta.ids:
+            if att_id in rest_times:
+                rest_time += rest_times[att_id]
+            else:
+                rest_time += meta.browse(att_id).rest_time
+        return rest_time
+
     @api.constrains('hour_from', 'hour_to', 'rest_time')
     def _check_rest_time(self):
         for record in self:
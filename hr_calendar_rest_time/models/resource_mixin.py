@@ -2,13 +2,19 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 from odoo import models
-from datetime import timedelta
 
 
 class ResourceMixin(models.AbstractModel):
     _inherit = 'resource.mixin'
 
     def _get_work_hours(self, start, stop, meta):
-        return (stop - start - timedelta(hours=sum([
-            attendance.rest_time for attendance in meta
-        ]))).total_seconds() / 3600
+        rest_time = self.env[
+            'resource.calendar.attendance'
+        ]._get_intervals_rest_time(meta)
+        return (stop - start).total_seconds() / 3600 - rest_time
+
+    def _get_attendance_work_hours_methods(self):
+        # Rest times are taken from the attendance of the interval
+        return super()._get_attendance_work_hours_methods() + [
+            ResourceMixin._get_work_hours,
+        ]
@@ -4,7 +4,10 @@
 from odoo.tests.common import TransactionCase
 from odoo import fields
 from odoo.exceptions import ValidationError
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from pytz import timezone
 
 
 class HRCalendarRestTime(TransactionCase):
@@ -56,3 +59,153 @@ class HRCalendarRestTime(TransactionCase):
         self.calendar.attendance_ids[0].write({'rest_time': 2})
         self.calendar.attendance_ids[0]._onchange_rest_time()
         self.assertEqual(self.calendar.attendance_ids[0].day_period, 'all_day')
+
+    def test_rest_time_days(self):
+        """Days are computed against the total hours of each day, which are
+        refreshed when attendances change"""
+        today = fields.Date.from_string(fields.Date.today())
+        start = datetime.combine(today, time(0, 0, 0, 0))
+        end = datetime.combine(
+            today + timedelta(days=6), time(23, 59, 59, 99999))
+        data = self.employee.get_work_days_data(start, end)
+        self.assertEqual(data['days'], 7.0)
+        self.assertEqual(data['hours'], 56.0)
+        self.calendar.attendance_ids.write({'rest_time': 0.0})
+        data = self.employee.get_work_days_data(start, end)
+        self.assertEqual(data['days'], 7.0)
+        self.assertEqual(data['hours'], 63.0)
+        self.calendar.attendance_ids[0].write({'hour_to': 21.0})
+        data = self.employee.get_work_days_data(start, end)
+        self.assertEqual(data['days'], 7.0)
+        self.assertEqual(data['hours'], 67.0)
+
+    def test_rest_time_days_work_hours_override(self):
+        """Day totals aren't taken from the compiled attendances when work
+        hours may depend on the record"""
+        today = fields.Date.from_string(fields.Date.today())
+        start = datetime.combine(today, time(0, 0, 0, 0))
+        end = datetime.combine(
+            today + timedelta(days=6), time(23, 59, 59, 99999))
+        self.assertTrue(self.employee._use_week_template(self.calendar))
+        data = self.employee.get_work_days_data(start, end)
+        self.assertEqual(data['days'], 7.0)
+
+        def _get_work_hours(record, start, stop, meta):
+            return 4.0
+
+        with mock.patch.object(
+            type(self.employee), '_get_work_hours', _get_work_hours,
+        ):
+            self.assertFalse(
+                self.employee._use_week_template(self.calendar),
+            )
+            data = self.employee.get_work_days_data(start, end)
+            self.assertEqual(data['days'], 7.0)
+            self.assertEqual(data['hours'], 28.0)
+            data = self.employee.get_work_days_data_batch(start, end)
+            self.assertEqual(data[self.employee.id]['days'], 7.0)
+
+    def test_rest_time_days_dst(self):
+        """Total hours of the days of DST transitions are not taken from the
+        other days"""
+        calendar = self.env['resource.calendar'].create({
+            'name': 'Calendar DST',
+            'tz': 'Europe/Madrid',
+            'attendance_ids': [(0, 0, {
+                'name': 'Sunday night',
+                'dayofweek': '6',
+                'hour_from': 0.0,
+                'hour_to': 6.0,
+            })],
+        })
+        employee = self.env['hr.employee'].create({
+            'name': 'Employee DST',
+            'resource_calendar_id': calendar.id,
+            'tz': 'Europe/Madrid',
+        })
+        tz = timezone('Europe/Madrid')
+        # 2019-03-31 is one hour shorter, from 2:00 to 3:00
+        for day, hours in ((24, 6.0), (31, 5.0), (24, 6.0)):
+            data = employee.get_work_days_data(
+                tz.localize(datetime(2019, 3, day)),
+                tz.localize(datetime(2019, 3, day, 23, 59, 59)),
+            )
+            self.assertEqual(data, {'days': 1.0, 'hours': hours})
+
+    def test_rest_time_days_batch(self):
+        """Batch computation gives the same data as the one per employee"""
+        calendar = self.env['resource.calendar'].create({
+            'name': 'Calendar 2',
+        })
+        employee = self.env['hr.employee'].create({
+            'name': 'Employee 2',
+            'resource_calendar_id': calendar.id,
+        })
+        today = fields.Date.from_string(fields.Date.today())
+        start = datetime.combine(today, time(0, 0, 0, 0))
+        end = datetime.combine(
+            today + timedelta(days=13), time(23, 59, 59, 99999))
+        self.env['resource.calendar.leaves'].create({
+            'name': 'Leave',
+            'calendar_id': self.calendar.id,
+            'resource_id': self.employee.resource_id.id,
+            'date_from': start + timedelta(days=2),
+            'date_to': start + timedelta(days=4),
+        })
+        employees = self.employee | employee
+        data = employees.get_work_days_data_batch(start, end)
+        for record in employees:
+            self.assertEqual(
+                data[record.id], record.get_work_days_data(start, end),
+            )
+        self.assertEqual(data[self.employee.id]['hours'], 96.0)
+
+    def test_rest_time_cache(self):
+        """Rest times are read once per calendar and refreshed when its
+        attendances change"""
+        attendance_obj = self.env['resource.calendar.attendance']
+        attendance = self.calendar.attendance_ids[0]
+        version = self.calendar.attendance_version
+        self.assertEqual(
+            attendance_obj._get_rest_times(
+                self.calendar.id, version)[attendance.id],
+            1.0,
+        )
+        self.assertEqual(
+            attendance_obj._get_intervals_rest_time(
+                self.calendar.attendance_ids),
+            7.0,
+        )
+        attendance.write({'rest_time': 2.5})
+        self.assertNotEqual(self.calendar.attendance_version, version)
+        self.assertEqual(
+            attendance_obj._get_intervals_rest_time(attendance), 2.5,
+        )
+        attendance.write({'rest_time': 0.0})
+        self.assertEqual(
+            attendance_obj._get_intervals_rest_time(attendance), 0.0,
+        )
+        today = fields.Date.from_string(fields.Date.today())
+        hours = self.calendar.get_work_hours_count(
+            datetime.combine(today, time(0, 0, 0, 0)),
+            datetime.combine(
+                today + timedelta(days=6), time(23, 59, 59, 99999)),
+        )
+        self.assertEqual(hours, 57.0)
+
+    def test_rest_time_new_attendances(self):
+        """Rest time of attendances not stored yet is read from them"""
+        attendance_obj = self.env['resource.calendar.attendance']
+        attendance = attendance_obj.new({
+            'name': 'New',
+            'dayofweek': '0',
+            'hour_from': 8.0,
+            'hour_to': 17.0,
+            'rest_time': 1.5,
+            'calendar_id': self.calendar.id,
+        })
+        self.assertEqual(
+            attendance_obj._get_intervals_rest_time(
+                attendance | self.calendar.attendance_ids[0]),
+            2.5,
+        )
@@ -20,8 +20,10 @@
     'data': [
         'security/hr_holidays_accrual_security.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'wizards/hr_leave_allocation_accrual_calculator.xml',
         'views/hr_leave_allocation.xml',
         'views/hr_leave_allocation_accruement.xml',
+        'views/hr_leave_allocation_accrual_run.xml',
     ],
 }
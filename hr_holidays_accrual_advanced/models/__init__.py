@@ -1,6 +1,11 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+from . import hr_employee
 from . import hr_leave
 from . import hr_leave_allocation
 from . import hr_leave_allocation_accruement
+from . import hr_leave_allocation_accrual_run
+from . import hr_leave_type
+from . import resource_calendar
+from . import resource_calendar_attendance
 from . import resource_calendar_leaves
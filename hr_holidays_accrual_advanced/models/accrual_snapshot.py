@@ -0,0 +1,387 @@
+# Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+import logging
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from itertools import islice
+from pytz import utc
+
+from odoo.addons.resource.models.resource_mixin import ROUNDING_FACTOR
+from odoo.tools import float_utils
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    _logger.debug('Cannot import "numpy"')
+    numpy = None
+
+
+def interval_hours(start, stop, meta):
+    """Duration of the interval in hours."""
+    return (stop - start).total_seconds() / 3600
+
+
+def round_days(hours, total):
+    """Number of days, as quarters, of given hours out of the total hours of
+    the day. Days without total hours count as none.
+    """
+    if total <= 0:
+        return 0.0
+    return float_utils.round(ROUNDING_FACTOR * hours / total) / ROUNDING_FACTOR
+
+
+class SortedIntervals(object):
+    """Normalized intervals that can be sliced by an arbitrary window in
+    logarithmic time, unlike ``Intervals`` that requires a full pass.
+    """
+
+    def __init__(self, intervals):
+        self._items = list(intervals)
+        self._stops = [stop for start, stop, meta in self._items]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def clip(self, from_datetime, to_datetime):
+        index = bisect_right(self._stops, from_datetime)
+        for start, stop, meta in islice(self._items, index, None):
+            if start >= to_datetime:
+                break
+            yield (
+                max(start, from_datetime),
+                min(stop, to_datetime),
+                meta,
+            )
+
+
+class AccrualDayTotals(object):
+    """Total hours per day of calendars, keyed by calendar, timezone and date,
+    shared by all accrual periods computed during a single run.
+    """
+
+    def __init__(self):
+        self.day_total = {}
+        self.work_day_total = {}
+        self.attendance_key = None
+        self.attendance_intervals = None
+
+
+class AccrualRunStats(object):
+    """Counters of a single accrual recalculation run, logged at once instead
+    of per-period debug messages.
+    """
+
+    def __init__(self):
+        self.allocations = 0
+        self.periods = 0
+        self.intervals = 0
+
+    def to_dict(self):
+        return {
+            'allocations': self.allocations,
+            'periods': self.periods,
+            'intervals': self.intervals,
+        }
+
+
+class AccrualSnapshot(object):
+    """Attendance and leave intervals of a single employee preloaded over the
+    whole accrual horizon, so that accrual periods are computed in memory.
+
+    Results are the same as the ones of ``HrLeaveAllocation._get_worked_days``,
+    ``HrLeaveAllocation._get_workable_days`` and
+    ``HrLeaveAllocation._get_leave_days`` for any window within the horizon.
+    """
+
+    def __init__(self, tz, attendance_intervals, worked_intervals,
+                 leave_intervals, work_hours=None):
+        self.tz = tz
+        self.work_hours = work_hours or interval_hours
+        self.attendance_intervals = SortedIntervals(attendance_intervals)
+        self.worked_intervals = SortedIntervals(worked_intervals)
+        self.leave_intervals = {
+            holiday_status_id: SortedIntervals(intervals)
+            for holiday_status_id, intervals in leave_intervals.items()
+        }
+        self.day_total = defaultdict(float)
+        self.work_day_total = defaultdict(float)
+        for start, stop, meta in self.attendance_intervals:
+            self.day_total[start.date()] += interval_hours(start, stop, meta)
+            self.work_day_total[start.date()] += self.work_hours(
+                start, stop, meta
+            )
+
+    def _localize(self, value):
+        if not value.tzinfo:
+            value = value.replace(tzinfo=utc)
+        return value.astimezone(self.tz)
+
+    def _get_days(self, intervals, from_datetime, to_datetime, day_total,
+                  work_hours):
+        from_datetime = self._localize(from_datetime)
+        to_datetime = self._localize(to_datetime)
+
+        day_hours = defaultdict(float)
+        for start, stop, meta in intervals.clip(from_datetime, to_datetime):
+            day_hours[start.date()] += work_hours(start, stop, meta)
+
+        # compute number of days as quarters
+        return sum(
+            round_days(day_hours[day], day_total[day])
+            for day in day_hours
+        )
+
+    def get_worked_days(self, from_datetime, to_datetime):
+        return self._get_days(
+            self.worked_intervals,
+            from_datetime,
+            to_datetime,
+            self.day_total,
+            interval_hours,
+        )
+
+    def get_workable_days(self, from_datetime, to_datetime):
+        return self._get_days(
+            self.attendance_intervals,
+            from_datetime,
+            to_datetime,
+            self.work_day_total,
+            self.work_hours,
+        )
+
+    def get_leave_days(self, from_datetime, to_datetime, holiday_status_id):
+        intervals = self.leave_intervals.get(holiday_status_id)
+        if intervals is None:
+            return 0.0
+        return self._get_days(
+            intervals,
+            from_datetime,
+            to_datetime,
+            self.day_total,
+            interval_hours,
+        )
+
+
+class AccrualArraySnapshot(AccrualSnapshot):
+    """Same as ``AccrualSnapshot``, yet days are rounded once per day of the
+    whole horizon into NumPy arrays, so that sums over full days of a window
+    are taken from cumulative sums. Only the first and the last day of a
+    window, that may be partial, are computed from intervals.
+    """
+
+    def __init__(self, tz, attendance_intervals, worked_intervals,
+                 leave_intervals, work_hours=None):
+        super().__init__(
+            tz,
+            attendance_intervals,
+            worked_intervals,
+            leave_intervals,
+            work_hours=work_hours,
+        )
+        days = list(self.day_total)
+        self.origin = min(days) if days else None
+        self.size = (max(days) - self.origin).days + 1 if days else 0
+
+        self.worked_days = self._get_cumulative_days(
+            self.worked_intervals,
+            self.day_total,
+            interval_hours,
+        )
+        self.workable_days = self._get_cumulative_days(
+            self.attendance_intervals,
+            self.work_day_total,
+            self.work_hours,
+        )
+        self.leave_days = {
+            holiday_status_id: self._get_cumulative_days(
+                intervals,
+                self.day_total,
+                interval_hours,
+            )
+            for holiday_status_id, intervals in self.leave_intervals.items()
+        }
+
+    def _get_cumulative_days(self, intervals, day_total, work_hours):
+        day_hours = [0.0] * self.size
+        for start, stop, meta in intervals:
+            day_hours[(start.date() - self.origin).days] += work_hours(
+                start,
+                stop,
+                meta,
+            )
+        hours = numpy.array(day_hours, dtype=numpy.float64)
+        totals = numpy.array(
+            [
+                day_total.get(self.origin + timedelta(days=index), 0.0)
+                for index in range(self.size)
+            ],
+            dtype=numpy.float64,
+        )
+
+        # NOTE: Days without total hours count as none, see round_days()
+        quarters = numpy.zeros(self.size, dtype=numpy.float64)
+        numpy.divide(
+            ROUNDING_FACTOR * hours,
+            totals,
+            out=quarters,
+            where=totals > 0,
+        )
+        # NOTE: Round half up, same as float_utils.round() does
+        rounded = numpy.floor(quarters)
+        rounded += (quarters - rounded) >= 0.5
+
+        # NOTE: Quarters are exact in binary floating point, thus cumulative
+        # sums are exact as well
+        return numpy.concatenate(([0.0], numpy.cumsum(
+            rounded / ROUNDING_FACTOR
+        )))
+
+    def _get_day_start(self, day):
+        return self.tz.localize(datetime.combine(day, time.min))
+
+    def _get_array_days(self, cumulative, intervals, from_datetime,
+                        to_datetime, day_total, work_hours):
+        from_datetime = self._localize(from_datetime)
+        to_datetime = self._localize(to_datetime)
+        first_day = from_datetime.date()
+        last_day = to_datetime.date()
+        if first_day + timedelta(days=1) >= last_day:
+            return self._get_days(
+                intervals,
+                from_datetime,
+                to_datetime,
+                day_total,
+                work_hours,
+            )
+
+        first_index = (first_day - self.origin).days + 1
+        last_index = (last_day - self.origin).days
+        first_index = min(max(first_index, 0), self.size)
+        last_index = min(max(last_index, 0), self.size)
+
+        return self._get_days(
+            intervals,
+            from_datetime,
+            self._get_day_start(first_day + timedelta(days=1)),
+            day_total,
+            work_hours,
+        ) + float(
+            cumulative[last_index] - cumulative[first_index]
+        ) + self._get_days(
+            intervals,
+            self._get_day_start(last_day),
+            to_datetime,
+            day_total,
+            work_hours,
+        )
+
+    def get_worked_days(self, from_datetime, to_datetime):
+        return self._get_array_days(
+            self.worked_days,
+            self.worked_intervals,
+            from_datetime,
+            to_datetime,
+            self.day_total,
+            interval_hours,
+        )
+
+    def get_workable_days(self, from_datetime, to_datetime):
+        return self._get_array_days(
+            self.workable_days,
+            self.attendance_intervals,
+            from_datetime,
+            to_datetime,
+            self.work_day_total,
+            self.work_hours,
+        )
+
+    def get_leave_days(self, from_datetime, to_datetime, holiday_status_id):
+        intervals = self.leave_intervals.get(holiday_status_id)
+        if intervals is None:
+            return 0.0
+        return self._get_array_days(
+            self.leave_days[holiday_status_id],
+            intervals,
+            from_datetime,
+            to_datetime,
+            self.day_total,
+            interval_hours,
+        )
+
+
+class AccrualAllocationDays(object):
+    """Days of a single allocation computed on demand from its calendar, with
+    the same interface as ``AccrualSnapshot``.
+    """
+
+    def __init__(self, allocation, day_totals=None):
+        self.allocation = allocation
+        self.day_totals = day_totals or AccrualDayTotals()
+
+    def get_worked_days(self, from_datetime, to_datetime):
+        return self.allocation._get_worked_days(
+            from_datetime,
+            to_datetime,
+            day_totals=self.day_totals,
+        )
+
+    def get_workable_days(self, from_datetime, to_datetime):
+        return self.allocation._get_workable_days(
+            from_datetime,
+            to_datetime,
+            day_totals=self.day_totals,
+        )
+
+    def get_leave_days(self, from_datetime, to_datetime, holiday_status_id):
+        return self.allocation._get_leave_days(
+            from_datetime,
+            to_datetime,
+            day_totals=self.day_totals,
+        )
+
+
+class AccrualPeriodCache(object):
+    """Days of accrual periods memoized by window on top of another source of
+    days (``AccrualSnapshot`` or ``AccrualAllocationDays``). Since periods do
+    not depend on the date accruals are computed as of, except for the last
+    one, memoized days can be reused for any other date.
+    """
+
+    def __init__(self, values=None, source=None):
+        self.values = {} if values is None else values
+        self.source = source
+
+    def _get_days(self, kind, from_datetime, to_datetime, *args):
+        key = ':'.join(
+            [kind, from_datetime.isoformat(), to_datetime.isoformat()]
+            + [str(arg) for arg in args]
+        )
+        if key not in self.values:
+            self.values[key] = getattr(self.source, 'get_%s_days' % kind)(
+                from_datetime,
+                to_datetime,
+                *args
+            )
+        return self.values[key]
+
+    def get_worked_days(self, from_datetime, to_datetime):
+        return self._get_days('worked', from_datetime, to_datetime)
+
+    def get_workable_days(self, from_datetime, to_datetime):
+        return self._get_days('workable', from_datetime, to_datetime)
+
+    def get_leave_days(self, from_datetime, to_datetime, holiday_status_id):
+        return self._get_days(
+            'leave',
+            from_datetime,
+            to_datetime,
+            holiday_status_id,
+        )
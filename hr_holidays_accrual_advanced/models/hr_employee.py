@@ -0,0 +1,30 @@
+# Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+
+class HrEmployee(models.Model):
+    _inherit = 'hr.employee'
+
+    @api.multi
+    def write(self, values):
+        result = super().write(values)
+        if set(values) & set(self._get_accrual_settings_fields()):
+            self.env['hr.leave.allocation'].sudo()._get_accrual_allocations(
+                self
+            )._reset_accrual_checkpoint()
+        return result
+
+    @api.model
+    def _get_accrual_settings_fields(self):
+        """
+        Fields that affect the whole accruement history of the employee.
+        """
+        return [
+            'resource_calendar_id',
+            'tz',
+            'service_hire_date',
+            'service_start_date',
+            'service_termination_date',
+        ]
@@ -1,19 +1,34 @@
 # Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+import json
 import logging
+import time
 
 from collections import namedtuple, defaultdict
 from math import ceil
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from pytz import utc
+from psycopg2.extras import execute_values
+from pytz import timezone, utc
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-from odoo.addons.resource.models.resource import HOURS_PER_DAY
-from odoo.addons.resource.models.resource_mixin import ROUNDING_FACTOR
-from odoo.tools import float_utils
+from odoo.addons.resource.models.resource import (
+    HOURS_PER_DAY,
+    Intervals,
+)
+
+from .accrual_snapshot import (
+    AccrualArraySnapshot,
+    AccrualDayTotals,
+    AccrualRunStats,
+    AccrualSnapshot,
+    SortedIntervals,
+    interval_hours,
+    numpy,
+    round_days,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -26,6 +41,22 @@ HrLeaveAllocationAccruementEntry = namedtuple(
         'reason',
     ]
 )
+HrLeaveAllocationLedgerLine = namedtuple(
+    'HrLeaveAllocationLedgerLine',
+    [
+        'period_start',
+        'accruement',
+        'usage',
+    ]
+)
+HrLeaveAllocationAccrualCheckpoint = namedtuple(
+    'HrLeaveAllocationAccrualCheckpoint',
+    [
+        'period_start',
+        'balance',
+        'leave_days',
+    ]
+)
 
 
 class HrLeaveAllocation(models.Model):
@@ -154,6 +185,33 @@ class HrLeaveAllocation(models.Model):
         track_visibility='onchange',
         help='Units in which Accrual Period Duration is defined',
     )
+    accrual_checkpoint_date = fields.Datetime(
+        string='Accrual Checkpoint',
+        readonly=True,
+        copy=False,
+        help='Start of the first accrual period that is not closed yet',
+    )
+    accrual_checkpoint_balance = fields.Float(
+        string='Accrual Checkpoint Balance',
+        readonly=True,
+        copy=False,
+        help='Balance carried to the first accrual period not closed yet',
+    )
+    accrual_checkpoint_leave_days = fields.Float(
+        string='Accrual Checkpoint Leave Days',
+        readonly=True,
+        copy=False,
+        help=(
+            'Total leave days used before the first accrual period not closed'
+            ' yet'
+        ),
+    )
+    accrual_dirty_from = fields.Datetime(
+        string='Accrual Outdated From',
+        readonly=True,
+        copy=False,
+        help='Accruement history has to be recalculated from this moment',
+    )
 
     @api.model
     def _default_number_per_interval(self):
@@ -189,8 +247,7 @@ class HrLeaveAllocation(models.Model):
 
     @api.multi
     def action_recalculate_accrual_allocations(self):
-        for allocation in self:
-            allocation._update_accrual_allocation()
+        self._update_accrual_allocations()
 
     @api.model
     def action_recalculate_accrual_allocations_all(self):
@@ -200,8 +257,7 @@ class HrLeaveAllocation(models.Model):
             ('holiday_type', '=', 'employee')
         ])
 
-        for allocation in allocations:
-            allocation._update_accrual_allocation()
+        allocations._update_accrual_allocations()
 
     @api.model
     def create(self, values):
@@ -226,8 +282,77 @@ class HrLeaveAllocation(models.Model):
     def write(self, values):
         if 'holiday_type' in values and values['holiday_type'] != 'employee':
             values['accrual'] = False
+        if set(values) & set(self._get_accrual_settings_fields()):
+            values['accrual_checkpoint_date'] = False
+            values['accrual_dirty_from'] = False
+        elif values.get('state') == 'validate':
+            # Leaves aren't tracked while not validated, so the checkpoint
+            # of an allocation being validated again can't be trusted
+            self.filtered(
+                lambda x: x.state != 'validate'
+            )._reset_accrual_checkpoint()
         return super().write(values)
 
+    @api.model
+    def _get_accrual_settings_fields(self):
+        """
+        Fields that affect the whole accruement history, so that any change
+        to them requires the ledger to be rebuilt from scratch.
+        """
+        return [
+            'accrual',
+            'employee_id',
+            'holiday_status_id',
+            'date_from',
+            'date_to',
+            'limit_accrued_days',
+            'max_accrued_days',
+            'limit_carryover_days',
+            'max_carryover_days',
+            'limit_accumulated_days',
+            'max_accumulated_days',
+            'accrual_method',
+            'number_per_interval',
+            'interval_number',
+            'unit_per_interval',
+            'interval_unit',
+        ]
+
+    @api.model
+    def _get_accrual_allocations(self, employees):
+        return self.search([
+            ('accrual', '=', True),
+            ('state', '=', 'validate'),
+            ('holiday_type', '=', 'employee'),
+            ('employee_id', 'in', employees.ids),
+            ('accrual_checkpoint_date', '!=', False),
+        ])
+
+    @api.multi
+    def _reset_accrual_checkpoint(self):
+        self.with_context({
+            'mail_notrack': True,
+        }).write({
+            'accrual_checkpoint_date': False,
+            'accrual_dirty_from': False,
+        })
+
+    @api.multi
+    def _mark_accrual_dirty(self, dirty_from):
+        """
+        Mark accruement history as outdated starting from given datetime, so
+        that next recalculation resumes from the period containing it.
+        """
+        self.filtered(
+            lambda x: x.accrual_checkpoint_date
+            and dirty_from < x.accrual_checkpoint_date
+            and (not x.accrual_dirty_from or dirty_from < x.accrual_dirty_from)
+        ).with_context({
+            'mail_notrack': True,
+        }).write({
+            'accrual_dirty_from': dirty_from,
+        })
+
     def _update_accrual(self):
         super()._update_accrual()
 
@@ -237,45 +362,238 @@ class HrLeaveAllocation(models.Model):
             ('holiday_type', '=', 'employee')
         ])
 
-        for allocation in allocations:
-            allocation._update_accrual_allocation()
+        HrLeaveAllocationAccrualRun = self.env[
+            'hr.leave.allocation.accrual.run'
+        ]
+        if HrLeaveAllocationAccrualRun._get_workers():
+            HrLeaveAllocationAccrualRun._run(allocations)
+        else:
+            allocations._update_accrual_allocations()
 
     @api.multi
-    def _update_accrual_allocation(self):
+    def _update_accrual_allocations(self):
+        """
+        Recalculate all allocations at once, preloading attendance and leave
+        intervals of all involved employees in bulk.
+        """
+        stats = AccrualRunStats()
+        started = time.time()
+        sql_log_count = self.env.cr.sql_log_count
+
+        as_of_datetime = datetime.combine(
+            datetime.today(),
+            datetime.min.time()
+        )
+        snapshots = self._get_accrual_snapshots(
+            as_of_datetime,
+            incremental=True,
+            stats=stats,
+        )
+        for allocation in self:
+            allocation._update_accrual_allocation(
+                snapshot=snapshots.get(allocation.employee_id.id),
+                stats=stats,
+            )
+
+        values = stats.to_dict()
+        values.update({
+            'queries': self.env.cr.sql_log_count - sql_log_count,
+            'duration': round(time.time() - started, 3),
+        })
+        _logger.info(
+            'Recalculated accrual allocations: %s',
+            json.dumps(values, sort_keys=True),
+        )
+
+    @api.multi
+    def _update_accrual_allocation(self, snapshot=None, stats=None):
         self.ensure_one()
 
         if not self.accrual:  # pragma: no cover
             raise UserError(_('Only accrual allocations can be recalculated'))
 
-        accruements, number_of_days = self._calculate_accrued_amount(
-            datetime.combine(
-                datetime.today(),
-                datetime.min.time()
+        checkpoint = self._get_accrual_checkpoint()
+        ledger, number_of_days, next_checkpoint = (
+            self._calculate_accrual_ledger(
+                datetime.combine(
+                    datetime.today(),
+                    datetime.min.time()
+                ),
+                snapshot=snapshot,
+                checkpoint=checkpoint,
+                stats=stats,
             )
         )
 
-        accruement_ids = [(5, False, False)]
-        for accruement in accruements:
-            accruement_ids.append((0, False, {
-                'days_accrued': accruement.days_accrued,
-                'accrued_on': accruement.accrued_on,
-                'reason': accruement.reason,
-            }))
+        self._store_accrual_ledger(ledger, checkpoint=checkpoint)
 
         self.with_context({
             'mail_notrack': True,
         }).write({
             'number_of_days': number_of_days,
-            'accruement_ids': accruement_ids,
+            'accrual_checkpoint_date': next_checkpoint.period_start,
+            'accrual_checkpoint_balance': next_checkpoint.balance,
+            'accrual_checkpoint_leave_days': next_checkpoint.leave_days,
+            'accrual_dirty_from': False,
         })
 
+    @api.multi
+    def _store_accrual_ledger(self, ledger, checkpoint=None):
+        """
+        Replace accruements starting from the checkpoint period, or all of
+        them, with given ledger lines. Bulk SQL statements are used instead
+        of per-record ORM creates, since there are thousands of lines for
+        long services with short accrual periods.
+        """
+        self.ensure_one()
+
+        HrLeaveAllocationAccruement = self.env[
+            'hr.leave.allocation.accruement'
+        ]
+        HrLeaveAllocationAccruement.check_access_rights('unlink')
+        HrLeaveAllocationAccruement.check_access_rights('create')
+        self.check_access_rule('write')
+
+        if checkpoint:
+            self.env.cr.execute(
+                """
+                DELETE FROM %s
+                WHERE leave_allocation_id = %%s
+                    AND (period_start IS NULL OR period_start >= %%s)
+                """ % HrLeaveAllocationAccruement._table,
+                (self.id, checkpoint.period_start),
+            )
+        else:
+            self.env.cr.execute(
+                """
+                DELETE FROM %s
+                WHERE leave_allocation_id = %%s
+                """ % HrLeaveAllocationAccruement._table,
+                (self.id,),
+            )
+
+        if ledger:
+            execute_values(
+                self.env.cr,
+                """
+                INSERT INTO %s (
+                    leave_allocation_id,
+                    days_accrued,
+                    accrued_on,
+                    reason,
+                    period_start,
+                    usage,
+                    create_uid,
+                    create_date,
+                    write_uid,
+                    write_date
+                ) VALUES %%s
+                """ % HrLeaveAllocationAccruement._table,
+                [
+                    (
+                        self.id,
+                        line.accruement.days_accrued,
+                        line.accruement.accrued_on,
+                        line.accruement.reason,
+                        line.period_start,
+                        line.usage,
+                        self.env.uid,
+                        self.env.uid,
+                    )
+                    for line in ledger
+                ],
+                template=(
+                    "(%s, %s, %s, %s, %s, %s,"
+                    " %s, (now() at time zone 'UTC'),"
+                    " %s, (now() at time zone 'UTC'))"
+                ),
+                page_size=1000,
+            )
+
+        HrLeaveAllocationAccruement.invalidate_cache()
+        self.invalidate_cache(['accruement_ids', 'number_of_days'], self.ids)
+
+    @api.multi
+    def _get_accrual_checkpoint(self):
+        """
+        Get checkpoint to resume recalculation from, taking into account
+        changes that happened before it, or None if the accruement history
+        has to be rebuilt from scratch.
+        """
+        self.ensure_one()
+
+        if not self.accrual_checkpoint_date:
+            return None
+
+        if (not self.accrual_dirty_from
+                or self.accrual_dirty_from >= self.accrual_checkpoint_date):
+            return HrLeaveAllocationAccrualCheckpoint(
+                period_start=self.accrual_checkpoint_date,
+                balance=self.accrual_checkpoint_balance,
+                leave_days=self.accrual_checkpoint_leave_days,
+            )
+
+        # NOTE: Resume from the latest period that started before the change,
+        # restoring the state from the accruements of previous periods
+        period_starts = [
+            period_start
+            for period_start in self.accruement_ids.mapped('period_start')
+            if period_start and period_start <= self.accrual_dirty_from
+        ]
+        if not period_starts:
+            return None
+        period_start = max(period_starts)
+        accruements = self.accruement_ids.filtered(
+            lambda x: x.period_start < period_start
+        )
+        return HrLeaveAllocationAccrualCheckpoint(
+            period_start=period_start,
+            balance=sum(accruements.mapped('days_accrued')),
+            leave_days=-sum(
+                accruements.filtered('usage').mapped('days_accrued')
+            ),
+        )
+
     @api.multi
     def _calculate_accrued_amount(
         self,
         as_of_datetime,
+        snapshot=None,
+    ):
+        """
+        Compute accruements up to given date. If a snapshot of preloaded
+        intervals is given, periods are computed from it instead of querying
+        the calendar for each of them.
+        """
+        self.ensure_one()
+
+        ledger, number_of_days, _checkpoint = self._calculate_accrual_ledger(
+            as_of_datetime,
+            snapshot=snapshot,
+        )
+        return [line.accruement for line in ledger], number_of_days
+
+    @api.multi
+    def _calculate_accrual_ledger(
+        self,
+        as_of_datetime,
+        snapshot=None,
+        checkpoint=None,
+        day_totals=None,
+        stats=None,
     ):
+        """
+        Compute ledger lines up to given date, starting either from the
+        beginning or from given checkpoint. If given, run stats are updated.
+
+        Returns ledger lines, total number of days allocated and the
+        checkpoint of the first period that is not closed as of given date.
+        """
         self.ensure_one()
 
+        if not snapshot and day_totals is None:
+            day_totals = AccrualDayTotals()
+
         period = self._get_accrual_period()
         date_from = self._get_date_from()
         date_to = self._get_date_to()
@@ -283,75 +601,122 @@ class HrLeaveAllocation(models.Model):
         if not date_to or date_to > as_of_datetime:
             date_to = as_of_datetime
 
-        _logger.debug(
-            (
-                'Calculating "%s" leave allocation for employee "%s"'
-                ' between %s and %s with %s period as of %s'
-            ),
-            self.holiday_status_id.display_name,
-            self.employee_id.display_name,
-            date_from,
-            date_to,
-            period,
-            as_of_datetime,
-        )
-
         balance = 0.0
         total_leave_days = 0.0
-        accruements = []
-        while date_from < date_to:
-            period_start = date_from
-            period_end = min(period_start + period, date_to)
-
-            worked_days = self._get_worked_days(
-                period_start,
-                period_end,
-            )
-            workable_days = self._get_workable_days(
-                period_start,
-                period_start + period,
-            )
-            leave_days = self._get_leave_days(
-                period_start,
-                period_end,
-            )
-
+        if checkpoint:
+            date_from = checkpoint.period_start
+            balance = checkpoint.balance
+            total_leave_days = checkpoint.leave_days
+
+        # NOTE: Labels are resolved only if debug messages are to be logged,
+        # and settings are read once instead of once per period
+        debug = _logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            employee_name = self.employee_id.name
+            leave_type_name = self.holiday_status_id.name
             _logger.debug(
                 (
-                    'Employee "%s" / allocation %s (%s - %s):'
-                    ' %s days worked, %s workable days, %s leave days'
+                    'Calculating "%s" leave allocation for employee "%s"'
+                    ' between %s and %s with %s period as of %s'
                 ),
-                self.employee_id.name,
-                self.holiday_status_id.name,
-                period_start,
-                period_end,
-                worked_days,
-                workable_days,
-                leave_days,
+                self.holiday_status_id.display_name,
+                self.employee_id.display_name,
+                date_from,
+                date_to,
+                period,
+                as_of_datetime,
             )
+        holiday_status_id = self.holiday_status_id.id
+        limit_carryover_days = self.limit_carryover_days
+        max_carryover_days = self.max_carryover_days
+        limit_accrued_days = self.limit_accrued_days
+        max_accrued_days = self.max_accrued_days
+        limit_accumulated_days = self.limit_accumulated_days
+        max_accumulated_days = self.max_accumulated_days
+
+        ledger = []
+        next_checkpoint = None
+        while date_from < date_to:
+            period_start = date_from
+            period_end = min(period_start + period, date_to)
 
-            if (self.limit_carryover_days
-                    and balance > self.max_carryover_days):
-                loss = self.max_carryover_days - balance
-                accruements.append(HrLeaveAllocationAccruementEntry(
-                    days_accrued=loss,
-                    accrued_on=date_from.date(),
-                    reason=_('Loss due to period carry-over limit')
-                ))
-                balance += loss
+            if (not next_checkpoint
+                    and period_start + period >= as_of_datetime):
+                next_checkpoint = HrLeaveAllocationAccrualCheckpoint(
+                    period_start=period_start,
+                    balance=balance,
+                    leave_days=total_leave_days,
+                )
 
+            if snapshot:
+                worked_days = snapshot.get_worked_days(
+                    period_start,
+                    period_end,
+                )
+                workable_days = snapshot.get_workable_days(
+                    period_start,
+                    period_start + period,
+                )
+                leave_days = snapshot.get_leave_days(
+                    period_start,
+                    period_end,
+                    holiday_status_id,
+                )
+            else:
+                worked_days = self._get_worked_days(
+                    period_start,
+                    period_end,
+                    day_totals=day_totals,
+                )
+                workable_days = self._get_workable_days(
+                    period_start,
+                    period_start + period,
+                    day_totals=day_totals,
+                )
+                leave_days = self._get_leave_days(
+                    period_start,
+                    period_end,
+                    day_totals=day_totals,
+                )
+
+            if debug:
                 _logger.debug(
                     (
                         'Employee "%s" / allocation %s (%s - %s):'
-                        ' loss of %s due to period carry-over limit'
+                        ' %s days worked, %s workable days, %s leave days'
                     ),
-                    self.employee_id.name,
-                    self.holiday_status_id.name,
+                    employee_name,
+                    leave_type_name,
                     period_start,
                     period_end,
-                    loss,
+                    worked_days,
+                    workable_days,
+                    leave_days,
                 )
 
+            accruements = []
+            if limit_carryover_days and balance > max_carryover_days:
+                loss = max_carryover_days - balance
+                accruements.append(HrLeaveAllocationAccruementEntry(
+                    days_accrued=loss,
+                    accrued_on=date_from.date(),
+                    reason=_('Loss due to period carry-over limit')
+                ))
+                balance += loss
+
+                if debug:
+                    _logger.debug(
+                        (
+                            'Employee "%s" / allocation %s (%s - %s):'
+                            ' loss of %s due to period carry-over limit'
+                        ),
+                        employee_name,
+                        leave_type_name,
+                        period_start,
+                        period_end,
+                        loss,
+                    )
+
             accruement = self._get_days_to_accrue(
                 period_start,
                 period,
@@ -361,24 +726,25 @@ class HrLeaveAllocation(models.Model):
                 workable_days
             )
             if accruement:
-                _logger.debug(
-                    (
-                        'Employee "%s" / allocation %s (%s - %s):'
-                        ' accruement of %s'
-                    ),
-                    self.employee_id.name,
-                    self.holiday_status_id.name,
-                    period_start,
-                    period_end,
-                    accruement.days_accrued,
-                )
+                if debug:
+                    _logger.debug(
+                        (
+                            'Employee "%s" / allocation %s (%s - %s):'
+                            ' accruement of %s'
+                        ),
+                        employee_name,
+                        leave_type_name,
+                        period_start,
+                        period_end,
+                        accruement.days_accrued,
+                    )
 
                 accruements.append(accruement)
                 balance += accruement.days_accrued
 
-                if (self.limit_accrued_days
-                        and accruement.days_accrued > self.max_accrued_days):
-                    loss = self.max_accrued_days - accruement.days_accrued
+                if (limit_accrued_days
+                        and accruement.days_accrued > max_accrued_days):
+                    loss = max_accrued_days - accruement.days_accrued
                     accruements.append(HrLeaveAllocationAccruementEntry(
                         days_accrued=loss,
                         accrued_on=accruement.accrued_on,
@@ -386,21 +752,21 @@ class HrLeaveAllocation(models.Model):
                     ))
                     balance += loss
 
-                    _logger.debug(
-                        (
-                            'Employee "%s" / allocation %s (%s - %s):'
-                            ' loss of %s due to accrued amount limit'
-                        ),
-                        self.employee_id.name,
-                        self.holiday_status_id.name,
-                        period_start,
-                        period_end,
-                        loss,
-                    )
-
-                if (self.limit_accumulated_days
-                        and balance > self.max_accumulated_days):
-                    loss = self.max_accumulated_days - balance
+                    if debug:
+                        _logger.debug(
+                            (
+                                'Employee "%s" / allocation %s (%s - %s):'
+                                ' loss of %s due to accrued amount limit'
+                            ),
+                            employee_name,
+                            leave_type_name,
+                            period_start,
+                            period_end,
+                            loss,
+                        )
+
+                if limit_accumulated_days and balance > max_accumulated_days:
+                    loss = max_accumulated_days - balance
                     accruements.append(HrLeaveAllocationAccruementEntry(
                         days_accrued=loss,
                         accrued_on=accruement.accrued_on,
@@ -408,53 +774,80 @@ class HrLeaveAllocation(models.Model):
                     ))
                     balance += loss
 
+                    if debug:
+                        _logger.debug(
+                            (
+                                'Employee "%s" / allocation %s (%s - %s):'
+                                ' loss of %s due to accumulation limit'
+                            ),
+                            employee_name,
+                            leave_type_name,
+                            period_start,
+                            period_end,
+                            loss,
+                        )
+
+            ledger.extend(
+                HrLeaveAllocationLedgerLine(
+                    period_start=period_start,
+                    accruement=entry,
+                    usage=False,
+                )
+                for entry in accruements
+            )
+
+            if leave_days > 0:
+                ledger.append(HrLeaveAllocationLedgerLine(
+                    period_start=period_start,
+                    accruement=HrLeaveAllocationAccruementEntry(
+                        days_accrued=-leave_days,
+                        accrued_on=period_end.date(),
+                        reason=_('Usage during accruement period')
+                    ),
+                    usage=True,
+                ))
+                balance -= leave_days
+                total_leave_days += leave_days
+
+                if debug:
                     _logger.debug(
                         (
                             'Employee "%s" / allocation %s (%s - %s):'
-                            ' loss of %s due to accumulation limit'
+                            ' used %s days'
                         ),
-                        self.employee_id.name,
-                        self.holiday_status_id.name,
+                        employee_name,
+                        leave_type_name,
                         period_start,
                         period_end,
-                        loss,
+                        leave_days,
                     )
 
-            if leave_days > 0:
-                accruements.append(HrLeaveAllocationAccruementEntry(
-                    days_accrued=-leave_days,
-                    accrued_on=period_end.date(),
-                    reason=_('Usage during accruement period')
-                ))
-                balance -= leave_days
-                total_leave_days += leave_days
-
-                _logger.debug(
-                    (
-                        'Employee "%s" / allocation %s (%s - %s):'
-                        ' used %s days'
-                    ),
-                    self.employee_id.name,
-                    self.holiday_status_id.name,
-                    period_start,
-                    period_end,
-                    leave_days,
-                )
-
             date_from += period
+            if stats:
+                stats.periods += 1
+
+        if not next_checkpoint:
+            next_checkpoint = HrLeaveAllocationAccrualCheckpoint(
+                period_start=date_from,
+                balance=balance,
+                leave_days=total_leave_days,
+            )
 
         number_of_days = balance + total_leave_days
-        _logger.info(
-            '%s day(s) of "%s" leave allocated to employee "%s"',
-            number_of_days,
-            self.holiday_status_id.name,
-            self.employee_id.name,
-        )
+        if debug:
+            _logger.debug(
+                '%s day(s) of "%s" leave allocated to employee "%s"',
+                number_of_days,
+                leave_type_name,
+                employee_name,
+            )
+        if stats:
+            stats.allocations += 1
 
-        return accruements, number_of_days
+        return ledger, number_of_days, next_checkpoint
 
     @api.multi
-    def _get_worked_days(self, from_datetime, to_datetime):
+    def _get_worked_days(self, from_datetime, to_datetime, day_totals=None):
         """
         Compute number of worked days, that is computed as number workable days
         without unpaid leaves (that are not on global leaves) counted in.
@@ -470,22 +863,18 @@ class HrLeaveAllocation(models.Model):
         if not to_datetime.tzinfo:
             to_datetime = to_datetime.replace(tzinfo=utc)
 
-        # total hours per day: retrieve attendances with one extra day margin,
-        # in order to compute the total hours on the first and last days
-        intervals = calendar._attendance_intervals(
-            from_datetime - timedelta(days=1),
-            to_datetime + timedelta(days=1),
-            self.employee_id.resource_id,
+        # total hours per day
+        day_total = self._get_day_total(
+            from_datetime,
+            to_datetime,
+            day_totals=day_totals,
         )
-        day_total = defaultdict(float)
-        for start, stop, meta in intervals:
-            day_total[start.date()] += (stop - start).total_seconds() / 3600
 
         # actual hours per day
-        attendance_intervals = calendar._attendance_intervals(
+        attendance_intervals = self._get_attendance_intervals(
             from_datetime,
             to_datetime,
-            self.employee_id.resource_id,
+            day_totals=day_totals,
         )
         unpaid_intervals = calendar._leave_intervals(
             from_datetime,
@@ -510,28 +899,56 @@ class HrLeaveAllocation(models.Model):
 
         # compute number of days as quarters
         return sum(
-            float_utils.round(
-                ROUNDING_FACTOR * day_hours[day] / day_total[day]
-            ) / ROUNDING_FACTOR
+            round_days(day_hours[day], day_total[day])
             for day in day_hours
         )
 
     @api.multi
-    def _get_workable_days(self, from_datetime, to_datetime):
+    def _get_workable_days(self, from_datetime, to_datetime, day_totals=None):
         """
         Compute number of workable days, that is computed from calendar and
         configured attendances only.
         """
         self.ensure_one()
 
-        return self.employee_id.get_work_days_data(
+        # NOTE: This mimics ResourceMixin.get_work_days_data() with
+        # compute_leaves=False, honoring _get_work_hours() if hooked
+
+        work_hours = getattr(self.employee_id, '_get_work_hours', None)
+        if not work_hours:
+            work_hours = interval_hours
+
+        if not from_datetime.tzinfo:
+            from_datetime = from_datetime.replace(tzinfo=utc)
+        if not to_datetime.tzinfo:
+            to_datetime = to_datetime.replace(tzinfo=utc)
+
+        # total hours per day
+        day_total = self._get_day_total(
             from_datetime,
             to_datetime,
-            compute_leaves=False,
-        )['days']
+            day_totals=day_totals,
+            work_hours=True,
+        )
+
+        # actual hours per day
+        intervals = self._get_attendance_intervals(
+            from_datetime,
+            to_datetime,
+            day_totals=day_totals,
+        )
+        day_hours = defaultdict(float)
+        for start, stop, meta in intervals:
+            day_hours[start.date()] += work_hours(start, stop, meta)
+
+        # compute number of days as quarters
+        return sum(
+            round_days(day_hours[day], day_total[day])
+            for day in day_hours
+        )
 
     @api.multi
-    def _get_leave_days(self, from_datetime, to_datetime):
+    def _get_leave_days(self, from_datetime, to_datetime, day_totals=None):
         """
         Compute number of days on used from the allocation, without global
         leaves taken into account, other leaves are irrelevant since it's
@@ -548,22 +965,18 @@ class HrLeaveAllocation(models.Model):
         if not to_datetime.tzinfo:
             to_datetime = to_datetime.replace(tzinfo=utc)
 
-        # total hours per day: retrieve attendances with one extra day margin,
-        # in order to compute the total hours on the first and last days
-        intervals = calendar._attendance_intervals(
-            from_datetime - timedelta(days=1),
-            to_datetime + timedelta(days=1),
-            self.employee_id.resource_id,
+        # total hours per day
+        day_total = self._get_day_total(
+            from_datetime,
+            to_datetime,
+            day_totals=day_totals,
         )
-        day_total = defaultdict(float)
-        for start, stop, meta in intervals:
-            day_total[start.date()] += (stop - start).total_seconds() / 3600
 
         # actual hours per day
-        attendance_intervals = calendar._attendance_intervals(
+        attendance_intervals = self._get_attendance_intervals(
             from_datetime,
             to_datetime,
-            self.employee_id.resource_id,
+            day_totals=day_totals,
         )
         leave_intervals = calendar._leave_intervals(
             from_datetime,
@@ -588,12 +1001,250 @@ class HrLeaveAllocation(models.Model):
 
         # compute number of days as quarters
         return sum(
-            float_utils.round(
-                ROUNDING_FACTOR * day_hours[day] / day_total[day]
-            ) / ROUNDING_FACTOR
+            round_days(day_hours[day], day_total[day])
             for day in day_hours
         )
 
+    @api.multi
+    def _get_attendance_intervals(self, from_datetime, to_datetime,
+                                  day_totals=None):
+        """
+        Get attendance intervals of the employee, reusing the ones of the
+        previous call for the same range.
+        """
+        self.ensure_one()
+
+        calendar = self.employee_id.resource_calendar_id
+        resource = self.employee_id.resource_id
+
+        if day_totals is None:
+            return calendar._attendance_intervals(
+                from_datetime,
+                to_datetime,
+                resource,
+            )
+
+        key = (
+            calendar.id,
+            (resource or calendar).tz,
+            from_datetime,
+            to_datetime,
+        )
+        if day_totals.attendance_key != key:
+            day_totals.attendance_key = key
+            day_totals.attendance_intervals = calendar._attendance_intervals(
+                from_datetime,
+                to_datetime,
+                resource,
+            )
+        return day_totals.attendance_intervals
+
+    @api.multi
+    def _get_day_total(self, from_datetime, to_datetime, day_totals=None,
+                       work_hours=False):
+        """
+        Get total hours per day of the employee's calendar for days within
+        given range. Totals are cached per calendar, timezone and date in
+        given day totals, so that attendances are expanded only once per day.
+        """
+        self.ensure_one()
+
+        if day_totals is None:
+            day_totals = AccrualDayTotals()
+
+        calendar = self.employee_id.resource_calendar_id
+        resource = self.employee_id.resource_id
+        tz_name = (resource or calendar).tz
+        tz = timezone(tz_name)
+        if work_hours:
+            cache = day_totals.work_day_total
+        else:
+            cache = day_totals.day_total
+
+        first_day = from_datetime.astimezone(tz).date()
+        last_day = to_datetime.astimezone(tz).date()
+        days = [
+            first_day + timedelta(days=offset)
+            for offset in range((last_day - first_day).days + 1)
+        ]
+        missing_days = [
+            day for day in days
+            if (calendar.id, tz_name, day) not in cache
+        ]
+        if missing_days:
+            # retrieve attendances with one extra day margin, in order to
+            # compute the total hours on the first and last days
+            intervals = calendar._attendance_intervals(
+                tz.localize(datetime.combine(
+                    missing_days[0] - timedelta(days=1),
+                    datetime.min.time()
+                )),
+                tz.localize(datetime.combine(
+                    missing_days[-1] + timedelta(days=2),
+                    datetime.min.time()
+                )),
+                resource,
+            )
+            hours = getattr(self.employee_id, '_get_work_hours', None)
+            if not hours:
+                hours = interval_hours
+            day_total = defaultdict(float)
+            work_day_total = defaultdict(float)
+            for start, stop, meta in intervals:
+                day_total[start.date()] += interval_hours(start, stop, meta)
+                work_day_total[start.date()] += hours(start, stop, meta)
+            for day in missing_days:
+                key = (calendar.id, tz_name, day)
+                day_totals.day_total[key] = day_total[day]
+                day_totals.work_day_total[key] = work_day_total[day]
+
+        return defaultdict(float, (
+            (day, cache[(calendar.id, tz_name, day)])
+            for day in days
+        ))
+
+    @api.multi
+    def _get_accrual_snapshots(self, as_of_datetime, incremental=False,
+                               stats=None):
+        """
+        Preload attendance and leave intervals of all employees of the
+        allocations over their whole accrual horizon: attendances are expanded
+        once per calendar and timezone, leaves are retrieved once per employee
+        through the calendar. If incremental, the horizon starts from the
+        checkpoint of each allocation. If given, run stats are updated.
+
+        Returns a dict {employee_id: AccrualSnapshot}.
+        """
+        snapshot_class = self._get_accrual_snapshot_class()
+
+        horizons = {}
+        leave_types = defaultdict(set)
+        for allocation in self:
+            employee = allocation.employee_id
+            if not employee.resource_calendar_id:  # pragma: no cover
+                continue
+
+            checkpoint = incremental and allocation._get_accrual_checkpoint()
+            if checkpoint:
+                date_from = checkpoint.period_start
+            else:
+                date_from = allocation._get_date_from()
+            date_to = allocation._get_date_to()
+            if not date_to or date_to > as_of_datetime:
+                date_to = as_of_datetime
+            if date_from >= date_to:
+                continue
+
+            # NOTE: workable days are computed over the full last period and
+            # day totals need one extra day margin on both ends
+            start = (date_from - timedelta(days=1)).replace(tzinfo=utc)
+            stop = (
+                date_to
+                + allocation._get_accrual_period()
+                + timedelta(days=1)
+            ).replace(tzinfo=utc)
+            if employee in horizons:
+                start = min(start, horizons[employee][0])
+                stop = max(stop, horizons[employee][1])
+            horizons[employee] = (start, stop)
+            leave_types[employee].add(allocation.holiday_status_id.id)
+
+        employees_by_calendar = defaultdict(list)
+        for employee in horizons:
+            employees_by_calendar[employee.resource_calendar_id].append(
+                employee
+            )
+
+        snapshots = {}
+        for calendar, employees in employees_by_calendar.items():
+            calendar_start = min(horizons[e][0] for e in employees)
+            calendar_stop = max(horizons[e][1] for e in employees)
+
+            attendance_intervals = {}
+            for employee in employees:
+                resource = employee.resource_id
+                tz = timezone((resource or calendar).tz)
+                if tz not in attendance_intervals:
+                    attendance_intervals[tz] = SortedIntervals(
+                        calendar._attendance_intervals(
+                            calendar_start,
+                            calendar_stop,
+                            resource,
+                        )
+                    )
+                    if stats:
+                        stats.intervals += len(attendance_intervals[tz])
+
+                start, stop = horizons[employee]
+                attendances = Intervals(attendance_intervals[tz].clip(
+                    start.astimezone(tz),
+                    stop.astimezone(tz),
+                ))
+                # NOTE: Leaves are retrieved once over the whole horizon with
+                # the same calls as _get_worked_days() and _get_leave_days(),
+                # so that overrides of _leave_intervals() apply as well
+                global_intervals = calendar._leave_intervals(
+                    start,
+                    stop,
+                    None,
+                )
+                unpaid_intervals = calendar._leave_intervals(
+                    start,
+                    stop,
+                    resource,
+                    domain=[
+                        ('unpaid', '=', True),
+                        ('time_type', '=', 'leave'),
+                    ],
+                )
+                leave_intervals = {}
+                for holiday_status_id in leave_types[employee]:
+                    type_intervals = calendar._leave_intervals(
+                        start,
+                        stop,
+                        resource,
+                        domain=[
+                            ('holiday_status_id', '=', holiday_status_id),
+                            ('time_type', '=', 'leave'),
+                        ],
+                    )
+                    if stats:
+                        stats.intervals += len(type_intervals)
+                    leave_intervals[holiday_status_id] = attendances & (
+                        type_intervals - global_intervals
+                    )
+                if stats:
+                    stats.intervals += (
+                        len(global_intervals) + len(unpaid_intervals)
+                    )
+
+                snapshots[employee.id] = snapshot_class(
+                    tz,
+                    attendances,
+                    attendances - (unpaid_intervals - global_intervals),
+                    leave_intervals,
+                    work_hours=getattr(employee, '_get_work_hours', None),
+                )
+
+        return snapshots
+
+    @api.model
+    def _get_accrual_snapshot_class(self):
+        """
+        Use NumPy arrays of days if enabled and NumPy is available.
+        """
+        engine = self.env['ir.config_parameter'].sudo().get_param(
+            'hr_holidays_accrual_advanced.accrual_engine',
+            'intervals',
+        )
+        if engine == 'numpy':
+            if numpy:
+                return AccrualArraySnapshot
+            _logger.warning(
+                'NumPy is not available, falling back to intervals engine'
+            )
+        return AccrualSnapshot
+
     @api.multi
     def _get_accrual_period(self):
         self.ensure_one()
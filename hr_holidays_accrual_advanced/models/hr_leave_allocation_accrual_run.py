@@ -0,0 +1,421 @@
+# Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+import logging
+import traceback
+from datetime import timedelta
+
+from psycopg2.extensions import TransactionRollbackError
+
+from odoo import api, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+
+class HrLeaveAllocationAccrualRun(models.Model):
+    """Log of an accrual recalculation processed in parallel: validated
+    accrual allocations are partitioned into chunks by employee ID ranges,
+    which are processed by scheduled jobs run by the cron workers of the
+    server, so by separate processes in multi-processing mode. Each chunk
+    is committed on its own and retried on its own in case of failure.
+    """
+
+    _name = 'hr.leave.allocation.accrual.run'
+    _description = 'Accrual Recalculation Run'
+    _order = 'id desc'
+    _rec_name = 'date_start'
+
+    state = fields.Selection(
+        selection=[
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        string='Status',
+        default='running',
+        readonly=True,
+    )
+    date_start = fields.Datetime(
+        string='Started On',
+        readonly=True,
+    )
+    date_end = fields.Datetime(
+        string='Finished On',
+        readonly=True,
+    )
+    workers = fields.Integer(
+        string='Workers',
+        readonly=True,
+    )
+    chunk_ids = fields.One2many(
+        string='Chunks',
+        comodel_name='hr.leave.allocation.accrual.run.chunk',
+        inverse_name='run_id',
+        readonly=True,
+    )
+    cron_ids = fields.Many2many(
+        string='Jobs',
+        comodel_name='ir.cron',
+        readonly=True,
+        copy=False,
+    )
+
+    @api.model
+    def _get_workers(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'hr_holidays_accrual_advanced.accrual_workers',
+            0,
+        ))
+
+    @api.model
+    def _get_chunk_size(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'hr_holidays_accrual_advanced.accrual_chunk_size',
+            500,
+        ))
+
+    @api.model
+    def _run(self, allocations):
+        """
+        Recalculate given allocations in parallel, in chunks of employees.
+        Chunks are processed once the calling transaction is committed, by
+        the jobs scheduled for the run.
+        """
+        workers = max(self._get_workers(), 1)
+        chunk_size = max(self._get_chunk_size(), 1)
+
+        employee_ids = sorted(set(allocations.mapped('employee_id').ids))
+        run = self.sudo().create({
+            'date_start': fields.Datetime.now(),
+            'workers': workers,
+            'chunk_ids': [
+                (0, False, {
+                    'employee_id_from': chunk[0],
+                    'employee_id_to': chunk[-1],
+                })
+                for chunk in (
+                    employee_ids[i:i + chunk_size]
+                    for i in range(0, len(employee_ids), chunk_size)
+                )
+            ],
+        })
+        run._dispatch()
+        return run
+
+    @api.multi
+    def action_retry(self):
+        self.ensure_one()
+
+        self.chunk_ids.filtered(lambda x: x.state != 'done').write({
+            'state': 'pending',
+            'attempts': 0,
+        })
+        self.write({
+            'state': 'running',
+            'date_end': False,
+        })
+        self.sudo()._dispatch()
+
+    @api.multi
+    def _dispatch(self):
+        """
+        Schedule one job per worker, each one processing pending chunks of
+        the run until none is left. Jobs of finished runs are removed once
+        they are done.
+        """
+        self.ensure_one()
+
+        IrCron = self.env['ir.cron'].sudo()
+        finished_crons = self.search([
+            ('state', '!=', 'running'),
+        ]).with_context(active_test=False).mapped('cron_ids').filtered(
+            lambda x: not x.active
+        )
+        finished_actions = finished_crons.mapped('ir_actions_server_id')
+        finished_crons.unlink()
+        finished_actions.unlink()
+
+        model = self.env['ir.model']._get(self._name)
+        for worker in range(1, self.workers + 1):
+            self.cron_ids |= IrCron.create({
+                'name': _('Accrual Recalculation Run %s (%s of %s)') % (
+                    self.id,
+                    worker,
+                    self.workers,
+                ),
+                'model_id': model.id,
+                'state': 'code',
+                'code': 'model._cron_process_run(%s)' % self.id,
+                'numbercall': 1,
+                'nextcall': fields.Datetime.now(),
+            })
+
+        _logger.info(
+            'Scheduled recalculation of accrual allocations in %s chunk(s)'
+            ' using %s worker(s)',
+            len(self.chunk_ids),
+            self.workers,
+        )
+
+        if self.pool.in_test_mode():
+            # NOTE: Jobs can not run while testing, since the transaction is
+            # not committed
+            self._process()
+
+    @api.model
+    def _cron_process_run(self, run_id):
+        self.sudo().browse(run_id).exists()._process()
+
+    @api.model
+    def _cron_reclaim_stale_chunks(self):
+        """
+        Resume runs left with chunks that are still running past the timeout,
+        since the job processing them has crashed, once no job of the run is
+        scheduled anymore.
+        """
+        for run in self.sudo().search([('state', '=', 'running')]):
+            run._reclaim_stale_chunks()
+            if 'pending' not in run.chunk_ids.mapped('state'):
+                run._finish()
+            elif not run.cron_ids.filtered('active'):
+                run._dispatch()
+
+    @api.multi
+    def _reclaim_stale_chunks(self):
+        """
+        Put chunks claimed before the timeout back to pending, or mark them
+        as failed if no attempts are left. Chunks are locked by the job
+        processing them, so locked ones are skipped.
+        """
+        HrLeaveAllocationAccrualRunChunk = self.env[
+            'hr.leave.allocation.accrual.run.chunk'
+        ]
+        stale_before = fields.Datetime.now() - timedelta(
+            minutes=HrLeaveAllocationAccrualRunChunk._get_timeout()
+        )
+        self.env.cr.execute(
+            """
+            SELECT id
+            FROM %s
+            WHERE run_id IN %%s AND state = 'running' AND date_start < %%s
+            FOR UPDATE SKIP LOCKED
+            """ % HrLeaveAllocationAccrualRunChunk._table,
+            (tuple(self.ids), stale_before),
+        )
+        chunks = HrLeaveAllocationAccrualRunChunk.browse(
+            [row[0] for row in self.env.cr.fetchall()]
+        )
+        if not chunks:
+            return
+        chunks.invalidate_cache(['state', 'attempts'])
+
+        _logger.warning(
+            'Reclaiming %s accrual recalculation chunk(s) running since'
+            ' before %s',
+            len(chunks),
+            stale_before,
+        )
+        max_attempts = chunks._get_max_attempts()
+        chunks.filtered(lambda x: x.attempts < max_attempts).write({
+            'state': 'pending',
+        })
+        chunks.filtered(lambda x: x.attempts >= max_attempts).write({
+            'state': 'failed',
+            'error': _('Processing timed out'),
+            'date_end': fields.Datetime.now(),
+        })
+
+    @api.multi
+    def _process(self):
+        """
+        Process pending chunks of the run one by one, locking the claimed
+        one so that concurrent jobs of the run skip it, then finish the run
+        if no chunk is pending or running anymore.
+        """
+        HrLeaveAllocationAccrualRunChunk = self.env[
+            'hr.leave.allocation.accrual.run.chunk'
+        ]
+
+        for run in self:
+            run._reclaim_stale_chunks()
+            while True:
+                try:
+                    self.env.cr.execute(
+                        """
+                        SELECT id
+                        FROM %s
+                        WHERE run_id = %%s AND state = 'pending'
+                        ORDER BY employee_id_from
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                        """ % HrLeaveAllocationAccrualRunChunk._table,
+                        (run.id,),
+                    )
+                except TransactionRollbackError:
+                    # NOTE: Chunk was claimed by a concurrent job after the
+                    # snapshot of this transaction was taken
+                    self.env.cr.rollback()
+                    continue
+                row = self.env.cr.fetchone()
+                if not row:
+                    break
+                HrLeaveAllocationAccrualRunChunk.browse(row[0])._process()
+            try:
+                run._finish()
+            except TransactionRollbackError:
+                # NOTE: Run was finished by a concurrent job
+                self.env.cr.rollback()
+
+    @api.multi
+    def _finish(self):
+        # NOTE: Chunks may have been processed by other jobs
+        self.mapped('chunk_ids').invalidate_cache(['state'])
+        for run in self:
+            states = set(run.chunk_ids.mapped('state'))
+            if states & {'pending', 'running'}:
+                continue
+            run.write({
+                'state': 'failed' if states - {'done'} else 'done',
+                'date_end': fields.Datetime.now(),
+            })
+
+
+class HrLeaveAllocationAccrualRunChunk(models.Model):
+    _name = 'hr.leave.allocation.accrual.run.chunk'
+    _description = 'Accrual Recalculation Run Chunk'
+    _order = 'run_id, employee_id_from'
+
+    run_id = fields.Many2one(
+        string='Run',
+        comodel_name='hr.leave.allocation.accrual.run',
+        required=True,
+        ondelete='cascade',
+    )
+    employee_id_from = fields.Integer(
+        string='From Employee ID',
+        readonly=True,
+    )
+    employee_id_to = fields.Integer(
+        string='To Employee ID',
+        readonly=True,
+    )
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        string='Status',
+        default='pending',
+        readonly=True,
+    )
+    attempts = fields.Integer(
+        string='Attempts',
+        readonly=True,
+    )
+    allocation_count = fields.Integer(
+        string='Allocations',
+        readonly=True,
+    )
+    date_start = fields.Datetime(
+        string='Started On',
+        readonly=True,
+    )
+    date_end = fields.Datetime(
+        string='Finished On',
+        readonly=True,
+    )
+    error = fields.Text(
+        string='Error',
+        readonly=True,
+    )
+
+    @api.model
+    def _get_max_attempts(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'hr_holidays_accrual_advanced.accrual_max_attempts',
+            3,
+        ))
+
+    @api.model
+    def _get_timeout(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'hr_holidays_accrual_advanced.accrual_chunk_timeout',
+            60,
+        ))
+
+    @api.multi
+    def _get_allocations_domain(self):
+        self.ensure_one()
+
+        return [
+            ('accrual', '=', True),
+            ('state', '=', 'validate'),
+            ('holiday_type', '=', 'employee'),
+            ('employee_id', '>=', self.employee_id_from),
+            ('employee_id', '<=', self.employee_id_to),
+        ]
+
+    @api.multi
+    def _commit(self):
+        if not self.pool.in_test_mode():
+            self.env.cr.commit()
+
+    @api.multi
+    def _process(self):
+        """
+        Recalculate allocations of the chunk, committing on success and
+        retrying up to the maximum number of attempts on failure.
+        """
+        HrLeaveAllocation = self.env['hr.leave.allocation'].sudo()
+        max_attempts = self._get_max_attempts()
+
+        for chunk in self:
+            while chunk.attempts < max_attempts:
+                chunk.write({
+                    'state': 'running',
+                    'attempts': chunk.attempts + 1,
+                    'date_start': fields.Datetime.now(),
+                })
+                chunk._commit()
+                # NOTE: Lock is held until the outcome is committed, so that
+                # the chunk is reclaimed only if the job processing it is gone
+                self.env.cr.execute(
+                    'SELECT id FROM %s WHERE id = %%s FOR UPDATE' % (
+                        self._table,
+                    ),
+                    (chunk.id,),
+                )
+
+                try:
+                    with self.env.cr.savepoint():
+                        allocations = HrLeaveAllocation.search(
+                            chunk._get_allocations_domain()
+                        )
+                        allocations._update_accrual_allocations()
+                except Exception:
+                    _logger.exception(
+                        'Failed to recalculate accrual allocations of'
+                        ' employees %s to %s (attempt %s)',
+                        chunk.employee_id_from,
+                        chunk.employee_id_to,
+                        chunk.attempts,
+                    )
+                    self.env.clear()
+                    chunk.write({
+                        'state': 'failed',
+                        'error': traceback.format_exc(),
+                        'date_end': fields.Datetime.now(),
+                    })
+                    chunk._commit()
+                    continue
+
+                chunk.write({
+                    'state': 'done',
+                    'allocation_count': len(allocations),
+                    'error': False,
+                    'date_end': fields.Datetime.now(),
+                })
+                chunk._commit()
+                break
@@ -31,3 +31,12 @@ class HrLeaveAllocationAccruement(models.Model):
         readonly=True,
         required=True,
     )
+    period_start = fields.Datetime(
+        string='Accrual Period Start',
+        readonly=True,
+    )
+    usage = fields.Boolean(
+        string='Usage',
+        readonly=True,
+        help='Leave days used from the allocation during the period',
+    )
@@ -0,0 +1,18 @@
+# Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+
+class HrLeaveType(models.Model):
+    _inherit = 'hr.leave.type'
+
+    @api.multi
+    def write(self, values):
+        result = super().write(values)
+        if 'unpaid' in values:
+            # NOTE: Worked days change since the first leave of the types
+            self.env['resource.calendar.leaves'].sudo().search([
+                ('holiday_status_id', 'in', self.ids),
+            ])._mark_accrual_allocations_dirty()
+        return result
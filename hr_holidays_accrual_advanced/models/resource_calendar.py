@@ -0,0 +1,29 @@
+# Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+
+class ResourceCalendar(models.Model):
+    _inherit = 'resource.calendar'
+
+    @api.multi
+    def write(self, values):
+        result = super().write(values)
+        if 'tz' in values:
+            self._get_accrual_allocations()._reset_accrual_checkpoint()
+        elif 'hours_per_day' in values:
+            self._get_accrual_allocations().filtered(
+                lambda x: x.unit_per_interval == 'hours'
+            )._reset_accrual_checkpoint()
+        return result
+
+    @api.multi
+    def _get_accrual_allocations(self):
+        """Get accrual allocations of employees working on the calendars."""
+        employees = self.env['hr.employee'].sudo().search([
+            ('resource_calendar_id', 'in', self.ids),
+        ])
+        return self.env['hr.leave.allocation'].sudo()._get_accrual_allocations(
+            employees
+        )
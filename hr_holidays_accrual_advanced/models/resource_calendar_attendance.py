@@ -0,0 +1,53 @@
+# Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+from datetime import datetime, timedelta
+
+from odoo import api, models
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = 'resource.calendar.attendance'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._mark_accrual_allocations_dirty()
+        return records
+
+    @api.multi
+    def write(self, values):
+        self._mark_accrual_allocations_dirty()
+        result = super().write(values)
+        self._mark_accrual_allocations_dirty()
+        return result
+
+    @api.multi
+    def unlink(self):
+        self._mark_accrual_allocations_dirty()
+        return super().unlink()
+
+    @api.multi
+    def _mark_accrual_allocations_dirty(self):
+        """Mark accruement history of employees working on the calendars as
+        outdated starting from the beginning of the attendances, or entirely
+        if attendances are not limited in time."""
+        HrEmployee = self.env['hr.employee'].sudo()
+        HrLeaveAllocation = self.env['hr.leave.allocation'].sudo()
+
+        for calendar in self.mapped('calendar_id'):
+            employees = HrEmployee.search([
+                ('resource_calendar_id', '=', calendar.id),
+            ])
+            if not employees:
+                continue
+            allocations = HrLeaveAllocation._get_accrual_allocations(employees)
+            attendances = self.filtered(lambda x: x.calendar_id == calendar)
+            if not all(attendances.mapped('date_from')):
+                allocations._reset_accrual_checkpoint()
+                continue
+            # NOTE: One extra day margin to cover timezones
+            allocations._mark_accrual_dirty(datetime.combine(
+                min(attendances.mapped('date_from')),
+                datetime.min.time()
+            ) - timedelta(days=1))
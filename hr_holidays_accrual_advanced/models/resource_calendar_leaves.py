@@ -1,7 +1,9 @@
 # Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
-from odoo import models, fields
+from collections import defaultdict
+
+from odoo import api, models, fields
 
 
 class ResourceCalendarLeaves(models.Model):
@@ -15,3 +17,46 @@ class ResourceCalendarLeaves(models.Model):
         related='holiday_id.holiday_status_id.unpaid',
         store=True,
     )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._mark_accrual_allocations_dirty()
+        return records
+
+    @api.multi
+    def write(self, values):
+        self._mark_accrual_allocations_dirty()
+        result = super().write(values)
+        self._mark_accrual_allocations_dirty()
+        return result
+
+    @api.multi
+    def unlink(self):
+        self._mark_accrual_allocations_dirty()
+        return super().unlink()
+
+    @api.multi
+    def _mark_accrual_allocations_dirty(self):
+        """Mark accruement history of affected employees as outdated starting
+        from the beginning of the leaves."""
+        HrEmployee = self.env['hr.employee'].sudo()
+        HrLeaveAllocation = self.env['hr.leave.allocation'].sudo()
+
+        dirty_from = defaultdict(list)
+        for leave in self.filtered('date_from'):
+            if leave.resource_id:
+                key = ('resource_id', leave.resource_id.id)
+            elif leave.calendar_id:
+                key = ('resource_calendar_id', leave.calendar_id.id)
+            else:  # pragma: no cover
+                continue
+            dirty_from[key].append(leave.date_from)
+
+        for (field_name, res_id), dates in dirty_from.items():
+            employees = HrEmployee.search([(field_name, '=', res_id)])
+            if not employees:
+                continue
+            HrLeaveAllocation._get_accrual_allocations(
+                employees
+            )._mark_accrual_dirty(min(dates))
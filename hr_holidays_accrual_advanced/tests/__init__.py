@@ -1,3 +1,4 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+from . import test_accrual_benchmark
 from . import test_hr_holidays_accrual_advanced
@@ -0,0 +1,228 @@
+# Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+import json
+import logging
+import os
+import time
+import tracemalloc
+
+from unittest import mock
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import common, tagged
+
+from ..models.accrual_snapshot import numpy
+
+_logger = logging.getLogger(__name__)
+
+module_ns = 'odoo.addons.hr_holidays_accrual_advanced'
+hr_leave_allocation_class = (
+    module_ns + '.models.hr_leave_allocation.HrLeaveAllocation'
+)
+_get_date_from = hr_leave_allocation_class + '._get_date_from'
+
+BENCHMARK_OUTPUT = 'HR_HOLIDAYS_ACCRUAL_BENCHMARK_OUTPUT'
+
+
+@tagged('-standard', 'benchmark')
+class TestAccrualBenchmark(common.TransactionCase):
+    """
+    Benchmark of the accrual engine on synthetic tenures, not run by default:
+
+        odoo-bin -i hr_holidays_accrual_advanced --test-enable \\
+            --test-tags benchmark
+
+    Results are written as JSON to the file named by
+    HR_HOLIDAYS_ACCRUAL_BENCHMARK_OUTPUT environment variable, or logged.
+    """
+
+    YEARS = [1, 5, 10, 20, 30]
+    INTERVAL_UNITS = ['weeks', 'months', 'years']
+    LIMITS = [
+        {},
+        {
+            'limit_accrued_days': True,
+            'max_accrued_days': 1.0,
+        },
+        {
+            'limit_carryover_days': True,
+            'max_carryover_days': 5.0,
+        },
+        {
+            'limit_accrued_days': True,
+            'max_accrued_days': 1.0,
+            'limit_carryover_days': True,
+            'max_carryover_days': 5.0,
+            'limit_accumulated_days': True,
+            'max_accumulated_days': 20.0,
+        },
+    ]
+
+    def setUp(self):
+        super().setUp()
+
+        self.now = datetime.combine(
+            fields.Date.today(),
+            datetime.min.time()
+        )
+        self.SudoEmployee = self.env['hr.employee'].sudo()
+        self.SudoLeaveType = self.env['hr.leave.type'].sudo()
+        self.SudoLeaveAllocation = self.env['hr.leave.allocation'].sudo()
+        self.SudoLeave = self.env['hr.leave'].sudo()
+        self.SudoResourceCalendar = self.env['resource.calendar'].sudo()
+
+        self.leave_type = self.SudoLeaveType.create({
+            'name': 'Benchmark Leave Type',
+            'allocation_type': 'fixed',
+            'validity_start': False,
+        })
+        self.unpaid_leave_type = self.SudoLeaveType.create({
+            'name': 'Benchmark Leave Type (unpaid)',
+            'allocation_type': 'no',
+            'unpaid': True,
+            'validity_start': False,
+        })
+
+    def _create_employee(self, years):
+        """
+        Create an employee with given tenure and a dense leave history: a
+        global leave each quarter and an unpaid leave every other month.
+        """
+        name = 'Benchmark %sy' % years
+        date_from = self.now - relativedelta(years=years, days=3)
+
+        calendar = self.SudoResourceCalendar.create({
+            'name': name,
+            'tz': 'Europe/Kiev',
+            'global_leave_ids': [
+                (0, False, {
+                    'name': '%s #%s' % (name, index),
+                    'date_from': date_from + relativedelta(months=index * 3),
+                    'date_to': (
+                        date_from + relativedelta(months=index * 3, days=1)
+                    ),
+                })
+                for index in range(years * 4)
+            ],
+        })
+        employee = self.SudoEmployee.create({
+            'name': name,
+            'resource_calendar_id': calendar.id,
+        })
+        for index in range(years * 6):
+            leave_from = date_from + relativedelta(months=index * 2, days=7)
+            leave = self.SudoLeave.create({
+                'name': '%s #%s' % (name, index),
+                'employee_id': employee.id,
+                'holiday_status_id': self.unpaid_leave_type.id,
+                'date_from': leave_from,
+                'date_to': leave_from + relativedelta(days=2, hours=4),
+            })
+            leave._onchange_leave_dates()
+            leave.action_approve()
+
+        return employee, date_from
+
+    def _create_allocation(self, employee, interval_unit, limits):
+        values = {
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': self.leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'accrual_method': 'prorate',
+            'interval_unit': interval_unit,
+        }
+        values.update(limits)
+        return self.SudoLeaveAllocation.create(values)
+
+    def _measure(self, function):
+        """
+        Measure wall time and queries of a run, then peak memory of another
+        run since tracing memory slows execution down.
+        """
+        self.env.invalidate_all()
+        sql_log_count = self.env.cr.sql_log_count
+        started = time.perf_counter()
+        result = function()
+        wall_time = time.perf_counter() - started
+        queries = self.env.cr.sql_log_count - sql_log_count
+
+        self.env.invalidate_all()
+        tracemalloc.start()
+        try:
+            function()
+            _current, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return result, {
+            'wall_time': wall_time,
+            'queries': queries,
+            'peak_memory': peak_memory,
+        }
+
+    def _get_engine(self, allocation, engine):
+        if engine == 'record':
+            return lambda: allocation._calculate_accrued_amount(self.now)
+
+        self.env['ir.config_parameter'].sudo().set_param(
+            'hr_holidays_accrual_advanced.accrual_engine',
+            engine
+        )
+
+        def _calculate():
+            snapshots = allocation._get_accrual_snapshots(self.now)
+            return allocation._calculate_accrued_amount(
+                self.now,
+                snapshot=snapshots[allocation.employee_id.id],
+            )
+        return _calculate
+
+    def test_benchmark(self):
+        engines = ['record', 'intervals']
+        if numpy:
+            engines.append('numpy')
+
+        results = []
+        for years in self.YEARS:
+            employee, date_from = self._create_employee(years)
+            for interval_unit in self.INTERVAL_UNITS:
+                for limits in self.LIMITS:
+                    allocation = self._create_allocation(
+                        employee,
+                        interval_unit,
+                        limits,
+                    )
+                    with mock.patch(_get_date_from, return_value=date_from):
+                        for engine in engines:
+                            (accruements, number_of_days), metrics = (
+                                self._measure(
+                                    self._get_engine(allocation, engine)
+                                )
+                            )
+                            metrics.update({
+                                'engine': engine,
+                                'years': years,
+                                'interval_unit': interval_unit,
+                                'limits': sorted(
+                                    key for key in limits
+                                    if key.startswith('limit_')
+                                ),
+                                'accruements': len(accruements),
+                                'number_of_days': number_of_days,
+                            })
+                            results.append(metrics)
+
+        output = os.environ.get(BENCHMARK_OUTPUT)
+        if output:
+            with open(output, 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+        else:
+            _logger.info('Accrual benchmark: %s', json.dumps(
+                results,
+                sort_keys=True,
+            ))
@@ -1,12 +1,21 @@
 # Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
-from unittest import mock
+from unittest import mock, skipIf
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
+from pytz import utc
 
 from odoo import fields
 from odoo.tests import common
+from odoo.addons.resource.models.resource import Intervals
+
+from ..models.accrual_snapshot import (
+    AccrualArraySnapshot,
+    AccrualRunStats,
+    AccrualSnapshot,
+    numpy,
+)
 
 module_ns = 'odoo.addons.hr_holidays_accrual_advanced'
 hr_leave_allocation_class = (
@@ -752,6 +761,724 @@ class TestHrHolidaysAccrualAdvanced(common.TransactionCase):
             accruements
         )), 30.0)
 
+    def test_batch_recalculation(self):
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #25',
+            'allocation_type': 'fixed',
+            'validity_start': False,
+        })
+        unpaid_leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #25 (unpaid)',
+            'allocation_type': 'no',
+            'unpaid': True,
+            'validity_start': False,
+        })
+        calendar = self.SudoResourceCalendar.create({
+            'name': 'Calendar #25',
+            'tz': 'America/New_York',
+        })
+        calendar.write({
+            'global_leave_ids': [
+                (0, False, {
+                    'name': 'Global Leave #25',
+                    'date_from': self.now - relativedelta(months=3),
+                    'date_to': (
+                        self.now - relativedelta(months=3) +
+                        relativedelta(days=2)
+                    ),
+                }),
+            ],
+        })
+        employee = self.SudoEmployee.create({
+            'name': 'Employee #25',
+            'resource_calendar_id': calendar.id,
+        })
+        allocations = self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'weeks',
+            'number_per_interval': 0.5,
+        })
+        allocations |= self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'months',
+            'limit_accrued_days': True,
+            'max_accrued_days': 1.0,
+        })
+        leave = self.SudoLeave.create({
+            'name': 'Leave #25',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'date_from': self.now - relativedelta(months=2),
+            'date_to': (
+                self.now - relativedelta(months=2) + relativedelta(days=3)
+            ),
+        })
+        leave._onchange_leave_dates()
+        leave.action_approve()
+        unpaid_leave = self.SudoLeave.create({
+            'name': 'Leave #25 (unpaid)',
+            'employee_id': employee.id,
+            'holiday_status_id': unpaid_leave_type.id,
+            'date_from': self.now - relativedelta(months=5),
+            'date_to': self.now - relativedelta(months=4),
+        })
+        unpaid_leave._onchange_leave_dates()
+        unpaid_leave.action_approve()
+
+        date_from = self.now - relativedelta(years=1, days=3)
+        with mock.patch(_get_date_from, return_value=date_from):
+            snapshots = allocations._get_accrual_snapshots(self.now)
+            for allocation in allocations:
+                expected = allocation._calculate_accrued_amount(self.now)
+                actual = allocation._calculate_accrued_amount(
+                    self.now,
+                    snapshot=snapshots[employee.id],
+                )
+                self.assertEqual(actual, expected)
+
+            allocations._update_accrual_allocations()
+            for allocation in allocations:
+                self.assertAlmostEqual(
+                    allocation.number_of_days,
+                    allocation._calculate_accrued_amount(self.now)[1],
+                )
+
+    def test_batch_recalculation_leave_intervals_hook(self):
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #25 (hook)',
+            'allocation_type': 'fixed',
+            'validity_start': False,
+        })
+        calendar = self.SudoResourceCalendar.create({
+            'name': 'Calendar #25 (hook)',
+            'tz': 'UTC',
+        })
+        employee = self.SudoEmployee.create({
+            'name': 'Employee #25 (hook)',
+            'resource_calendar_id': calendar.id,
+        })
+        allocation = self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'weeks',
+            'number_per_interval': 1.0,
+        })
+
+        # Extra leaves added by overrides of _leave_intervals(), such as
+        # public holidays, on the whole third week before now
+        calendar_class = type(self.ResourceCalendar)
+        _leave_intervals = calendar_class._leave_intervals
+        holiday_start = (self.now - relativedelta(weeks=3)).replace(
+            tzinfo=utc
+        )
+        holiday_stop = holiday_start + relativedelta(weeks=1)
+
+        def _hooked_leave_intervals(self, start_dt, end_dt, resource=None,
+                                    domain=None):
+            res = _leave_intervals(
+                self, start_dt, end_dt, resource=resource, domain=domain,
+            )
+            if resource and domain and ('unpaid', '=', True) in domain:
+                res = res | Intervals([(
+                    max(start_dt, holiday_start),
+                    min(end_dt, holiday_stop),
+                    self.env['resource.calendar.leaves'],
+                )])
+            return res
+
+        date_from = self.now - relativedelta(years=1, days=3)
+        with mock.patch(_get_date_from, return_value=date_from):
+            without_hook = allocation._calculate_accrued_amount(self.now)
+            with mock.patch.object(
+                calendar_class,
+                '_leave_intervals',
+                _hooked_leave_intervals,
+            ):
+                expected = allocation._calculate_accrued_amount(self.now)
+                snapshots = allocation._get_accrual_snapshots(self.now)
+                actual = allocation._calculate_accrued_amount(
+                    self.now,
+                    snapshot=snapshots[employee.id],
+                )
+        self.assertEqual(actual, expected)
+        self.assertNotEqual(actual, without_hook)
+
+    def test_incremental_recalculation(self):
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #26',
+            'allocation_type': 'fixed',
+            'validity_start': False,
+        })
+        unpaid_leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #26 (unpaid)',
+            'allocation_type': 'no',
+            'unpaid': True,
+            'validity_start': False,
+        })
+        employee = self.SudoEmployee.create({
+            'name': 'Employee #26',
+        })
+        allocation = self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'weeks',
+            'number_per_interval': 0.5,
+            'limit_carryover_days': True,
+            'max_carryover_days': 15.0,
+        })
+
+        def _get_ledger():
+            return [
+                (x.days_accrued, x.accrued_on, x.reason)
+                for x in allocation.accruement_ids
+            ]
+
+        def _get_expected_ledger():
+            accruements, number_of_days = (
+                allocation._calculate_accrued_amount(self.now)
+            )
+            return [
+                (x.days_accrued, x.accrued_on, x.reason)
+                for x in accruements
+            ], number_of_days
+
+        date_from = self.now - relativedelta(years=1, days=3)
+        with mock.patch(_get_date_from, return_value=date_from):
+            allocation._update_accrual_allocation()
+            self.assertTrue(allocation.accrual_checkpoint_date)
+            self.assertLess(allocation.accrual_checkpoint_date, self.now)
+            ledger, number_of_days = _get_expected_ledger()
+            self.assertEqual(_get_ledger(), ledger)
+            self.assertAlmostEqual(allocation.number_of_days, number_of_days)
+
+            allocation._update_accrual_allocation()
+            self.assertEqual(_get_ledger(), ledger)
+            self.assertAlmostEqual(allocation.number_of_days, number_of_days)
+
+            unpaid_leave = self.SudoLeave.create({
+                'name': 'Leave #26 (unpaid)',
+                'employee_id': employee.id,
+                'holiday_status_id': unpaid_leave_type.id,
+                'date_from': self.now - relativedelta(months=3),
+                'date_to': (
+                    self.now - relativedelta(months=3) + relativedelta(days=4)
+                ),
+            })
+            unpaid_leave._onchange_leave_dates()
+            unpaid_leave.action_approve()
+            self.assertTrue(allocation.accrual_dirty_from)
+
+            allocation._update_accrual_allocation()
+            self.assertFalse(allocation.accrual_dirty_from)
+            ledger, number_of_days = _get_expected_ledger()
+            self.assertEqual(_get_ledger(), ledger)
+            self.assertAlmostEqual(allocation.number_of_days, number_of_days)
+
+            allocation.write({
+                'number_per_interval': 1.0,
+            })
+            self.assertFalse(allocation.accrual_checkpoint_date)
+            allocation._update_accrual_allocation()
+            ledger, number_of_days = _get_expected_ledger()
+            self.assertEqual(_get_ledger(), ledger)
+            self.assertAlmostEqual(allocation.number_of_days, number_of_days)
+
+    def test_incremental_recalculation_revalidated(self):
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #32',
+            'allocation_type': 'fixed',
+            'validity_start': False,
+        })
+        unpaid_leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #32 (unpaid)',
+            'allocation_type': 'no',
+            'unpaid': True,
+            'validity_start': False,
+        })
+        employee = self.SudoEmployee.create({
+            'name': 'Employee #32',
+        })
+        allocation = self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'weeks',
+            'number_per_interval': 0.5,
+        })
+
+        date_from = self.now - relativedelta(years=1, days=3)
+        with mock.patch(_get_date_from, return_value=date_from):
+            allocation._update_accrual_allocation()
+            self.assertTrue(allocation.accrual_checkpoint_date)
+
+            allocation.action_refuse()
+            self.assertEqual(allocation.state, 'refuse')
+
+            unpaid_leave = self.SudoLeave.create({
+                'name': 'Leave #32 (unpaid)',
+                'employee_id': employee.id,
+                'holiday_status_id': unpaid_leave_type.id,
+                'date_from': self.now - relativedelta(months=3),
+                'date_to': (
+                    self.now - relativedelta(months=3) + relativedelta(days=4)
+                ),
+            })
+            unpaid_leave._onchange_leave_dates()
+            unpaid_leave.action_approve()
+
+            allocation.action_draft()
+            allocation.action_confirm()
+            allocation.action_validate()
+            self.assertEqual(allocation.state, 'validate')
+            self.assertFalse(allocation.accrual_checkpoint_date)
+
+            allocation._update_accrual_allocation()
+            accruements, number_of_days = (
+                allocation._calculate_accrued_amount(self.now)
+            )
+            self.assertEqual(
+                [
+                    (x.days_accrued, x.accrued_on, x.reason)
+                    for x in allocation.accruement_ids
+                ],
+                [
+                    (x.days_accrued, x.accrued_on, x.reason)
+                    for x in accruements
+                ]
+            )
+            self.assertAlmostEqual(allocation.number_of_days, number_of_days)
+
+    def test_incremental_recalculation_triggers(self):
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #31',
+            'allocation_type': 'fixed',
+            'validity_start': False,
+        })
+        unpaid_leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #31 (unpaid)',
+            'allocation_type': 'no',
+            'validity_start': False,
+        })
+        calendar = self.SudoResourceCalendar.create({
+            'name': 'Calendar #31',
+            'tz': 'UTC',
+        })
+        employee = self.SudoEmployee.create({
+            'name': 'Employee #31',
+            'resource_calendar_id': calendar.id,
+        })
+        allocation = self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'weeks',
+            'number_per_interval': 0.5,
+        })
+        hours_allocation = self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'weeks',
+            'unit_per_interval': 'hours',
+            'number_per_interval': 4.0,
+        })
+        allocations = allocation | hours_allocation
+
+        def _assertUpToDate():
+            for record in allocations:
+                self.assertAlmostEqual(
+                    record.number_of_days,
+                    record._calculate_accrued_amount(self.now)[1],
+                )
+
+        date_from = self.now - relativedelta(years=1, days=3)
+        with mock.patch(_get_date_from, return_value=date_from):
+            allocations._update_accrual_allocations()
+            unpaid_leave = self.SudoLeave.create({
+                'name': 'Leave #31',
+                'employee_id': employee.id,
+                'holiday_status_id': unpaid_leave_type.id,
+                'date_from': self.now - relativedelta(months=3),
+                'date_to': (
+                    self.now - relativedelta(months=3) + relativedelta(days=4)
+                ),
+            })
+            unpaid_leave._onchange_leave_dates()
+            unpaid_leave.action_approve()
+            allocations._update_accrual_allocations()
+            self.assertFalse(allocation.accrual_dirty_from)
+
+            unpaid_leave_type.unpaid = True
+            self.assertTrue(allocation.accrual_dirty_from)
+            self.assertLess(allocation.accrual_dirty_from, self.now)
+            allocations._update_accrual_allocations()
+            _assertUpToDate()
+
+            calendar.hours_per_day = 4.0
+            self.assertTrue(allocation.accrual_checkpoint_date)
+            self.assertFalse(hours_allocation.accrual_checkpoint_date)
+            allocations._update_accrual_allocations()
+            _assertUpToDate()
+
+            calendar.tz = 'Europe/Kiev'
+            self.assertFalse(allocation.accrual_checkpoint_date)
+            self.assertFalse(hours_allocation.accrual_checkpoint_date)
+            allocations._update_accrual_allocations()
+            _assertUpToDate()
+
+    def test_day_totals_cache(self):
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #27',
+            'allocation_type': 'fixed',
+        })
+        employee = self.SudoEmployee.create({
+            'name': 'Employee #27',
+        })
+        allocation = self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'months',
+            'number_per_interval': 1.0,
+        })
+
+        date_from = self.now - relativedelta(years=1, days=3)
+        ResourceCalendar = type(self.ResourceCalendar)
+        with mock.patch(_get_date_from, return_value=date_from), \
+                mock.patch.object(
+                    ResourceCalendar,
+                    '_attendance_intervals',
+                    autospec=True,
+                    side_effect=ResourceCalendar._attendance_intervals,
+                ) as attendance_intervals:
+            accruements, number_of_days = (
+                allocation._calculate_accrued_amount(self.now)
+            )
+        # NOTE: 13 periods, at most one expansion for day totals and one for
+        # actual hours per period, plus the truncated last period
+        self.assertLessEqual(attendance_intervals.call_count, 2 * 13 + 2)
+        self.assertAlmostEqual(number_of_days, 12.0, 0)
+
+    def test_run_stats(self):
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #30',
+            'allocation_type': 'fixed',
+        })
+        employee = self.SudoEmployee.create({
+            'name': 'Employee #30',
+        })
+        allocation = self.SudoLeaveAllocation.create({
+            'holiday_type': 'employee',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'state': 'validate',
+            'accrual': True,
+            'interval_unit': 'months',
+            'number_per_interval': 1.0,
+        })
+
+        stats = AccrualRunStats()
+        date_from = self.now - relativedelta(years=1, days=3)
+        with mock.patch(_get_date_from, return_value=date_from):
+            snapshots = allocation._get_accrual_snapshots(
+                self.now,
+                stats=stats,
+            )
+            allocation._calculate_accrual_ledger(
+                self.now,
+                snapshot=snapshots[employee.id],
+                stats=stats,
+            )
+        self.assertEqual(stats.allocations, 1)
+        self.assertEqual(stats.periods, 13)
+        self.assertGreater(stats.intervals, 0)
+
+    def test_parallel_recalculation(self):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'hr_holidays_accrual_advanced.accrual_workers',
+            2
+        )
+        self.env['ir.config_parameter'].sudo().set_param(
+            'hr_holidays_accrual_advanced.accrual_chunk_size',
+            1
+        )
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #28',
+            'allocation_type': 'fixed',
+        })
+        allocations = self.SudoLeaveAllocation
+        for index in range(3):
+            employee = self.SudoEmployee.create({
+                'name': 'Employee #28-%s' % index,
+            })
+            allocations |= self.SudoLeaveAllocation.create({
+                'holiday_type': 'employee',
+                'employee_id': employee.id,
+                'holiday_status_id': leave_type.id,
+                'state': 'validate',
+                'accrual': True,
+                'interval_unit': 'months',
+                'number_per_interval': 1.0,
+            })
+
+        date_from = self.now - relativedelta(years=1, days=3)
+        with mock.patch(_get_date_from, return_value=date_from):
+            run = self.env['hr.leave.allocation.accrual.run']._run(
+                allocations
+            )
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(run.workers, 2)
+        self.assertEqual(len(run.cron_ids), 2)
+        self.assertEqual(len(run.chunk_ids), 3)
+        self.assertEqual(set(run.chunk_ids.mapped('state')), {'done'})
+        self.assertEqual(sum(run.chunk_ids.mapped('allocation_count')), 3)
+        for allocation in allocations:
+            self.assertAlmostEqual(allocation.number_of_days, 12.0, 0)
+
+        # NOTE: Jobs of finished runs are removed once done
+        crons = run.cron_ids
+        crons.write({
+            'active': False,
+        })
+        with mock.patch(_get_date_from, return_value=date_from):
+            next_run = self.env['hr.leave.allocation.accrual.run']._run(
+                allocations
+            )
+        self.assertFalse(crons.exists())
+        self.assertEqual(len(next_run.cron_ids), 2)
+        self.assertEqual(next_run.state, 'done')
+
+    def test_parallel_recalculation_stale_chunks(self):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'hr_holidays_accrual_advanced.accrual_workers',
+            1
+        )
+        self.env['ir.config_parameter'].sudo().set_param(
+            'hr_holidays_accrual_advanced.accrual_chunk_size',
+            1
+        )
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #33',
+            'allocation_type': 'fixed',
+        })
+        allocations = self.SudoLeaveAllocation
+        for index in range(3):
+            employee = self.SudoEmployee.create({
+                'name': 'Employee #33-%s' % index,
+            })
+            allocations |= self.SudoLeaveAllocation.create({
+                'holiday_type': 'employee',
+                'employee_id': employee.id,
+                'holiday_status_id': leave_type.id,
+                'state': 'validate',
+                'accrual': True,
+                'interval_unit': 'months',
+                'number_per_interval': 1.0,
+            })
+
+        date_from = self.now - relativedelta(years=1, days=3)
+        with mock.patch(_get_date_from, return_value=date_from):
+            run = self.env['hr.leave.allocation.accrual.run']._run(
+                allocations
+            )
+        self.assertEqual(run.state, 'done')
+
+        # NOTE: Simulate jobs that crashed while processing chunks
+        stale_chunk, exhausted_chunk, recent_chunk = run.chunk_ids
+        (stale_chunk | exhausted_chunk).write({
+            'state': 'running',
+            'attempts': 1,
+            'date_start': fields.Datetime.now() - relativedelta(hours=2),
+        })
+        exhausted_chunk.write({
+            'attempts': 3,
+        })
+        recent_chunk.write({
+            'state': 'running',
+            'attempts': 1,
+            'date_start': fields.Datetime.now(),
+        })
+        run.write({
+            'state': 'running',
+            'date_end': False,
+        })
+        run.cron_ids.write({
+            'active': False,
+        })
+
+        with mock.patch(_get_date_from, return_value=date_from):
+            self.env[
+                'hr.leave.allocation.accrual.run'
+            ]._cron_reclaim_stale_chunks()
+        self.assertEqual(stale_chunk.state, 'done')
+        self.assertEqual(stale_chunk.attempts, 2)
+        self.assertEqual(exhausted_chunk.state, 'failed')
+        self.assertEqual(recent_chunk.state, 'running')
+        self.assertEqual(run.state, 'running')
+
+        recent_chunk.write({
+            'date_start': fields.Datetime.now() - relativedelta(hours=2),
+        })
+        with mock.patch(_get_date_from, return_value=date_from):
+            self.env[
+                'hr.leave.allocation.accrual.run'
+            ]._cron_reclaim_stale_chunks()
+        self.assertEqual(recent_chunk.state, 'done')
+        self.assertEqual(run.state, 'failed')
+
+    @skipIf(not numpy, 'NumPy is not available')
+    def test_numpy_engine(self):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'hr_holidays_accrual_advanced.accrual_engine',
+            'numpy'
+        )
+        leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #29',
+            'allocation_type': 'fixed',
+            'validity_start': False,
+        })
+        unpaid_leave_type = self.SudoLeaveType.create({
+            'name': 'Leave Type #29 (unpaid)',
+            'allocation_type': 'no',
+            'unpaid': True,
+            'validity_start': False,
+        })
+        calendar = self.SudoResourceCalendar.create({
+            'name': 'Calendar #29',
+            'tz': 'Europe/Kiev',
+        })
+        calendar.write({
+            'global_leave_ids': [
+                (0, False, {
+                    'name': 'Global Leave #29',
+                    'date_from': self.now - relativedelta(months=7),
+                    'date_to': (
+                        self.now - relativedelta(months=7) +
+                        relativedelta(days=1, hours=5)
+                    ),
+                }),
+            ],
+        })
+        employee = self.SudoEmployee.create({
+            'name': 'Employee #29',
+            'resource_calendar_id': calendar.id,
+        })
+        allocations = self.SudoLeaveAllocation
+        for accrual_method in ['period_start', 'period_end', 'prorate']:
+            for interval_unit in ['weeks', 'months', 'years']:
+                allocations |= self.SudoLeaveAllocation.create({
+                    'holiday_type': 'employee',
+                    'employee_id': employee.id,
+                    'holiday_status_id': leave_type.id,
+                    'state': 'validate',
+                    'accrual': True,
+                    'accrual_method': accrual_method,
+                    'interval_unit': interval_unit,
+                    'number_per_interval': 1.5,
+                    'limit_accrued_days': interval_unit == 'weeks',
+                    'max_accrued_days': 1.0,
+                    'limit_carryover_days': interval_unit == 'months',
+                    'max_carryover_days': 5.0,
+                    'limit_accumulated_days': interval_unit != 'weeks',
+                    'max_accumulated_days': 10.0,
+                })
+        leave = self.SudoLeave.create({
+            'name': 'Leave #29',
+            'employee_id': employee.id,
+            'holiday_status_id': leave_type.id,
+            'date_from': self.now - relativedelta(months=2, hours=3),
+            'date_to': (
+                self.now - relativedelta(months=2) + relativedelta(days=3)
+            ),
+        })
+        leave._onchange_leave_dates()
+        leave.action_approve()
+        unpaid_leave = self.SudoLeave.create({
+            'name': 'Leave #29 (unpaid)',
+            'employee_id': employee.id,
+            'holiday_status_id': unpaid_leave_type.id,
+            'date_from': self.now - relativedelta(months=5, hours=11),
+            'date_to': self.now - relativedelta(months=4),
+        })
+        unpaid_leave._onchange_leave_dates()
+        unpaid_leave.action_approve()
+
+        date_from = self.now - relativedelta(years=2, days=3, hours=7)
+        with mock.patch(_get_date_from, return_value=date_from):
+            snapshots = allocations._get_accrual_snapshots(self.now)
+            self.assertEqual(
+                type(snapshots[employee.id]).__name__,
+                'AccrualArraySnapshot'
+            )
+            for allocation in allocations:
+                expected = allocation._calculate_accrued_amount(self.now)
+                actual = allocation._calculate_accrued_amount(
+                    self.now,
+                    snapshot=snapshots[employee.id],
+                )
+                self.assertEqual(actual, expected)
+
+    def test_zero_day_total(self):
+        # NOTE: Worked hours on 2019-01-08, a day without attendances
+        attendance_intervals = [
+            (
+                datetime(2019, 1, 7, 8, tzinfo=utc),
+                datetime(2019, 1, 7, 16, tzinfo=utc),
+                None,
+            ),
+            (
+                datetime(2019, 1, 9, 8, tzinfo=utc),
+                datetime(2019, 1, 9, 16, tzinfo=utc),
+                None,
+            ),
+        ]
+        worked_intervals = attendance_intervals[:1] + [
+            (
+                datetime(2019, 1, 8, 8, tzinfo=utc),
+                datetime(2019, 1, 8, 12, tzinfo=utc),
+                None,
+            ),
+        ]
+        snapshot_classes = [AccrualSnapshot]
+        if numpy:
+            snapshot_classes.append(AccrualArraySnapshot)
+        for snapshot_class in snapshot_classes:
+            snapshot = snapshot_class(
+                utc,
+                attendance_intervals,
+                worked_intervals,
+                {},
+            )
+            self.assertEqual(
+                snapshot.get_worked_days(
+                    datetime(2019, 1, 7),
+                    datetime(2019, 1, 10),
+                ),
+                1.0,
+            )
+
     def test_calculator(self):
         leave_type = self.SudoLeaveType.create({
             'name': 'Leave Type',
@@ -781,7 +1508,59 @@ class TestHrHolidaysAccrualAdvanced(common.TransactionCase):
         self.assertEqual(calculator.accrued, 0.0)
         self.assertEqual(calculator.balance, 0.0)
 
-        calculator.date = self.today
-        calculator._onchange()
-        self.assertEqual(calculator.accrued, 40.0)
-        self.assertEqual(calculator.balance, 40.0)
+        HrLeaveAllocation = type(self.LeaveAllocation)
+        with mock.patch.object(
+            HrLeaveAllocation,
+            '_get_accrual_snapshots',
+            autospec=True,
+            side_effect=HrLeaveAllocation._get_accrual_snapshots,
+        ) as get_accrual_snapshots:
+            calculator.date = self.today - relativedelta(years=1)
+            calculator._onchange()
+            self.assertEqual(calculator.accrued, 40.0)
+            self.assertTrue(calculator.accrual_cache_key)
+            self.assertEqual(get_accrual_snapshots.call_count, 1)
+
+            calculator.date = self.today - relativedelta(years=2, days=1)
+            calculator._onchange()
+            accruements, accrued = allocation._calculate_accrued_amount(
+                self.now - relativedelta(years=2, days=1)
+            )
+            self.assertAlmostEqual(calculator.accrued, accrued)
+            self.assertAlmostEqual(
+                calculator.balance,
+                sum(x.days_accrued for x in accruements)
+            )
+            # NOTE: Periods are taken from the session kept on the server
+            self.assertEqual(get_accrual_snapshots.call_count, 1)
+            session = self.env[
+                'hr.leave.allocation.accrual.calculator.session'
+            ].search([
+                ('key', '=', calculator.accrual_cache_key),
+            ])
+            self.assertEqual(len(session), 1)
+            self.assertTrue(session.period_days)
+            self.assertEqual(
+                session.horizon,
+                self.now - relativedelta(years=1)
+            )
+
+            # NOTE: Intervals are preloaded again beyond the cached horizon
+            calculator.date = self.today
+            calculator._onchange()
+            self.assertEqual(get_accrual_snapshots.call_count, 2)
+            self.assertEqual(calculator.accrued, 40.0)
+            self.assertEqual(calculator.balance, 40.0)
+
+            # NOTE: Session is restarted once the allocation is modified,
+            # while the transaction time does not change during the test
+            session.allocation_write_date = (
+                allocation.write_date - relativedelta(seconds=1)
+            )
+            calculator.date = self.today - relativedelta(years=2)
+            calculator._onchange()
+            self.assertEqual(get_accrual_snapshots.call_count, 3)
+            self.assertEqual(
+                session.horizon,
+                self.now - relativedelta(years=2)
+            )
@@ -1,10 +1,18 @@
 # Copyright 2018-2019 Brainbean Apps (https://brainbeanapps.com)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+import json
+import uuid
+
 from datetime import datetime
 
 from odoo import api, fields, models
 
+from ..models.accrual_snapshot import (
+    AccrualAllocationDays,
+    AccrualPeriodCache,
+)
+
 
 class HrLeaveAllocationAccrualCalculatorAccruement(models.TransientModel):
     _name = 'hr.leave.allocation.accrual.calculator.accruement'
@@ -31,6 +39,58 @@ class HrLeaveAllocationAccrualCalculatorAccruement(models.TransientModel):
     )
 
 
+class HrLeaveAllocationAccrualCalculatorSession(models.TransientModel):
+    _name = 'hr.leave.allocation.accrual.calculator.session'
+    _description = 'HR Leave Allocation Accrual Calculator Session'
+
+    key = fields.Char(
+        string='Key',
+        required=True,
+        index=True,
+    )
+    leave_allocation_id = fields.Many2one(
+        string='Leave Allocation',
+        comodel_name='hr.leave.allocation',
+        required=True,
+        ondelete='cascade',
+    )
+    allocation_write_date = fields.Datetime(
+        string='Allocation Last Updated on',
+    )
+    horizon = fields.Datetime(
+        string='Horizon',
+        help='Latest date intervals were preloaded up to',
+    )
+    period_days = fields.Text(
+        string='Period Days',
+        help='Days of accrual periods computed so far, as JSON',
+    )
+
+    @api.model
+    def _get_session(self, key, leave_allocation):
+        """
+        Get session of the calculator for the allocation, restarted once the
+        allocation is modified.
+        """
+        session = self.search([
+            ('key', '=', key),
+            ('leave_allocation_id', '=', leave_allocation.id),
+        ], limit=1)
+        if not session:
+            return self.create({
+                'key': key,
+                'leave_allocation_id': leave_allocation.id,
+                'allocation_write_date': leave_allocation.write_date,
+            })
+        if session.allocation_write_date != leave_allocation.write_date:
+            session.write({
+                'allocation_write_date': leave_allocation.write_date,
+                'horizon': False,
+                'period_days': False,
+            })
+        return session
+
+
 class HrLeaveAllocationAccrualBalanceCalculator(models.TransientModel):
     _name = 'hr.leave.allocation.accrual.calculator'
     _description = 'HR Leave Allocation Accrual Calculator'
@@ -55,6 +115,13 @@ class HrLeaveAllocationAccrualBalanceCalculator(models.TransientModel):
         string='Balance',
         readonly=True,
     )
+    accrual_cache_key = fields.Char(
+        string='Accrual Cache Key',
+        help=(
+            'Key of the session that keeps days of accrual periods computed'
+            ' so far, reused when date is changed'
+        ),
+    )
 
     @api.onchange(
         'date',
@@ -78,9 +145,42 @@ class HrLeaveAllocationAccrualBalanceCalculator(models.TransientModel):
             self.env.context.get('active_id')
         )
 
+        as_of_datetime = datetime.combine(self.date, datetime.min.time())
+
+        if not self.accrual_cache_key:
+            self.accrual_cache_key = uuid.uuid4().hex
+        session = self.env[
+            'hr.leave.allocation.accrual.calculator.session'
+        ]._get_session(self.accrual_cache_key, leave_allocation)
+        period_days = (
+            json.loads(session.period_days) if session.period_days else {}
+        )
+        horizon = session.horizon
+
+        # NOTE: Intervals are preloaded at once up to the date, then only
+        # periods that were not computed yet are computed on demand while the
+        # date does not go beyond it
+        if horizon and as_of_datetime <= horizon:
+            source = AccrualAllocationDays(leave_allocation)
+        else:
+            source = leave_allocation._get_accrual_snapshots(
+                as_of_datetime
+            ).get(leave_allocation.employee_id.id)
+            if not source:
+                source = AccrualAllocationDays(leave_allocation)
+            horizon = as_of_datetime
+
+        cache = AccrualPeriodCache(period_days, source)
+        period_count = len(cache.values)
         accruements, accrued = leave_allocation._calculate_accrued_amount(
-            datetime.combine(self.date, datetime.min.time()),
+            as_of_datetime,
+            snapshot=cache,
         )
+        if len(cache.values) != period_count or horizon != session.horizon:
+            session.write({
+                'horizon': horizon,
+                'period_days': json.dumps(cache.values),
+            })
 
         balance = 0.0
         for accruement in accruements:
@@ -3,7 +3,7 @@
 
 {
     'name': 'HR Holidays Public',
-    'version': '12.0.1.1.0',
+    'version': '12.0.1.2.0',
     'license': 'AGPL-3',
     'category': 'Human Resources',
     'author': "Michael Telahun Makonnen, "
@@ -15,6 +15,7 @@
     'website': 'https://github.com/OCA/hr',
     'depends': [
         'hr_holidays',
+        'resource_hook',
     ],
     'data': [
         'data/data.xml',
@@ -3,10 +3,12 @@
 
 from datetime import date
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo import SUPERUSER_ID
 from odoo.exceptions import ValidationError
 
+from psycopg2.extras import execute_values
+
 
 class HrHolidaysPublic(models.Model):
     _name = 'hr.holidays.public'
@@ -33,18 +35,45 @@ class HrHolidaysPublic(models.Model):
         'res.country',
         'Country'
     )
+    version = fields.Integer(
+        readonly=True,
+        copy=False,
+        help="Changed on all the calendars of the year whenever public "
+             "holidays of that year change, so that values cached from them "
+             "are computed again.",
+    )
+
+    @api.model_cr
+    def init(self):
+        # Versions are taken from a sequence, which isn't rolled back with
+        # the transaction, so that a version is never reused
+        self.env.cr.execute(
+            "CREATE SEQUENCE IF NOT EXISTS hr_holidays_public_version_seq"
+        )
+        self.env.cr.execute(
+            "UPDATE hr_holidays_public "
+            "SET version = nextval('hr_holidays_public_version_seq') "
+            "WHERE version IS NULL OR version = 0"
+        )
 
     @api.multi
     @api.constrains('year', 'country_id')
     def _check_year(self):
-        for line in self:
-            line._check_year_one()
-
-    def _check_year_one(self):
-        if self.search_count([
-                ('year', '=', self.year),
-                ('country_id', '=', self.country_id.id),
-                ('id', '!=', self.id)]):
+        self.env.cr.execute(
+            """
+            SELECT year, country_id
+            FROM hr_holidays_public
+            WHERE (year, COALESCE(country_id, 0)) IN (
+                SELECT year, COALESCE(country_id, 0)
+                FROM hr_holidays_public
+                WHERE id IN %s
+            )
+            GROUP BY year, country_id
+            HAVING count(*) > 1
+            LIMIT 1
+            """, (tuple(self.ids), ),
+        )
+        if self.env.cr.fetchone():
             raise ValidationError(_(
                 'You can\'t create duplicate public holiday per year and/or'
                 ' country'
@@ -70,44 +99,165 @@ class HrHolidaysPublic(models.Model):
             result.append((rec.id, rec.display_name))
         return result
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        self._update_version(res.mapped('year'))
+        return res
+
+    @api.multi
+    def write(self, vals):
+        years = self.mapped('year')
+        res = super().write(vals)
+        self._update_version(years + self.mapped('year'))
+        return res
+
+    @api.multi
+    def unlink(self):
+        years = self.mapped('year')
+        res = super().unlink()
+        self._update_version(years)
+        return res
+
+    @api.model
+    def _update_version(self, years):
+        """
+        Give a new version to all the calendars of the given years, so that
+        the latest version of a year is never the one of a previous state
+        """
+        years = tuple(set(years))
+        if not years:
+            return
+        self.env.cr.execute(
+            """
+            UPDATE hr_holidays_public
+            SET version = nextval('hr_holidays_public_version_seq')
+            WHERE year IN %s
+            """, (years, ),
+        )
+        self.invalidate_cache(['version'])
+
+    @api.model
+    def _get_versions(self, years):
+        """
+        Returns the version of the public holidays of the given years
+        :param years: iterable of years
+        :return: dictionary {year: version}, version being None for years
+          without calendars
+        """
+        years = tuple(set(int(year) for year in years))
+        result = dict.fromkeys(years)
+        self.env.cr.execute(
+            """
+            SELECT year, max(version)
+            FROM hr_holidays_public
+            WHERE year IN %s
+            GROUP BY year
+            """, (years, ),
+        )
+        result.update(self.env.cr.fetchall())
+        return result
+
+    @api.model
+    def _get_employee_region(self, employee_id=None):
+        """
+        Returns the region which determines the public holidays of the
+        employee
+        :param employee_id: ID of the employee
+        :return: tuple (country_id, state_id) of the employee address, with
+          None as country when no employee is given, meaning any country
+        """
+        if not employee_id:
+            return None, False
+        return self._get_employees_regions(
+            self.env['hr.employee'].browse(employee_id)
+        )[employee_id]
+
+    @api.model
+    def _get_employees_regions(self, employees):
+        """
+        Returns the regions which determine the public holidays of the
+        employees, read at once
+        :param employees: recordset of hr.employee
+        :return: dictionary {employee ID: (country_id, state_id)}
+        """
+        return {
+            employee.id: (
+                employee.address_id.country_id.id,
+                employee.address_id.state_id.id,
+            )
+            for employee in employees
+        }
+
     @api.model
     @api.returns('hr.holidays.public.line')
-    def get_holidays_list(self, year, employee_id=None):
+    def _get_region_holidays_list(self, year, country_id=None,
+                                  state_id=False):
         """
         Returns recordset of hr.holidays.public.line
-        for the specified year and employee
+        for the specified year and region
         :param year: year as string
-        :param employee_id: ID of the employee
+        :param country_id: ID of the country, False for no country or None
+          for any country
+        :param state_id: ID of the country state
         :return: recordset of hr.holidays.public.line
         """
         holidays_filter = [('year', '=', year)]
-        employee = False
-        if employee_id:
-            employee = self.env['hr.employee'].browse(employee_id)
-            if employee.address_id and employee.address_id.country_id:
-                holidays_filter.append('|')
-                holidays_filter.append(('country_id', '=', False))
-                holidays_filter.append(('country_id',
-                                        '=',
-                                        employee.address_id.country_id.id))
-            else:
-                holidays_filter.append(('country_id', '=', False))
+        if country_id:
+            holidays_filter.append('|')
+            holidays_filter.append(('country_id', '=', False))
+            holidays_filter.append(('country_id', '=', country_id))
+        elif country_id is not None:
+            holidays_filter.append(('country_id', '=', False))
         pholidays = self.search(holidays_filter)
         if not pholidays:
             return self.env['hr.holidays.public.line']
 
         states_filter = [('year_id', 'in', pholidays.ids)]
-        if employee and employee.address_id and employee.address_id.state_id:
+        if state_id:
             states_filter += ['|',
                               ('state_ids', '=', False),
-                              ('state_ids', '=',
-                               employee.address_id.state_id.id)]
+                              ('state_ids', '=', state_id)]
         else:
             states_filter.append(('state_ids', '=', False))
         hhplo = self.env['hr.holidays.public.line']
         holidays_lines = hhplo.search(states_filter)
         return holidays_lines
 
+    @api.model
+    @api.returns('hr.holidays.public.line')
+    def get_holidays_list(self, year, employee_id=None):
+        """
+        Returns recordset of hr.holidays.public.line
+        for the specified year and employee
+        :param year: year as string
+        :param employee_id: ID of the employee
+        :return: recordset of hr.holidays.public.line
+        """
+        return self._get_region_holidays_list(
+            year, *self._get_employee_region(employee_id)
+        )
+
+    @api.model
+    def _get_holidays_dates(self, year, country_id=None, state_id=False):
+        """
+        Returns the dates of the public holidays for the specified year and
+        region, cached until public holidays of that year are modified
+        :return: frozenset of dates
+        """
+        year = int(year)
+        return self._get_holidays_dates_version(
+            year, country_id, state_id, self._get_versions([year])[year],
+        )
+
+    @api.model
+    @tools.ormcache('year', 'country_id', 'state_id', 'version')
+    def _get_holidays_dates_version(self, year, country_id, state_id,
+                                    version):
+        return frozenset(self.sudo()._get_region_holidays_list(
+            year, country_id, state_id,
+        ).mapped('date'))
+
     @api.model
     def is_public_holiday(self, selected_date, employee_id=None):
         """
@@ -116,15 +266,9 @@ class HrHolidaysPublic(models.Model):
         :param employee_id: ID of the employee
         :return: bool
         """
-        holidays_lines = self.get_holidays_list(
-            selected_date.year, employee_id=employee_id)
-        if holidays_lines:
-            hol_date = holidays_lines.filtered(
-                lambda r: r.date == selected_date
-            )
-            if hol_date.ids:
-                return True
-        return False
+        return selected_date in self._get_holidays_dates(
+            selected_date.year, *self._get_employee_region(employee_id)
+        )
 
 
 class HrHolidaysPublicLine(models.Model):
@@ -161,42 +305,84 @@ class HrHolidaysPublicLine(models.Model):
 
     meeting_id = fields.Many2one('calendar.event', string='Meeting')
 
+    @api.model_cr
+    def init(self):
+        # Support the duplicate checks, which look for lines of the same
+        # calendar and date
+        tools.create_index(
+            self.env.cr, 'hr_holidays_public_line_year_id_date_index',
+            self._table, ['year_id', 'date'],
+        )
+
     @api.multi
     @api.constrains('date', 'state_ids')
     def _check_date_state(self):
-        for line in self:
-            line._check_date_state_one()
-
-    def _check_date_state_one(self):
-        if self.date.year != self.year_id.year:
+        """Check the lines at once, with one grouped query per rule."""
+        ids = tuple(self.ids)
+        self.env.cr.execute(
+            """
+            SELECT l.id
+            FROM hr_holidays_public_line l
+            JOIN hr_holidays_public h ON h.id = l.year_id
+            WHERE l.id IN %s
+                AND extract(year from l.date) != h.year
+            LIMIT 1
+            """, (ids, ),
+        )
+        if self.env.cr.fetchone():
             raise ValidationError(_(
                 'Dates of holidays should be the same year as the calendar'
                 ' year they are being assigned to'
             ))
-
-        if self.state_ids:
-            domain = [
-                ('date', '=', self.date),
-                ('year_id', '=', self.year_id.id),
-                ('state_ids', '!=', False),
-                ('id', '!=', self.id),
-            ]
-            holidays = self.search(domain)
-
-            for holiday in holidays:
-
-                if self.state_ids & holiday.state_ids:
-                    raise ValidationError(_(
-                        'You can\'t create duplicate public holiday per date'
-                        ' %s and one of the country states.'
-                    ) % self.date)
-        domain = [('date', '=', self.date),
-                  ('year_id', '=', self.year_id.id),
-                  ('state_ids', '=', False)]
-        if self.search_count(domain) > 1:
+        # Lines of the same calendar and date sharing any state
+        self.env.cr.execute(
+            """
+            SELECT l.date
+            FROM hr_holidays_public_line l
+            JOIN hr_holiday_public_state_rel r ON r.line_id = l.id
+            WHERE (l.date, l.year_id) IN (
+                SELECT date, year_id
+                FROM hr_holidays_public_line
+                WHERE id IN %(ids)s
+            )
+            GROUP BY l.date, l.year_id, r.state_id
+            HAVING count(*) > 1 AND bool_or(l.id IN %(ids)s)
+            ORDER BY l.date
+            LIMIT 1
+            """, {'ids': ids},
+        )
+        row = self.env.cr.fetchone()
+        if row:
+            raise ValidationError(_(
+                'You can\'t create duplicate public holiday per date'
+                ' %s and one of the country states.'
+            ) % row[0])
+        # Lines of the same calendar and date without states
+        self.env.cr.execute(
+            """
+            SELECT l.date
+            FROM hr_holidays_public_line l
+            WHERE (l.date, l.year_id) IN (
+                SELECT date, year_id
+                FROM hr_holidays_public_line
+                WHERE id IN %s
+            )
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM hr_holiday_public_state_rel r
+                    WHERE r.line_id = l.id
+                )
+            GROUP BY l.date, l.year_id
+            HAVING count(*) > 1
+            ORDER BY l.date
+            LIMIT 1
+            """, (ids, ),
+        )
+        row = self.env.cr.fetchone()
+        if row:
             raise ValidationError(_(
                 'You can\'t create duplicate public holiday per date %s.'
-            ) % self.date)
+            ) % row[0])
         return True
 
     @api.multi
@@ -228,14 +414,47 @@ class HrHolidaysPublicLine(models.Model):
             if rec.meeting_id:
                 rec.meeting_id.write(rec._prepare_holidays_meeting_values())
 
-    @api.model
-    def create(self, values):
-        res = super().create(values)
-        res.meeting_id = self.env['calendar.event'].create(
-            res._prepare_holidays_meeting_values())
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        self.env['hr.holidays.public']._update_version(
+            res.mapped('year_id.year'),
+        )
+        meetings = self.env['calendar.event'].with_context(
+            no_mail_to_attendees=True,
+            mail_create_nolog=True,
+            mail_create_nosubscribe=True,
+        ).create([
+            line._prepare_holidays_meeting_values() for line in res
+        ])
+        # Link the meetings with a single query instead of one per line
+        execute_values(
+            self.env.cr,
+            """
+            UPDATE %s AS l
+            SET meeting_id = v.meeting_id
+            FROM (VALUES %%s) AS v (id, meeting_id)
+            WHERE l.id = v.id
+            """ % self._table,
+            list(zip(res.ids, meetings.ids)),
+            page_size=1000,
+        )
+        res.invalidate_cache(['meeting_id'], res.ids)
+        return res
+
+    @api.multi
+    def write(self, vals):
+        years = self.mapped('year_id.year')
+        res = super().write(vals)
+        self.env['hr.holidays.public']._update_version(
+            years + self.mapped('year_id.year'),
+        )
         return res
 
     @api.multi
     def unlink(self):
+        years = self.mapped('year_id.year')
         self.mapped('meeting_id').unlink()
-        return super().unlink()
+        res = super().unlink()
+        self.env['hr.holidays.public']._update_version(years)
+        return res
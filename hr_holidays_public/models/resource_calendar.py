@@ -2,12 +2,12 @@
 # Copyright 2018 Brainbean Apps
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import models
+from odoo import api, models, tools
 from odoo.addons.resource.models.resource import Intervals
 
+from bisect import bisect_left, bisect_right
 from pytz import timezone
 from datetime import datetime, time
-from dateutil import rrule
 
 
 class ResourceCalendar(models.Model):
@@ -23,39 +23,98 @@ class ResourceCalendar(models.Model):
         :param: employee_id: Employee ID. It can be false.
         :return: List of tuples with (start_date, end_date) as elements.
         """
-        HrHolidaysPublic = self.env['hr.holidays.public']
+        country_id, state_id = self.env[
+            'hr.holidays.public'
+        ]._get_employee_region(employee_id)
+        return self._region_public_holidays_leave_intervals(
+            start_dt, end_dt, country_id, state_id, tz,
+        )
 
-        leaves = []
-        if start_dt.year != end_dt.year:
-            # This fixes the case of leave request asked over 2 years.
-            #
-            # adding 1 year to end_dt for rrule to retrieve correct years for
-            # public holidays to work
-            # rrule.rrule(rrule.YEARLY, dtstart=2019-12-22, until=2020-01-05)
-            # gives [2019]
-            # rrule.rrule(rrule.YEARLY, dtstart=2019-12-22, until=2021-01-05)
-            # gives [2019, 2020]
-            end_dt = end_dt.replace(year=end_dt.year+1)
-        for day in rrule.rrule(rrule.YEARLY, dtstart=start_dt, until=end_dt):
-            lines = HrHolidaysPublic.get_holidays_list(
-                day.year, employee_id=employee_id,
+    def _public_holidays_leave_intervals_batch(self, start_dt, end_dt,
+                                               employees):
+        """Get the public holidays for several employees and given dates,
+        resolving them once per region and timezone of the employees.
+
+        :param: start_dt: Initial datetime.
+        :param: end_dt: End datetime.
+        :param: employees: Employees recordset. Holidays are placed in the
+          timezone of the resource of each employee.
+        :return: Dictionary with employee IDs as keys and Intervals as values.
+        """
+        regions = self.env['hr.holidays.public']._get_employees_regions(
+            employees,
+        )
+        keys = {
+            employee.id: (
+                regions[employee.id],
+                (employee.resource_id or self).tz,
             )
-            for line in lines:
-                leaves.append(
-                    (
-                        datetime.combine(
-                            line.date,
-                            time.min
-                        ).replace(tzinfo=tz),
-                        datetime.combine(
-                            line.date,
-                            time.max
-                        ).replace(tzinfo=tz),
-                        self.env['resource.calendar.leaves']
-                    ),
+            for employee in employees
+        }
+        intervals = {}
+        for region, tz_name in set(keys.values()):
+            intervals[region, tz_name] = \
+                self._region_public_holidays_leave_intervals(
+                    start_dt, end_dt, region[0], region[1], timezone(tz_name),
                 )
+        return {
+            employee_id: intervals[key]
+            for employee_id, key in keys.items()
+        }
+
+    def _region_public_holidays_leave_intervals(self, start_dt, end_dt,
+                                                country_id, state_id, tz):
+        """Get the public holidays of a region for given dates in the format
+        expected by resource methods.
+
+        :param: country_id: Country ID, False for no country or None for any.
+        :param: state_id: Country state ID. It can be false.
+        :return: Intervals of the public holidays.
+        """
+        leaves = []
+        # Neighbour years are also checked, as the window may start or end
+        # on another year in the timezone of the holidays
+        years = range(start_dt.year - 1, end_dt.year + 2)
+        versions = self.env['hr.holidays.public']._get_versions(years)
+        for year in years:
+            starts, stops = self._get_public_holidays_bounds(
+                year, country_id, state_id, tz.zone, versions[year],
+            )
+            # Holidays ending after the start of the window and starting
+            # before its end
+            for index in range(bisect_left(stops, start_dt),
+                               bisect_right(starts, end_dt)):
+                leaves.append((
+                    max(starts[index], start_dt),
+                    min(stops[index], end_dt),
+                    self.env['resource.calendar.leaves'],
+                ))
         return Intervals(leaves)
 
+    @tools.ormcache('year', 'country_id', 'state_id', 'tz_name', 'version')
+    def _get_public_holidays_bounds(self, year, country_id, state_id,
+                                    tz_name, version):
+        """Get the public holidays of a region and year as sorted tuples of
+        their start and end datetimes in the given timezone, cached until
+        public holidays of that year are modified, which changes its version.
+        """
+        tz = timezone(tz_name)
+        dates = sorted(
+            self.env['hr.holidays.public']._get_holidays_dates_version(
+                year, country_id, state_id, version,
+            )
+        )
+        return (
+            tuple(
+                datetime.combine(date, time.min).replace(tzinfo=tz)
+                for date in dates
+            ),
+            tuple(
+                datetime.combine(date, time.max).replace(tzinfo=tz)
+                for date in dates
+            ),
+        )
+
     def _leave_intervals(self, start_dt, end_dt, resource=None, domain=None):
         res = super()._leave_intervals(
             start_dt=start_dt,
@@ -73,3 +132,33 @@ class ResourceCalendar(models.Model):
             )
             res = res | public_holidays
         return res
+
+    @api.model
+    def _leave_intervals_batch(self, start_dt, end_dt, resources,
+                               calendar=None, domain=None):
+        """Add the public holidays of the employee of each resource, the same
+        as `_leave_intervals` does for a single one.
+        """
+        res = super()._leave_intervals_batch(
+            start_dt, end_dt, resources, calendar=calendar, domain=domain,
+        )
+        if self.env.context.get('exclude_public_holidays'):
+            employees = self.env['hr.employee'].with_context(
+                active_test=False,
+            ).search([('resource_id', 'in', resources.ids)])
+            public_holidays = self._public_holidays_leave_intervals_batch(
+                start_dt, end_dt, employees,
+            )
+            for employee in employees:
+                resource_id = employee.resource_id.id
+                res[resource_id] = (
+                    res[resource_id] | public_holidays[employee.id]
+                )
+            # Resources without employee, as `_leave_intervals` without one
+            for resource in resources - employees.mapped('resource_id'):
+                res[resource.id] = (
+                    res[resource.id] | self._public_holidays_leave_intervals(
+                        start_dt, end_dt, False, timezone(resource.tz),
+                    )
+                )
+        return res
@@ -3,6 +3,10 @@
 # Copyright 2018 Brainbean Apps
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+from datetime import datetime
+
+from pytz import timezone
+
 from odoo.tests import common
 
 
@@ -158,3 +162,62 @@ class TestHolidaysComputeDays(TestHolidaysComputeDaysBase):
         })
         leave_request._onchange_leave_dates()
         self.assertEqual(leave_request.number_of_days, 5)
+
+    def test_public_holidays_leave_intervals_batch(self):
+        tz = timezone('UTC')
+        start_dt = datetime(1946, 12, 23, tzinfo=tz)
+        end_dt = datetime(1947, 1, 3, 23, 59, 59, tzinfo=tz)
+        employees = self.employee_1 | self.employee_2
+        self.employee_1.resource_id.tz = 'UTC'
+        self.employee_2.resource_id.tz = 'Europe/Madrid'
+        intervals = self.calendar._public_holidays_leave_intervals_batch(
+            start_dt, end_dt, employees,
+        )
+        self.assertEqual(len(intervals[self.employee_1.id]), 3)
+        self.assertEqual(len(intervals[self.employee_2.id]), 5)
+        # Holidays are placed in the timezone of each employee
+        for employee in employees:
+            self.assertEqual(
+                list(intervals[employee.id]),
+                list(self.calendar._public_holidays_leave_intervals(
+                    start_dt, end_dt, employee.id,
+                    timezone(employee.resource_id.tz),
+                )),
+            )
+
+    def test_leave_intervals_batch(self):
+        tz = timezone('UTC')
+        start_dt = datetime(1946, 12, 23, tzinfo=tz)
+        end_dt = datetime(1947, 1, 3, 23, 59, 59, tzinfo=tz)
+        employees = self.employee_1 | self.employee_2
+        calendar_obj = self.env['resource.calendar'].with_context(
+            exclude_public_holidays=True,
+        )
+        intervals = calendar_obj._leave_intervals_batch(
+            start_dt, end_dt, employees.mapped('resource_id'),
+        )
+        for employee in employees:
+            self.assertEqual(
+                list(intervals[employee.resource_id.id]),
+                list(self.calendar.with_context(
+                    exclude_public_holidays=True,
+                    employee_id=employee.id,
+                )._leave_intervals(start_dt, end_dt, employee.resource_id)),
+            )
+        self.assertTrue(intervals[self.employee_2.resource_id.id])
+
+    def test_public_holidays_leave_intervals_clipped(self):
+        tz = timezone('UTC')
+        start_dt = datetime(1946, 12, 25, 10, tzinfo=tz)
+        end_dt = datetime(1946, 12, 25, 12, tzinfo=tz)
+        intervals = list(self.calendar._public_holidays_leave_intervals(
+            start_dt, end_dt, self.employee_1.id, tz,
+        ))
+        self.assertEqual(len(intervals), 1)
+        self.assertEqual(intervals[0][:2], (start_dt, end_dt))
+        self.assertFalse(self.calendar._public_holidays_leave_intervals(
+            datetime(1946, 12, 26, tzinfo=tz),
+            datetime(1946, 12, 31, tzinfo=tz),
+            self.employee_1.id,
+            tz,
+        ))
@@ -112,6 +112,22 @@ class TestHolidaysPublic(TransactionCase):
                 'year_id': holiday4.id,
                 'state_ids': [(6, 0, [self.env.ref('base.state_us_35').id])]
             })
+        # Duplicates within the same batch
+        with self.assertRaises(ValidationError):
+            self.holiday_model_line.create([{
+                'name': 'holiday y',
+                'date': '1994-11-15',
+                'year_id': holiday4.id,
+            }] * 2)
+        lines = self.holiday_model_line.create([{
+            'name': 'holiday y',
+            'date': '1994-11-15',
+            'year_id': holiday4.id,
+            'state_ids': [(6, 0, state.ids)],
+        } for state in self.env['res.country.state'].search([
+            ('country_id', '=', self.env.ref('base.us').id),
+        ], limit=3)])
+        self.assertEqual(len(lines), 3)
 
     def test_isnot_holiday(self):
         # ensures that if given a date that is not an holiday it returns none
@@ -139,6 +155,42 @@ class TestHolidaysPublic(TransactionCase):
             employee_id=self.employee.id
         ))
 
+    def test_is_holiday_cache_invalidation(self):
+        # ensures that cached holidays are refreshed on every change
+        self.assertFalse(self.holiday_model.is_public_holiday(
+            date(1994, 10, 15),
+            employee_id=self.employee.id
+        ))
+        line = self.holiday_model_line.search([('date', '=', '1994-10-14')])
+        line.date = '1994-10-15'
+        self.assertTrue(self.holiday_model.is_public_holiday(
+            date(1994, 10, 15),
+            employee_id=self.employee.id
+        ))
+        line.year_id.country_id = self.env.ref('base.fr')
+        self.assertFalse(self.holiday_model.is_public_holiday(
+            date(1994, 10, 15),
+            employee_id=self.employee.id
+        ))
+        line.unlink()
+        self.assertNotIn(
+            date(1994, 10, 15),
+            self.holiday_model._get_holidays_dates(1994),
+        )
+
+    def test_holidays_version(self):
+        # only the version of the modified year changes
+        versions = self.holiday_model._get_versions([1994, 1995])
+        self.assertTrue(versions[1994])
+        line = self.holiday_model_line.search([('date', '=', '1994-10-14')])
+        line.name = 'holiday 1994'
+        new_versions = self.holiday_model._get_versions([1994, 1995])
+        self.assertGreater(new_versions[1994], versions[1994])
+        self.assertEqual(new_versions[1995], versions[1995])
+        self.assertIsNone(
+            self.holiday_model._get_versions([1900])[1900],
+        )
+
     def test_holiday_line_year(self):
         # ensures that line year and holiday year are the same
         holiday4 = self.holiday_model.create({
@@ -184,6 +236,37 @@ class TestHolidaysPublic(TransactionCase):
         self.assertEqual(len(res), 1)
         self.assertEqual(len(lines), 3)
 
+    def test_create_next_year_public_holidays_many(self):
+        holidays = self.holiday_model.search([('year', '=', 1994)])
+        self.assertEqual(len(holidays), 2)
+        wz_create_ph = self.wizard_next_year.new({
+            'template_id': holidays[0].id,
+            'template_ids': [(6, 0, holidays[1].ids)],
+        })
+        wz_create_ph._onchange_template_id()
+        self.assertEqual(wz_create_ph.year, 1995)
+        self.assertEqual(len(wz_create_ph.pending_lines), 2)
+        action = wz_create_ph.create_public_holidays()
+        new_holidays = self.holiday_model.search(action['domain'])
+        self.assertEqual(
+            new_holidays.mapped('country_id'),
+            holidays.mapped('country_id'),
+        )
+        lines = new_holidays.mapped('line_ids')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all(lines.mapped('meeting_id')))
+        self.assertEqual(
+            len(lines.mapped('meeting_id')), 2,
+        )
+        for line in lines:
+            self.assertEqual(line.meeting_id.start_date, line.date)
+        self.assertTrue(self.holiday_model.is_public_holiday(
+            date(1995, 11, 14),
+        ))
+        # Calendars can't be created twice
+        with self.assertRaises(ValidationError):
+            wz_create_ph.create_public_holidays()
+
     def test_february_29th(self):
         # Ensures that users get a UserError (not a nasty Exception) when
         # trying to create public holidays from year including 29th of
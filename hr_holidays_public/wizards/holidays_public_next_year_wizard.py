@@ -18,6 +18,12 @@ class HolidaysPublicNextYearWizard(models.TransientModel):
         string='Template',
         help='Select the public holidays to use as template.',
     )
+    template_ids = fields.Many2many(
+        comodel_name='hr.holidays.public',
+        string='Other Templates',
+        help='Select other public holidays to use as template at the same '
+        'time, for example the ones of other countries.',
+    )
 
     year = fields.Integer(
         help='Year for which you want to create the public holidays. '
@@ -36,15 +42,19 @@ class HolidaysPublicNextYearWizard(models.TransientModel):
         compute='_compute_warning_existing', store=True,
     )
 
-    @api.onchange('template_id')
+    def _get_templates(self):
+        return self.template_id | self.template_ids
+
+    @api.onchange('template_id', 'template_ids')
     def _onchange_template_id(self):
         self.ensure_one()
         self.pending_lines = [(6, 0, [])]
-        if not self.template_id:
+        templates = self._get_templates()
+        if not templates:
             return
-        year = self.template_id.year + 1
+        year = max(templates.mapped('year')) + 1
         vals_list = []
-        for line in self.template_id.line_ids.filtered(
+        for line in templates.mapped('line_ids').filtered(
             lambda r: r.variable_date
         ):
             date = fields.Datetime.from_string(line.date)
@@ -67,11 +77,13 @@ class HolidaysPublicNextYearWizard(models.TransientModel):
             date = fields.Date.to_string(date.replace(year=self.year))
             line.date = date
 
-    @api.depends('year', 'template_id')
+    @api.depends('year', 'template_id', 'template_ids')
     def _compute_warning_existing(self):
         for record in self:
             existing = self.env['hr.holidays.public'].search([
-                ('country_id', '=', record.country_id.id),
+                ('country_id', 'in',
+                 record._get_templates().mapped('country_id').ids or
+                 [False]),
                 ('year', '=', record.year)
             ], limit=1)
             record.warning_existing = len(existing) > 0
@@ -79,54 +91,79 @@ class HolidaysPublicNextYearWizard(models.TransientModel):
     @api.multi
     def create_public_holidays(self):
         self.ensure_one()
+        templates = self._get_templates()
         # Handling this rare case would mean quite a lot of
         # complexity because previous or next day might also be a
         # public holiday.
         if any([(
-            l.date.month == 2 and l.date.day == 29
-        ) for l in self.template_id.line_ids]):
+            line.date.month == 2 and line.date.day == 29
+        ) for line in templates.mapped('line_ids')]):
             raise UserError(_(
                 'You cannot use as template the public holidays '
                 'of a year that includes public holidays on 29th of February'
                 '(2016, 2020...), please select a template from '
                 'another year.'))
 
-        new_calendar = self.env['hr.holidays.public'].create(
-            {
-                'year': self.year,
-                'country_id': self.country_id.id,
-                'line_ids': [],
-            }
-        )
-        for line in self.template_id.line_ids.filtered(
-            lambda r: not r.variable_date
-        ):
-            date = fields.Date.from_string(line.date)
-            date = date.replace(year=self.year)
-            new_vals = {
-                'year_id': new_calendar.id,
-                'date': fields.Date.to_string(date),
-            }
-            line.copy(new_vals)
-
-        for line in self.pending_lines:
-            new_vals = {
-                'year_id': new_calendar.id,
-                'name': line.name,
-                'date': line.date,
-            }
-            line.line_id.copy(new_vals)
+        pending = {line.line_id: line for line in self.pending_lines}
+        new_calendars = self._create_public_holidays([
+            (template, self.year) for template in templates
+        ], pending)
 
         action = {
             'type': 'ir.actions.act_window',
             'name': 'New public holidays',
             'view_mode': 'tree,form',
             'res_model': 'hr.holidays.public',
-            'res_id': new_calendar.id
         }
+        if len(new_calendars) == 1:
+            action['res_id'] = new_calendars.id
+        else:
+            action['domain'] = [('id', 'in', new_calendars.ids)]
 
         return action
 
+    @api.model
+    def _create_public_holidays(self, templates_years, pending=None):
+        """Create at once the public holidays of several years and/or
+        countries from their templates, with their lines and meetings.
+
+        :param templates_years: list of (template, year) tuples.
+        :param pending: dictionary with template lines of variable date as
+          keys, and records with their new name and date as values. Lines of
+          variable date which are not in it are not copied, unless it is
+          not given, in which case all of them are copied as fixed ones.
+        :return: recordset of the new hr.holidays.public.
+        """
+        new_calendars = self.env['hr.holidays.public'].create([
+            {
+                'year': year,
+                'country_id': template.country_id.id,
+                'line_ids': [],
+            } for template, year in templates_years
+        ])
+        vals_list = []
+        for (template, year), new_calendar in zip(
+                templates_years, new_calendars):
+            for line in template.line_ids:
+                if line.variable_date and pending is not None:
+                    if line not in pending:
+                        continue
+                    new_vals = {
+                        'name': pending[line].name,
+                        'date': pending[line].date,
+                    }
+                else:
+                    new_vals = {
+                        'date': line.date.replace(year=year),
+                    }
+                new_vals.update({
+                    'year_id': new_calendar.id,
+                    'meeting_id': False,
+                })
+                vals_list += line.copy_data(new_vals)
+        self.env['hr.holidays.public.line'].create(vals_list)
+        return new_calendars
+
 
 class PublicHolidaysLineTransient(models.TransientModel):
 
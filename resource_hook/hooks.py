@@ -1,8 +1,7 @@
 from odoo.addons.resource.models.resource_mixin import ResourceMixin, ROUNDING_FACTOR
 from odoo.addons.resource.models.resource import ResourceCalendar
-from datetime import timedelta
 from odoo.tools import float_utils
-from pytz import utc
+from pytz import timezone, utc
 from collections import defaultdict
 
 
@@ -37,17 +36,6 @@ def post_load_hook():
         if not to_datetime.tzinfo:
             to_datetime = to_datetime.replace(tzinfo=utc)
 
-        # total hours per day: retrieve attendances with one extra day margin,
-        # in order to compute the total hours on the first and last days
-        from_full = from_datetime - timedelta(days=1)
-        to_full = to_datetime + timedelta(days=1)
-        intervals = calendar._attendance_intervals(
-            from_full, to_full, resource
-        )
-        day_total = defaultdict(float)
-        for start, stop, meta in intervals:
-            day_total[start.date()] += self._get_work_hours(start, stop, meta)
-
         # actual hours per day
         if compute_leaves:
             intervals = calendar._work_intervals(
@@ -61,10 +49,15 @@ def post_load_hook():
         for start, stop, meta in intervals:
             day_hours[start.date()] += self._get_work_hours(start, stop, meta)
 
-        # compute number of days as quarters
+        # compute number of days as quarters, with the total hours of each
+        # day taken from the compiled attendances of the calendar if possible
+        tz = timezone((resource or calendar).tz)
+        day_total = self._get_day_totals(
+            calendar, tz, from_datetime, to_datetime,
+        )
         days = sum(
             float_utils.round(
-                ROUNDING_FACTOR * day_hours[day] / day_total[day]
+                ROUNDING_FACTOR * day_hours[day] / day_total(day)
             ) / ROUNDING_FACTOR
             for day in day_hours
         )
@@ -1,2 +1,3 @@
 from . import resource_calendar
 from . import resource_mixin
+from . import resource_calendar_attendance
@@ -1,12 +1,48 @@
 # Copyright 2019 Creu Blanca
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import models
+from collections import defaultdict
+
+from pytz import timezone, utc
+
+from odoo import api, fields, models
+from odoo.addons.resource.models.resource import Intervals
 
 
 class ResourceCalendar(models.Model):
     _inherit = 'resource.calendar'
 
+    attendance_version = fields.Integer(
+        readonly=True,
+        copy=False,
+        help="Changed whenever the attendances of the calendar change, so "
+             "that values cached from them are computed again.",
+    )
+
+    @api.model_cr
+    def init(self):
+        # Versions are taken from a sequence, which isn't rolled back with
+        # the transaction, so that a version is never reused
+        self.env.cr.execute(
+            "CREATE SEQUENCE IF NOT EXISTS "
+            "resource_calendar_attendance_version_seq"
+        )
+
+    @api.multi
+    def _update_attendance_version(self):
+        ids = tuple(self.filtered('id').ids)
+        if not ids:
+            return
+        self.env.cr.execute(
+            """
+            UPDATE resource_calendar
+            SET attendance_version =
+                nextval('resource_calendar_attendance_version_seq')
+            WHERE id IN %s
+            """, (ids, ),
+        )
+        self.invalidate_cache(['attendance_version'], list(ids))
+
     def _get_work_hours(self, start, stop, meta):
         """
         This method now returns the hours between the two ends of the
@@ -15,3 +51,45 @@ class ResourceCalendar(models.Model):
         :return: float representing the time worked.
         """
         return (stop - start).total_seconds() / 3600
+
+    @api.model
+    def _leave_intervals_batch(self, start_dt, end_dt, resources,
+                               calendar=None, domain=None):
+        """
+        Batch variant of `_leave_intervals` for several resources, each one
+        on its calendar unless one is given, reading the leaves at once.
+        Extend this method as well if you add leaves in `_leave_intervals`.
+        :return: dictionary with resource IDs as keys and Intervals as values.
+        """
+        calendars = calendar or resources.mapped('calendar_id')
+        if domain is None:
+            domain = [('time_type', '=', 'leave')]
+        domain = domain + [
+            ('calendar_id', 'in', calendars.ids),
+            ('resource_id', 'in', resources.ids + [False]),
+            ('date_from', '<=', fields.Datetime.to_string(end_dt)),
+            ('date_to', '>=', fields.Datetime.to_string(start_dt)),
+        ]
+        leaves = defaultdict(list)
+        for leave in self.env['resource.calendar.leaves'].search(domain):
+            leaves[leave.calendar_id, leave.resource_id].append(leave)
+        result = {}
+        for resource in resources:
+            resource_calendar = calendar or resource.calendar_id
+            tz = timezone((resource or resource_calendar).tz)
+            start = start_dt.astimezone(tz)
+            end = end_dt.astimezone(tz)
+            result[resource.id] = Intervals(
+                (
+                    max(start, leave.date_from.replace(
+                        tzinfo=utc).astimezone(tz)),
+                    min(end, leave.date_to.replace(
+                        tzinfo=utc).astimezone(tz)),
+                    leave,
+                )
+                for leave in (
+                    leaves[resource_calendar, resource.browse()] +
+                    leaves[resource_calendar, resource]
+                )
+            )
+        return result
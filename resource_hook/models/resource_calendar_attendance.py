@@ -0,0 +1,29 @@
+# Copyright 2019 Creu Blanca
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = 'resource.calendar.attendance'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        # Values cached from the attendances of the calendars are outdated
+        records.mapped('calendar_id')._update_attendance_version()
+        return records
+
+    @api.multi
+    def write(self, vals):
+        calendars = self.mapped('calendar_id')
+        res = super().write(vals)
+        (calendars | self.mapped('calendar_id'))._update_attendance_version()
+        return res
+
+    @api.multi
+    def unlink(self):
+        calendars = self.mapped('calendar_id')
+        res = super().unlink()
+        calendars._update_attendance_version()
+        return res
@@ -1,7 +1,18 @@
 # Copyright 2019 Creu Blanca
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import models
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from pytz import timezone, utc
+
+from odoo import models, tools
+from odoo.addons.resource.models.resource import Intervals, float_to_time
+from odoo.addons.resource.models.resource import \
+    ResourceCalendar as BaseResourceCalendar
+from odoo.addons.resource.models.resource_mixin import ROUNDING_FACTOR
+from odoo.tools import float_utils
 
 
 class ResourceMixin(models.AbstractModel):
@@ -15,3 +26,195 @@ class ResourceMixin(models.AbstractModel):
         :return: float representing the time worked.
         """
         return (stop - start).total_seconds() / 3600
+
+    def _get_attendance_work_hours_methods(self):
+        """
+        Returns the implementations of `_get_work_hours` that only depend on
+        the attendance of the interval, so that the total hours of a day can
+        be compiled by calendar. Extend this method to add yours.
+        :return: list of functions
+        """
+        return [ResourceMixin._get_work_hours]
+
+    def _use_week_template(self, calendar):
+        """
+        Returns whether the total hours of a day can be taken from the
+        compiled attendances of the calendar, which isn't the case when
+        `_attendance_intervals` is overridden or `_get_work_hours` may depend
+        on the record.
+        :param calendar: resource.calendar record
+        :return: bool
+        """
+        return (
+            type(calendar)._attendance_intervals is
+            BaseResourceCalendar._attendance_intervals and
+            type(self)._get_work_hours in
+            self._get_attendance_work_hours_methods()
+        )
+
+    def _get_day_totals(self, calendar, tz, from_datetime, to_datetime):
+        """
+        Returns a function giving the total hours of the attendances of the
+        calendar on a day between both datetimes. Totals are taken from the
+        compiled attendances of the calendar when possible, or else from the
+        attendances of the record expanded once with one extra day margin.
+        :param calendar: resource.calendar record
+        :param tz: timezone
+        :return: function taking a date in the timezone and returning a float
+        """
+        if self._use_week_template(calendar):
+            return lambda day: self._get_day_total_hours(calendar, tz, day)
+        intervals = calendar._attendance_intervals(
+            from_datetime - timedelta(days=1),
+            to_datetime + timedelta(days=1),
+            self.resource_id,
+        )
+        day_total = defaultdict(float)
+        for start, stop, meta in intervals:
+            day_total[start.date()] += self._get_work_hours(start, stop, meta)
+        return day_total.__getitem__
+
+    @tools.ormcache('calendar_id', 'version')
+    def _get_week_template(self, calendar_id, version):
+        """
+        Compile the attendances of a calendar by weekday, as date-bounded
+        variants, so that the total hours of a day are found without
+        expanding the attendances each time.
+        :param calendar_id: ID of the resource.calendar
+        :param version: attendance version of the calendar, so that the
+        template is compiled again when attendances change
+        :return: dictionary with weekdays as keys and (bounds, variants) as
+        values, where bounds are the sorted dates on which the attendances of
+        the weekday change, and each variant is a list [attendance IDs,
+        hours] for the dates up to the next bound. Hours are computed on the
+        first request, see `_get_day_total_hours`.
+        """
+        calendar = self.env['resource.calendar'].browse(calendar_id)
+        slots = defaultdict(list)
+        for attendance in calendar.attendance_ids:
+            slots[int(attendance.dayofweek)].append(attendance)
+        template = {}
+        for weekday, attendances in slots.items():
+            bounds = sorted(
+                {x.date_from for x in attendances if x.date_from} |
+                {x.date_to + timedelta(days=1)
+                 for x in attendances if x.date_to}
+            )
+            variants = []
+            for day in [date.min] + bounds:
+                variants.append([tuple(
+                    x.id for x in attendances
+                    if (not x.date_from or x.date_from <= day) and
+                    (not x.date_to or x.date_to >= day)
+                ), {}])
+            template[weekday] = (bounds, variants)
+        return template
+
+    def _get_day_total_hours(self, calendar, tz, day):
+        """
+        Returns the total hours of the attendances of the calendar on given
+        day, through `_get_work_hours` as if they were expanded in the
+        timezone. Amounts are kept in the template of the calendar by
+        variant and UTC offset, so they are the same for all the days sharing
+        them, except on days when the offset changes (DST transitions), which
+        are computed on their own. Only valid if `_use_week_template`, see
+        `_get_day_totals`.
+        :param calendar: resource.calendar record
+        :param tz: timezone
+        :param day: date in the timezone
+        :return: float
+        """
+        template = self._get_week_template(
+            calendar.id, calendar.attendance_version,
+        )
+        if day.weekday() not in template:
+            return 0.0
+        bounds, variants = template[day.weekday()]
+        attendance_ids, hours = variants[bisect_right(bounds, day)]
+        offsets = {
+            tz.localize(datetime.combine(day, x)).utcoffset()
+            for x in (time.min, time.max)
+        }
+        if len(offsets) > 1:
+            return self._compute_day_total_hours(tz, day, attendance_ids)
+        key = (tz.zone, offsets.pop())
+        if key not in hours:
+            hours[key] = self._compute_day_total_hours(
+                tz, day, attendance_ids,
+            )
+        return hours[key]
+
+    def _compute_day_total_hours(self, tz, day, attendance_ids):
+        combine = datetime.combine
+        intervals = Intervals(
+            (
+                tz.localize(combine(day, float_to_time(x.hour_from))),
+                tz.localize(combine(day, float_to_time(x.hour_to))),
+                x,
+            )
+            for x in self.env['resource.calendar.attendance'].browse(
+                attendance_ids
+            )
+        )
+        return sum(
+            self._get_work_hours(start, stop, meta)
+            for start, stop, meta in intervals
+        )
+
+    def get_work_days_data_batch(self, from_datetime, to_datetime,
+                                 compute_leaves=True, calendar=None,
+                                 domain=None):
+        """
+        Batch variant of `get_work_days_data` for all the records at once,
+        with the same arguments. Attendances are expanded once per calendar
+        and timezone, and leaves of all the resources are read at once.
+        :return: dictionary with record IDs as keys and dicts
+        {'days': n, 'hours': h} as values.
+        """
+        # naive datetimes are made explicit in UTC
+        if not from_datetime.tzinfo:
+            from_datetime = from_datetime.replace(tzinfo=utc)
+        if not to_datetime.tzinfo:
+            to_datetime = to_datetime.replace(tzinfo=utc)
+
+        if compute_leaves:
+            leaves = self.env['resource.calendar']._leave_intervals_batch(
+                from_datetime, to_datetime, self.mapped('resource_id'),
+                calendar=calendar, domain=domain,
+            )
+        attendances = {}
+        result = {}
+        for record in self:
+            resource = record.resource_id
+            record_calendar = calendar or record.resource_calendar_id
+            if not record_calendar:
+                result[record.id] = {'days': 0, 'hours': 0}
+                continue
+            tz = timezone((resource or record_calendar).tz)
+            key = (record_calendar, tz.zone)
+            if key not in attendances:
+                attendances[key] = record_calendar._attendance_intervals(
+                    from_datetime, to_datetime, resource,
+                )
+            intervals = attendances[key]
+            if compute_leaves:
+                intervals = intervals - leaves[resource.id]
+            day_hours = defaultdict(float)
+            for start, stop, meta in intervals:
+                day_hours[start.date()] += record._get_work_hours(
+                    start, stop, meta,
+                )
+            day_total = record._get_day_totals(
+                record_calendar, tz, from_datetime, to_datetime,
+            )
+            days = sum(
+                float_utils.round(
+                    ROUNDING_FACTOR * day_hours[day] / day_total(day)
+                ) / ROUNDING_FACTOR
+                for day in day_hours
+            )
+            result[record.id] = {
+                'days': days,
+                'hours': sum(day_hours.values()),
+            }
+        return result